@@ -1,17 +1,57 @@
-from flask import Flask, jsonify, Response, request, render_template_string, render_template
+from flask import Flask, g, jsonify, Response, request, render_template_string, render_template, url_for, stream_with_context
+from flask import json as flask_json
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import NotFound
+from werkzeug.serving import make_server
+import abc
+import hashlib
+import bisect
+import collections
+import csv
+import fcntl
+import functools
+import gzip
+import io
+import itertools
 import json
-from datetime import datetime, timedelta
+import math
+import mmap
+import multiprocessing
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
+import click
 import requests
 import os
-import mysql.connector
+import queue
+import re
+import signal
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from mysql.connector import errorcode, pooling, errors as mysql_errors
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_MISSED, EVENT_JOB_SUBMITTED
 from apscheduler.schedulers.background import BackgroundScheduler
 
+try:  # Optional: only needed for Parquet and Arrow exports
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
 load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)  # Secret key for session handling
 
+# Log level of the app logger; DEBUG logs the raw dashboard data of every polled device
+if os.getenv("LOG_LEVEL"):
+    app.logger.setLevel(os.getenv("LOG_LEVEL").upper())
+
 # Database configuration
 DB_CONFIG = {
     "host": "db",  # This should match the service name for MySQL in docker-compose.yml
@@ -21,17 +61,375 @@ DB_CONFIG = {
     "port": 3306,  # Explicitly specify the default MySQL port
 }
 
+# Under gunicorn's gevent workers (see README) only the pure Python connector lets other requests run
+# while a query waits for MySQL
+try:
+    from gevent import monkey
+    if monkey.is_module_patched("socket"):
+        DB_CONFIG["use_pure"] = True
+except ImportError:
+    pass
+
+# Connection pool configuration (shared by the routes and the scheduler)
+DB_POOL_NAME = os.getenv("MYSQL_POOL_NAME", "netatmo_pool")
+DB_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "5"))  # mysql-connector allows at most 32
+DB_POOL_TIMEOUT = float(os.getenv("MYSQL_POOL_TIMEOUT", "10"))  # Seconds to wait for a free connection
+
+# Page size of the measurement views (default and upper bound of the `limit` parameter)
+MEASUREMENTS_PAGE_LIMIT = int(os.getenv("MEASUREMENTS_PAGE_LIMIT", "500"))
+MEASUREMENTS_MAX_LIMIT = int(os.getenv("MEASUREMENTS_MAX_LIMIT", "5000"))
+
+# Approximate size in characters of each chunk written by streamed responses (?stream=1)
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "65536"))
+
+# Measurement exports (/export/measurements, flask export-measurements): rows fetched from the server-side
+# cursor per CSV chunk or Parquet row group, and how long MySQL waits for a slow client to read them
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "10000"))
+EXPORT_NET_WRITE_TIMEOUT = int(os.getenv("EXPORT_NET_WRITE_TIMEOUT", "3600"))
+
+# Live measurement feed (/stream/measurements): how often new rows are looked for while clients are
+# connected, the keep-alive interval, and how many undelivered batches a slow client may fall behind
+LIVE_POLL_INTERVAL = float(os.getenv("LIVE_POLL_INTERVAL", "5"))
+LIVE_HEARTBEAT = float(os.getenv("LIVE_HEARTBEAT", "15"))
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "20"))
+# Rows with lower ids may commit after higher ones (several writers, backfill), so the ids of the last
+# LIVE_OVERLAP seconds are scanned again; rows measured more than LIVE_MAX_AGE seconds ago are not live
+LIVE_OVERLAP = float(os.getenv("LIVE_OVERLAP", "60"))
+LIVE_MAX_AGE = int(os.getenv("LIVE_MAX_AGE", "3600"))
+
+# Maximum number of rows sent in one multi-row INSERT during ingestion
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+
+
+# Metrics exposed on /metrics in the Prometheus text format
+def escape_label_value(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metric(abc.ABC):
+    """Base of the in-process metrics: one value (or set of values) per combination of label values."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.label_names, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in pairs) + "}"
 
-# Netatmo credentials and endpoints
+    @abc.abstractmethod
+    def samples(self):
+        """Returns the sample lines of this metric; called with the lock held."""
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self.samples())
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in sorted(self._values.items())]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self):
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in sorted(self._values.items())]
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram; observe() costs a bisect and two additions under a lock."""
+
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts[0][index] += 1
+            counts[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the duration of the `with` block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        lines = []
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Keeps the metrics of this process and renders them for /metrics."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=Histogram.DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+
+metrics = MetricsRegistry()
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "netatmo_http_request_duration_seconds", "Time to handle a request until the response is returned (streamed bodies excluded).",
+    ("method", "route", "status"))
+UPSTREAM_REQUEST_SECONDS = metrics.histogram(
+    "netatmo_upstream_request_duration_seconds", "Latency of requests to the Netatmo API.", ("endpoint",))
+UPSTREAM_REQUESTS = metrics.counter(
+    "netatmo_upstream_requests_total", "Requests to the Netatmo API by HTTP status (error: no response).", ("endpoint", "status"))
+TOKEN_REFRESHES = metrics.counter("netatmo_token_refreshes_total", "Access token refreshes by result.", ("result",))
+TOKEN_REFRESH_SECONDS = metrics.histogram("netatmo_token_refresh_duration_seconds", "Duration of access token refreshes.")
+EXTRACT_SECONDS = metrics.histogram(
+    "netatmo_extract_duration_seconds", "Time to turn one getstationsdata payload into database rows.")
+DB_INSERT_SECONDS = metrics.histogram(
+    "netatmo_db_insert_duration_seconds", "Latency of one multi-row INSERT statement.", ("table",))
+DB_INSERT_ROWS = metrics.counter("netatmo_db_insert_rows_total", "Rows sent in INSERT statements.", ("table",))
+MEASUREMENTS_STORED = metrics.counter(
+    "netatmo_measurements_total", "Station measurements by outcome (inserted or skipped as already stored).", ("result",))
+JOB_SECONDS = metrics.histogram("netatmo_job_duration_seconds", "Duration of scheduled jobs.", ("job",))
+JOB_LAG_SECONDS = metrics.histogram(
+    "netatmo_job_lag_seconds", "Delay between the scheduled and the actual start of a job.", ("job",),
+    buckets=(0.01, 0.1, 0.5, 1, 5, 15, 60, 300, 900))
+JOB_RUNS = metrics.counter("netatmo_job_runs_total", "Scheduled job runs by outcome (ok, error, missed).", ("job", "outcome"))
+JOB_LAST_SUCCESS = metrics.gauge(
+    "netatmo_job_last_success_timestamp_seconds", "Unix time of the last successful run of each job.", ("job",))
+DB_POOL_IN_USE = metrics.gauge("netatmo_db_pool_connections_in_use", "Pooled MySQL connections currently checked out.")
+DB_POOL_WAIT_SECONDS = metrics.histogram(
+    "netatmo_db_pool_wait_seconds", "Time a checkout waited for a free pooled MySQL connection.",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30))
+DB_POOL_EXHAUSTED = metrics.counter(
+    "netatmo_db_pool_exhausted_total", "Checkouts that gave up because no pooled connection became free in time.")
+DB_POOL_RECONNECTS = metrics.counter(
+    "netatmo_db_pool_reconnects_total", "Pooled connections reconnected on checkout after the server dropped them.")
+# Exported as 0 from the start, so that increase() sees the first exhaustion.
+DB_POOL_EXHAUSTED.inc(0)
+DB_POOL_RECONNECTS.inc(0)
+INGEST_QUEUE_DEPTH = metrics.gauge("netatmo_ingest_queue_depth", "Polled batches waiting for the database writer.")
+INGEST_SPOOLED_BATCHES = metrics.gauge("netatmo_ingest_spooled_batches", "Batches spilled to disk and not yet replayed.")
+INGEST_WRITERS_ALIVE = metrics.gauge("netatmo_ingest_writers_alive", "Database writer threads that are running.")
+INGEST_FAILED_BATCHES = metrics.counter(
+    "netatmo_ingest_failed_batches_total", "Batches set aside in the spool's failed directory after a non-database error.")
+COLLECTOR_LEADER = metrics.gauge("netatmo_collector_leader", "1 if this process runs the scheduler and holds the collector lease.")
+POLLS = metrics.counter("netatmo_polls_total", "Scheduled getstationsdata polls by result (new_data, no_new_data, error).", ("result",))
+POLL_CALLS_SAVED = metrics.counter(
+    "netatmo_poll_calls_saved_total", "Polls avoided compared with polling every POLL_MIN_INTERVAL seconds.")
+FRESHNESS_LAG_SECONDS = metrics.histogram(
+    "netatmo_data_freshness_lag_seconds", "Time between a station's reading (time_utc) and the poll that fetched it.",
+    buckets=(30, 60, 120, 180, 300, 450, 600, 900, 1800, 3600))
+POLL_NEXT_SECONDS = metrics.gauge("netatmo_poll_next_seconds", "Seconds until the next planned poll.")
+STATIONS_BACKING_OFF = metrics.gauge(
+    "netatmo_stations_backing_off", "Stations that are unreachable or sent no new reading when one was expected.")
+LIVE_SUBSCRIBERS = metrics.gauge("netatmo_live_subscribers", "Clients connected to /stream/measurements.")
+LIVE_EVENTS = metrics.counter("netatmo_live_events_total", "Measurement batches pushed to /stream/measurements clients.")
+ARCHIVED_POLLS = metrics.counter(
+    "netatmo_archived_polls_total", "Raw getstationsdata responses appended to the archive by result (ok, error).", ("result",))
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_duration(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=request.method, route=route,
+                                     status=response.status_code)
+    return response
+
+
+def upstream_request(endpoint, method, url, **kwargs):
+    """Sends a request to the Netatmo API, recording its latency and status code."""
+    started = time.perf_counter()
+    try:
+        response = requests.request(method, url, **kwargs)
+    except requests.RequestException:
+        UPSTREAM_REQUESTS.inc(endpoint=endpoint, status="error")
+        raise
+    finally:
+        UPSTREAM_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+    UPSTREAM_REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    return response
+
+
+class DatabasePool:
+    """Size-bounded pool of MySQL connections built from DB_CONFIG.
+
+    The underlying pool is created on first use, so importing the app does not require a running
+    database. Each checkout waits up to `timeout` seconds for a free connection, checks that the
+    connection is still alive (reconnecting if the server dropped it) and returns it to the pool
+    when the `with` block exits. Wait times and exhaustion are recorded in `stats`.
+    """
+
+    def __init__(self, config, size, timeout, name):
+        self.config = config
+        self.size = size
+        self.timeout = timeout
+        self.name = name
+        self._pool = None
+        self._init_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "checkouts": 0,
+            "in_use": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "exhausted": 0,
+            "reconnects": 0,
+        }
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._init_lock:
+                if self._pool is None:
+                    self._pool = pooling.MySQLConnectionPool(
+                        pool_name=self.name, pool_size=self.size, pool_reset_session=True, **self.config
+                    )
+        return self._pool
+
+    def _record(self, **changes):
+        with self._stats_lock:
+            for key, value in changes.items():
+                self.stats[key] += value
+
+    @contextmanager
+    def connection(self):
+        """Borrows a healthy connection from the pool for the duration of the `with` block."""
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            self._record(exhausted=1)
+            DB_POOL_EXHAUSTED.inc()
+            raise mysql_errors.PoolError(
+                f"Connection pool '{self.name}' exhausted: no connection free after {self.timeout}s"
+            )
+
+        try:
+            conn = self._get_pool().get_connection()
+        except Exception:
+            self._slots.release()
+            raise
+
+        waited = time.monotonic() - started
+        self._record(checkouts=1, in_use=1, wait_seconds_total=waited)
+        DB_POOL_WAIT_SECONDS.observe(waited)
+        with self._stats_lock:
+            self.stats["wait_seconds_max"] = max(self.stats["wait_seconds_max"], waited)
+
+        try:
+            # Health check on checkout: the server may have closed an idle connection
+            if not conn.is_connected():
+                conn.reconnect(attempts=2, delay=1)
+                self._record(reconnects=1)
+                DB_POOL_RECONNECTS.inc()
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except mysql_errors.Error:
+                pass
+            raise
+        finally:
+            try:
+                conn.close()  # Returns the connection to the pool
+            except mysql_errors.Error as e:
+                print(f"Failed to return connection to pool '{self.name}':", e)
+            self._record(in_use=-1)
+            self._slots.release()
+
+    @staticmethod
+    def discard_result(conn):
+        """Reads and drops the rest of an unbuffered result set abandoned half-way, so `conn` can go
+        back to the pool (the pool refuses to reset a session with unread rows)."""
+        try:
+            conn.consume_results()
+        except mysql_errors.Error as e:
+            print("Failed to discard the rest of a result set:", e)
+
+    def snapshot(self):
+        """Returns a copy of the pool statistics including the average checkout wait."""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["size"] = self.size
+        stats["wait_seconds_avg"] = stats["wait_seconds_total"] / stats["checkouts"] if stats["checkouts"] else 0.0
+        return stats
+
+
+db_pool = DatabasePool(DB_CONFIG, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_NAME)
+
+
+# Netatmo credentials and endpoints (initial values; the ones in use are shared through token_manager)
 CLIENT_ID = os.getenv("CLIENT_ID", "")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET", "")
 API_URL = os.getenv("API_URL", "https://api.netatmo.com/api/getstationsdata?get_favorites=true")
 TOKEN_URL = os.getenv("TOKEN_URL", "https://api.netatmo.com/oauth2/token")
 
-# Tokens
-ACCESS_TOKEN = os.getenv("ACCESS_TOKEN")
-REFRESH_TOKEN = os.getenv("REFRESH_TOKEN")
-TOKEN_EXPIRY = datetime.fromtimestamp(float(os.getenv("TOKEN_EXPIRY", datetime.now().timestamp())))
+# Seconds a fetched getstationsdata payload is reused by /get_data and /store_data
+UPSTREAM_CACHE_TTL = int(os.getenv("UPSTREAM_CACHE_TTL", "300"))
+
+# Tokens are refreshed in the background once they are this many seconds from expiring
+TOKEN_REFRESH_MARGIN = int(os.getenv("TOKEN_REFRESH_MARGIN", "600"))
+# Seconds between checks of the oauth_tokens table for tokens refreshed by another process
+TOKEN_SYNC_INTERVAL = int(os.getenv("TOKEN_SYNC_INTERVAL", "30"))
 
 
 @app.route("/")
@@ -39,11 +437,12 @@ def landing_page():
     """Landing page with links to all routes and connectivity status."""
 
     # Kontrola nastavenia ID a kľúčov
+    token_manager.sync()
     connection_status = {
-        "CLIENT_ID": CLIENT_ID is not None and CLIENT_ID != "",
-        "CLIENT_SECRET": CLIENT_SECRET is not None and CLIENT_SECRET != "",
-        "ACCESS_TOKEN": ACCESS_TOKEN is not None and ACCESS_TOKEN != "",
-        "TOKEN_EXPIRY": TOKEN_EXPIRY > datetime.now() if TOKEN_EXPIRY else False,
+        "CLIENT_ID": token_manager.client_id is not None and token_manager.client_id != "",
+        "CLIENT_SECRET": token_manager.client_secret is not None and token_manager.client_secret != "",
+        "ACCESS_TOKEN": token_manager.access_token is not None and token_manager.access_token != "",
+        "TOKEN_EXPIRY": not token_manager.needs_refresh(),
     }
     all_keys_set = all(connection_status.values())
 
@@ -71,147 +470,366 @@ def ensure_env_file_exists():
 
 @app.route("/initialize_tokens", methods=["GET", "POST"])
 def initialize_tokens():
-    """Webpage to initialize or update access/refresh tokens, client ID, client secret, and API endpoints."""
-    global ACCESS_TOKEN, REFRESH_TOKEN, CLIENT_ID, CLIENT_SECRET, TOKEN_EXPIRY, API_URL, TOKEN_URL
+    """Webpage to initialize or update access/refresh tokens, client ID, client secret, and API endpoints.
 
+    Everything entered is stored in the oauth_tokens table, so the collector and the other web workers use it too.
+    """
     if request.method == "POST":
         # Retrieve tokens, client credentials, and endpoints from form data
-        ACCESS_TOKEN = request.form.get("access_token")
-        REFRESH_TOKEN = request.form.get("refresh_token")
-        CLIENT_ID = request.form.get("client_id")
-        CLIENT_SECRET = request.form.get("client_secret")
-        new_api_url = request.form.get("api_url")
-        new_token_url = request.form.get("token_url")
-        TOKEN_EXPIRY = datetime.now() + timedelta(seconds=3600)  # Set token expiry to 1 hour
-        
+        access_token = request.form.get("access_token")
+        refresh_token = request.form.get("refresh_token")
+        token_expiry = datetime.now() + timedelta(seconds=3600)  # Set token expiry to 1 hour
+
         # Ensure .env exists before initializing tokens
         ensure_env_file_exists()
 
-        # Update environment file with new values, only if provided
-        update_env_file("ACCESS_TOKEN", ACCESS_TOKEN)
-        update_env_file("REFRESH_TOKEN", REFRESH_TOKEN)
-        if CLIENT_ID:
-            update_env_file("CLIENT_ID", CLIENT_ID)
-        if CLIENT_SECRET:
-            update_env_file("CLIENT_SECRET", CLIENT_SECRET)
-        if new_api_url:
-            API_URL = new_api_url
-            update_env_file("API_URL", API_URL)
-        if new_token_url:
-            TOKEN_URL = new_token_url
-            update_env_file("TOKEN_URL", TOKEN_URL)
-        update_env_file("TOKEN_EXPIRY", str(TOKEN_EXPIRY.timestamp()))
+        # Credentials and endpoints are only replaced if provided
+        settings = {key: request.form.get(key) for key in TokenManager.SETTINGS if request.form.get(key)}
+        token_manager.set_tokens(access_token, refresh_token, token_expiry, settings)
 
         return jsonify({"message": "Tokens, client credentials, and endpoints initialized successfully."})
 
     # Render the HTML form template with existing values for GET requests
-    return render_template("initialize_tokens.html", access_token=ACCESS_TOKEN, refresh_token=REFRESH_TOKEN,
-                           client_id=CLIENT_ID, client_secret=CLIENT_SECRET, api_url=API_URL, token_url=TOKEN_URL)
+    token_manager.sync()
+    return render_template("initialize_tokens.html", access_token=token_manager.access_token,
+                           refresh_token=token_manager.refresh_token, **token_manager.settings())
+
 
+def update_env_file(values, env_file_path=".env"):
+    """Updates key-value pairs in the .env file with a single atomic write.
 
-def update_env_file(key, value):
-    """Updates a key-value pair in the .env file."""
-    env_file_path = '.env'
+    The new content is written to a temporary file in the same directory and renamed over the
+    original, so readers never see a partially written file.
+    """
     new_lines = []
-    key_found = False
-    
-    # Read .env file and update the key if it exists
-    with open(env_file_path, 'r') as file:
-        for line in file:
-            if line.startswith(key + "="):
-                new_lines.append(f"{key}={value}\n")
-                key_found = True
-            else:
-                new_lines.append(line)
-    
-    # If key is not found, add it to the end
-    if not key_found:
+    remaining = dict(values)
+
+    # Read .env file and update the keys that exist
+    if os.path.exists(env_file_path):
+        with open(env_file_path, 'r') as file:
+            for line in file:
+                key = line.split("=", 1)[0]
+                if "=" in line and key in remaining:
+                    new_lines.append(f"{key}={remaining.pop(key)}\n")
+                else:
+                    new_lines.append(line)
+
+    # Keys that were not found are added to the end
+    for key, value in remaining.items():
         new_lines.append(f"{key}={value}\n")
-    
-    # Write the updated content back to the .env file
-    with open(env_file_path, 'w') as file:
-        file.writelines(new_lines)
-
-
-def refresh_access_token():
-    """Refreshes the access token using the refresh token."""
-    global ACCESS_TOKEN, REFRESH_TOKEN, TOKEN_EXPIRY
-    data = {
-        "grant_type": "refresh_token",
-        "refresh_token": REFRESH_TOKEN,
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET
-    }
-    response = requests.post(TOKEN_URL, data=data)
-    
-    if response.status_code == 200:
-        tokens = response.json()
-        ACCESS_TOKEN = tokens["access_token"]
-        REFRESH_TOKEN = tokens.get("refresh_token", REFRESH_TOKEN)
-        expires_in = tokens.get("expires_in", 3600)
-        TOKEN_EXPIRY = datetime.now() + timedelta(seconds=expires_in)
-        
-        update_env_file("ACCESS_TOKEN", ACCESS_TOKEN)
-        update_env_file("REFRESH_TOKEN", REFRESH_TOKEN)
-        update_env_file("TOKEN_EXPIRY", str(TOKEN_EXPIRY.timestamp()))
-    else:
-        print("Failed to refresh access token:", response.json())
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(env_file_path)), prefix=".env.")
+    try:
+        with os.fdopen(fd, 'w') as file:
+            file.writelines(new_lines)
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(env_file_path):
+            os.chmod(tmp_path, os.stat(env_file_path).st_mode & 0o777)  # mkstemp creates the file as 0600
+        os.replace(tmp_path, env_file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class TokenManager:
+    """Holds the Netatmo OAuth tokens and refreshes them one caller at a time.
+
+    Netatmo invalidates the old refresh token on every refresh, so all processes (web workers and
+    collectors) share one token pair in the oauth_tokens table. Each process re-reads it at most
+    every `sync_interval` seconds and whenever its access token has expired; a newer version in the
+    table replaces the tokens in memory. Only the holder of the collector lease refreshes and writes
+    the rotated pair (the scheduler calls refresh_if_due() ahead of expiry), so user-facing requests
+    normally never wait for the token endpoint. Within a process only one refresh runs at any
+    moment; callers that arrive while it is running wait for it and reuse its result. The client
+    credentials and API endpoints (SETTINGS) are shared the same way, so the ones entered on
+    /initialize_tokens reach the collector. Without the table (see migrations/) everything is kept
+    per process as before.
+    """
+
+    # Shared settings next to the tokens: attribute and column name -> .env key
+    SETTINGS = {"client_id": "CLIENT_ID", "client_secret": "CLIENT_SECRET", "api_url": "API_URL", "token_url": "TOKEN_URL"}
+
+    def __init__(self, access_token, refresh_token, expiry, margin, sync_interval, name="netatmo", **settings):
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expiry = expiry
+        for key in self.SETTINGS:
+            setattr(self, key, settings.get(key))
+        self.margin = margin
+        self.sync_interval = sync_interval
+        self.name = name
+        self.shared = True
+        self.version = 0  # Version of the oauth_tokens row the tokens in memory come from
+        self._synced_at = None
+        self._lock = threading.Lock()
+        self._attempts = 0
+        self.stats = {"refreshes": 0, "failures": 0, "reloads": 0, "sync_errors": 0}
+
+    def needs_refresh(self, margin=0):
+        """Returns True if the access token expires within `margin` seconds."""
+        return datetime.now() >= self.expiry - timedelta(seconds=margin)
+
+    def get_access_token(self):
+        """Returns the access token, refreshing it first only if it has already expired."""
+        self.sync()
+        if self.needs_refresh():
+            self.refresh()
+        return self.access_token
+
+    def refresh_if_due(self):
+        """Refreshes the tokens proactively when they are within the configured margin of expiring."""
+        self.sync()
+        if self.needs_refresh(self.margin):
+            self.refresh(self.margin)
+
+    def sync(self, force=False):
+        """Loads the shared tokens if another process stored a newer version since the last check.
+
+        An empty table is seeded with the tokens and settings this process started with (from the
+        environment); settings left empty in the table keep the values of this process.
+        """
+        if not self.shared or (not force and self._synced_at is not None
+                               and time.monotonic() - self._synced_at < self.sync_interval):
+            return
+        self._synced_at = time.monotonic()
+        select = (f"SELECT access_token, refresh_token, expires_at, version, {', '.join(self.SETTINGS)} "
+                  f"FROM oauth_tokens WHERE name = %s")
+        try:
+            with db_pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(select, (self.name,))
+                row = cursor.fetchone()
+                if row is None and self.refresh_token:
+                    cursor.execute(
+                        f"INSERT IGNORE INTO oauth_tokens (name, access_token, refresh_token, expires_at, version, "
+                        f"{', '.join(self.SETTINGS)}) VALUES (%s, %s, %s, %s, 1{', %s' * len(self.SETTINGS)})",
+                        (self.name, self.access_token, self.refresh_token, self.expiry) + tuple(self.settings().values()))
+                    conn.commit()
+                    cursor.execute(select, (self.name,))
+                    row = cursor.fetchone()
+                cursor.close()
+        except mysql_errors.Error as e:
+            if getattr(e, "errno", None) == errorcode.ER_NO_SUCH_TABLE:
+                print("Table oauth_tokens is missing (see migrations/), keeping the tokens per process.")
+                self.shared = False
+                return
+            self.stats["sync_errors"] += 1
+            print("Could not load the shared tokens:", e)
+            return
+        if row and row[3] > self.version:
+            self.access_token, self.refresh_token, self.expiry, self.version = row[:4]
+            for key, value in zip(self.SETTINGS, row[4:]):
+                if value:
+                    setattr(self, key, value)
+            self.stats["reloads"] += 1
+
+    def settings(self):
+        """Returns the client credentials and API endpoints in use."""
+        return {key: getattr(self, key) for key in self.SETTINGS}
+
+    def may_refresh(self):
+        """Returns True if this process is the one that refreshes the shared tokens."""
+        return not self.shared or collector_lease.held()
+
+    def refresh(self, margin=0):
+        """Refreshes the access token using the refresh token, unless another caller or process just did."""
+        attempts_seen = self._attempts
+        with self._lock:
+            # A refresh finished (or failed) while this caller waited for the lock: use its result
+            if self._attempts != attempts_seen or not self.needs_refresh(margin):
+                return
+            self.sync(force=True)
+            if not self.needs_refresh(margin):
+                return  # Refreshed by the lease holder
+            if not self.may_refresh():
+                print("The access token has expired; waiting for the collector holding the lease to refresh it.")
+                return
+            self._attempts += 1
+
+            data = {
+                "grant_type": "refresh_token",
+                "refresh_token": self.refresh_token,
+                "client_id": self.client_id,
+                "client_secret": self.client_secret
+            }
+            with TOKEN_REFRESH_SECONDS.time():
+                response = upstream_request("token", "POST", self.token_url, data=data)
+
+            if response.status_code != 200:
+                self.stats["failures"] += 1
+                TOKEN_REFRESHES.inc(result="failure")
+                print("Failed to refresh access token:", response.json())
+                return
+
+            tokens = response.json()
+            expiry = datetime.now() + timedelta(seconds=tokens.get("expires_in", 3600))
+            self._store(tokens["access_token"], tokens.get("refresh_token", self.refresh_token), expiry)
+            self.stats["refreshes"] += 1
+            TOKEN_REFRESHES.inc(result="success")
+
+    def set_tokens(self, access_token, refresh_token, expiry, settings=None):
+        """Replaces the tokens (e.g. from /initialize_tokens) and the given SETTINGS, and persists them."""
+        with self._lock:
+            self._store(access_token, refresh_token, expiry, settings)
+
+    def _store(self, access_token, refresh_token, expiry, settings=None):
+        settings = settings or {}
+        self.access_token, self.refresh_token, self.expiry = access_token, refresh_token, expiry
+        for key, value in settings.items():
+            setattr(self, key, value)
+        if self.shared:
+            # Settings not given are kept as they are in the table
+            keep = ", ".join(f"{key} = COALESCE(VALUES({key}), {key})" for key in self.SETTINGS)
+            try:
+                with db_pool.connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(
+                        f"INSERT INTO oauth_tokens (name, access_token, refresh_token, expires_at, version, "
+                        f"{', '.join(self.SETTINGS)}) VALUES (%s, %s, %s, %s, 1{', %s' * len(self.SETTINGS)}) "
+                        f"ON DUPLICATE KEY UPDATE access_token = VALUES(access_token), refresh_token = VALUES(refresh_token), "
+                        f"expires_at = VALUES(expires_at), {keep}, version = version + 1",
+                        (self.name, access_token, refresh_token, expiry) + tuple(settings.get(key) for key in self.SETTINGS)
+                    )
+                    cursor.execute("SELECT version FROM oauth_tokens WHERE name = %s", (self.name,))
+                    self.version = cursor.fetchone()[0]
+                    conn.commit()
+                    cursor.close()
+            except mysql_errors.Error as e:
+                self.stats["sync_errors"] += 1
+                print("Could not store the shared tokens, other processes keep the old ones:", e)
+        update_env_file(dict({self.SETTINGS[key]: value for key, value in settings.items()}, ACCESS_TOKEN=access_token,
+                             REFRESH_TOKEN=refresh_token, TOKEN_EXPIRY=str(expiry.timestamp())))
+
+    def snapshot(self):
+        return dict(self.stats, shared=self.shared, version=self.version, expires_at=self.expiry.isoformat())
+
+
+token_manager = TokenManager(
+    os.getenv("ACCESS_TOKEN"),
+    os.getenv("REFRESH_TOKEN"),
+    datetime.fromtimestamp(float(os.getenv("TOKEN_EXPIRY") or datetime.now().timestamp())),
+    TOKEN_REFRESH_MARGIN,
+    TOKEN_SYNC_INTERVAL,
+    client_id=CLIENT_ID,
+    client_secret=CLIENT_SECRET,
+    api_url=API_URL,
+    token_url=TOKEN_URL,
+)
+
+
+# dashboard_data key -> column of the module_measurements table (and of measurements, except CO2)
+DASHBOARD_FIELDS = {
+    "Temperature": "temperature", "Humidity": "humidity", "CO2": "co2", "Noise": "noise",
+    "Pressure": "pressure", "AbsolutePressure": "absolute_pressure", "min_temp": "min_temp", "max_temp": "max_temp",
+    "Rain": "rain", "sum_rain_1": "sum_rain_1", "sum_rain_24": "sum_rain_24",
+    "WindStrength": "wind_strength", "WindAngle": "wind_angle", "GustStrength": "gust_strength", "GustAngle": "gust_angle",
+}
+
+# One reading of one module (the base station counts as a module with module_id = station_id).
+# The field order matches the columns of MODULE_MEASUREMENT_QUERY, so readings are passed to the writer as they are.
+ModuleReading = collections.namedtuple(
+    "ModuleReading", ("module_id", "station_id", "module_type", "measured_at") + tuple(DASHBOARD_FIELDS.values())
+)
+_FIELD_POSITIONS = {key: index for index, key in enumerate(DASHBOARD_FIELDS)}
+
+# measurements column -> module types it is taken from, in order of preference. A station reports
+# temperature and humidity both from the outdoor (NAModule1) and the indoor modules; the outdoor
+# value always wins, whatever the order of the modules in the payload.
+STATION_FIELD_SOURCES = {
+    "pressure": ("NAMain",), "absolute_pressure": ("NAMain",), "noise": ("NAMain",),
+    "temperature": ("NAModule1", "NAModule4"), "humidity": ("NAModule1", "NAModule4"),
+    "min_temp": ("NAModule1", "NAModule4"), "max_temp": ("NAModule1", "NAModule4"),
+    "rain": ("NAModule3",), "sum_rain_1": ("NAModule3",), "sum_rain_24": ("NAModule3",),
+    "wind_strength": ("NAModule2",), "wind_angle": ("NAModule2",),
+    "gust_strength": ("NAModule2",), "gust_angle": ("NAModule2",),
+}
+_STATION_FIELD_POSITIONS = tuple(
+    (column, ModuleReading._fields.index(column), sources) for column, sources in STATION_FIELD_SOURCES.items()
+)
+
+
+@functools.lru_cache(maxsize=4096)
+def format_utc(timestamp):
+    """Formats a Unix timestamp as a UTC DATETIME string (None stays None); a poll repeats the same few timestamps."""
+    return datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S') if timestamp else None
+
+
+def read_module(module_id, station_id, module_type, dashboard_data):
+    """Maps one dashboard_data dict to a ModuleReading, or returns None if it carries no timestamp."""
+    measured_at = format_utc(dashboard_data.get("time_utc"))
+    if measured_at is None:
+        return None
+    values = [None] * len(DASHBOARD_FIELDS)
+    for key, value in dashboard_data.items():
+        position = _FIELD_POSITIONS.get(key)
+        if position is not None:
+            values[position] = value
+    return ModuleReading(module_id, station_id, module_type, measured_at, *values)
+
+
+def empty_measurement(station_id, measured_at):
+    """Returns a measurements row with every value and value timestamp set to None."""
+    measurement = {"station_id": station_id, "measured_at": measured_at}
+    for column in MEASUREMENT_VALUE_COLUMNS:
+        measurement[column] = None
+        measurement[f"time_utc_{column}"] = None
+    return measurement
+
+
+def place_coordinates(place):
+    """Returns (latitude, longitude) of a Netatmo place, whose location is [longitude, latitude]."""
+    location = (place or {}).get("location")
+    if not location or len(location) != 2:
+        return None, None
+    return location[1], location[0]
 
 
 def extract_data(device_data):
-    """Extracts station, device-level measurements, and module information from raw API data for a single device."""
-    
-    # Debug: Check the raw data coming in
-    print("Extracting data for device:", device_data.get("_id"))
-    print("Raw device dashboard data:", device_data.get("dashboard_data"))
+    """Extracts station, device-level measurements, module information and per-module readings from raw API data for a single device.
+
+    The station-level measurement takes every value from the preferred module type listed in
+    STATION_FIELD_SOURCES; the readings of all modules (including the base station) are returned
+    unmerged as ModuleReading tuples for the module_measurements table.
+    """
+    station_id = device_data.get("_id")
+    app.logger.debug("Extracting data for device %s, dashboard data: %s", station_id, device_data.get("dashboard_data"))
 
     # Extract information specific to the station
+    user = device_data.get("user", {})
+    latitude, longitude = place_coordinates(device_data.get("place"))
     station_info = {
-        "station_id": device_data.get("_id"),
+        "station_id": station_id,
         "station_name": device_data.get("station_name"),
-        "date_setup": datetime.utcfromtimestamp(device_data.get("date_setup")).strftime('%Y-%m-%d %H:%M:%S') if device_data.get("date_setup") else None,
-        "last_setup": datetime.utcfromtimestamp(device_data.get("last_setup")).strftime('%Y-%m-%d %H:%M:%S') if device_data.get("last_setup") else None,
+        "date_setup": format_utc(device_data.get("date_setup")),
+        "last_setup": format_utc(device_data.get("last_setup")),
         "type": device_data.get("type"),
         "module_name": device_data.get("module_name"),
         "firmware": device_data.get("firmware"),
-        "last_upgrade": datetime.utcfromtimestamp(device_data.get("last_upgrade")).strftime('%Y-%m-%d %H:%M:%S') if device_data.get("last_upgrade") else None,
+        "last_upgrade": format_utc(device_data.get("last_upgrade")),
         "wifi_status": device_data.get("wifi_status"),
         "reachable": device_data.get("reachable"),
         "co2_calibrating": device_data.get("co2_calibrating"),
         "place": json.dumps(device_data.get("place")),
+        "latitude": latitude,
+        "longitude": longitude,
         "home_id": device_data.get("home_id"),
         "home_name": device_data.get("home_name"),
-        "user_mail": device_data.get("user", {}).get("mail"),
-        "user_administrative": json.dumps(device_data.get("user", {}).get("administrative"))
+        "user_mail": user.get("mail"),
+        "user_administrative": json.dumps(user.get("administrative"))
     }
 
-    # Device-level measurement data with initialized None values
-    device_measurement = {
-        "station_id": device_data.get("_id"),
-        "pressure": device_data.get("dashboard_data", {}).get("Pressure"),
-        "time_utc_pressure": datetime.utcfromtimestamp(device_data.get("dashboard_data", {}).get("time_utc")).strftime('%Y-%m-%d %H:%M:%S') if device_data.get("dashboard_data", {}).get("time_utc") else None,
-        "absolute_pressure": device_data.get("dashboard_data", {}).get("AbsolutePressure"),
-        "time_utc_absolute_pressure": datetime.utcfromtimestamp(device_data.get("dashboard_data", {}).get("time_utc")).strftime('%Y-%m-%d %H:%M:%S') if device_data.get("dashboard_data", {}).get("time_utc") else None,
-        "temperature": None, "time_utc_temperature": None,
-        "humidity": None, "time_utc_humidity": None,
-        "noise": None, "time_utc_noise": None,
-        "min_temp": None, "time_utc_min_temp": None,
-        "max_temp": None, "time_utc_max_temp": None,
-        "rain": None, "time_utc_rain": None,
-        "sum_rain_1": None, "time_utc_sum_rain_1": None,
-        "sum_rain_24": None, "time_utc_sum_rain_24": None,
-        "wind_strength": None, "time_utc_wind_strength": None,
-        "wind_angle": None, "time_utc_wind_angle": None,
-        "gust_strength": None, "time_utc_gust_strength": None,
-        "gust_angle": None, "time_utc_gust_angle": None
-    }
+    # Readings of the base station and of every module that sent data
+    readings = []
+    base_reading = read_module(station_id, station_id, device_data.get("type") or "NAMain", device_data.get("dashboard_data", {}))
+    if base_reading:
+        readings.append(base_reading)
 
-    # Extract module information for each module in the station
     modules_data = []
     for module in device_data.get("modules", []):
         module_info = {
             "module_id": module.get("_id"),
-            "station_id": device_data.get("_id"),
+            "station_id": station_id,
             "type": module.get("type"),
             "data_type": json.dumps(module.get("data_type")),
             "reachable": module.get("reachable"),
@@ -220,94 +838,75 @@ def extract_data(device_data):
             "last_seen": module.get("last_seen"),
         }
         modules_data.append(module_info)
-        
-        # Update device_measurement with module-specific data if available
-        dashboard_data = module.get("dashboard_data", {})
-        
-        # Nastavte spoločný čas pre tento modul (ak existuje)
-        time_utc = dashboard_data.get("time_utc")
-        formatted_time = datetime.utcfromtimestamp(time_utc).strftime('%Y-%m-%d %H:%M:%S') if time_utc else None
-
-        # Skontrolujte dostupnosť jednotlivých dát v module a nastavte ich s príslušným časom
-        if "Temperature" in dashboard_data:
-            device_measurement["temperature"] = dashboard_data["Temperature"]
-            device_measurement["time_utc_temperature"] = formatted_time
-
-        if "Humidity" in dashboard_data:
-            device_measurement["humidity"] = dashboard_data["Humidity"]
-            device_measurement["time_utc_humidity"] = formatted_time
 
-        if "Noise" in dashboard_data:
-            device_measurement["noise"] = dashboard_data["Noise"]
-            device_measurement["time_utc_noise"] = formatted_time
+        reading = read_module(module_info["module_id"], station_id, module_info["type"], module.get("dashboard_data", {}))
+        if reading:
+            readings.append(reading)
 
-        if "min_temp" in dashboard_data:
-            device_measurement["min_temp"] = dashboard_data["min_temp"]
-            device_measurement["time_utc_min_temp"] = formatted_time
+    # Station-level measurement: each value with its own timestamp, taken from the preferred module type
+    device_measurement = empty_measurement(station_id, None)
+    by_type = {}
+    for reading in sorted(readings, key=lambda r: r.module_id):  # Independent of the module order in the payload
+        by_type.setdefault(reading.module_type, []).append(reading)
+    for column, position, sources in _STATION_FIELD_POSITIONS:
+        for module_type in sources:
+            reading = next((r for r in by_type.get(module_type, ()) if r[position] is not None), None)
+            if reading:
+                device_measurement[column] = reading[position]
+                device_measurement[f"time_utc_{column}"] = reading.measured_at
+                break
 
-        if "max_temp" in dashboard_data:
-            device_measurement["max_temp"] = dashboard_data["max_temp"]
-            device_measurement["time_utc_max_temp"] = formatted_time
+    # Canonical time of the reading: the newest of the per-value timestamps (None if the station sent no data)
+    reading_times = [device_measurement[f"time_utc_{column}"] for column in STATION_FIELD_SOURCES
+                     if device_measurement[f"time_utc_{column}"]]
+    device_measurement["measured_at"] = max(reading_times) if reading_times else None
 
-        if "Rain" in dashboard_data:
-            device_measurement["rain"] = dashboard_data["Rain"]
-            device_measurement["time_utc_rain"] = formatted_time
+    return station_info, device_measurement, modules_data, readings
 
-        if "sum_rain_1" in dashboard_data:
-            device_measurement["sum_rain_1"] = dashboard_data["sum_rain_1"]
-            device_measurement["time_utc_sum_rain_1"] = formatted_time
 
-        if "sum_rain_24" in dashboard_data:
-            device_measurement["sum_rain_24"] = dashboard_data["sum_rain_24"]
-            device_measurement["time_utc_sum_rain_24"] = formatted_time
+class UpstreamError(Exception):
+    """Raised when the Netatmo API answers with a non-200 status."""
 
-        if "WindStrength" in dashboard_data:
-            device_measurement["wind_strength"] = dashboard_data["WindStrength"]
-            device_measurement["time_utc_wind_strength"] = formatted_time
+    def __init__(self, status_code, details):
+        super().__init__(f"API request failed with status {status_code}")
+        self.status_code = status_code
+        self.details = details
 
-        if "WindAngle" in dashboard_data:
-            device_measurement["wind_angle"] = dashboard_data["WindAngle"]
-            device_measurement["time_utc_wind_angle"] = formatted_time
-
-        if "GustStrength" in dashboard_data:
-            device_measurement["gust_strength"] = dashboard_data["GustStrength"]
-            device_measurement["time_utc_gust_strength"] = formatted_time
-
-        if "GustAngle" in dashboard_data:
-            device_measurement["gust_angle"] = dashboard_data["GustAngle"]
-            device_measurement["time_utc_gust_angle"] = formatted_time
-
-    
-    return station_info, device_measurement, modules_data
-
-
-@app.route("/get_data", methods=["GET"])
-def get_data():
-    """Fetches weather data from Netatmo API and returns it as JSON."""
-    if datetime.now() >= TOKEN_EXPIRY:
-        refresh_access_token()
 
+def fetch_station_data():
+    """Requests getstationsdata from the Netatmo API and returns the parsed payload."""
     headers = {
-        "Authorization": f"Bearer {ACCESS_TOKEN}",
+        "Authorization": f"Bearer {token_manager.get_access_token()}",
         "accept": "application/json"
     }
-    response = requests.get(API_URL, headers=headers)
-    
+    response = upstream_request("getstationsdata", "GET", token_manager.api_url, headers=headers)
+
     if response.status_code != 200:
-        return jsonify({"error": "API request failed", "details": response.json()}), response.status_code
-    
-    data = response.json()
-    #print("Raw API Response:", json.dumps(data, indent=2))  # Debugging line to inspect the raw data
+        raise UpstreamError(response.status_code, response.json())
+
+    payload = response.json()
+    # Kept as received, so later versions of extract_data can be rerun over it (see replay_archive)
+    raw_archive.append(response.content, devices=len(payload.get("body", {}).get("devices", [])))
+    return payload
+
 
-    # Initialize a dictionary to hold all data organized by station_id
+def organize_station_data(data):
+    """Runs extract_data over every device of a getstationsdata payload.
+
+    Returns the rows for the database writer and the same data organized by station_id for /get_data.
+    """
+    stations, measurements, modules, module_readings = [], [], [], []
     combined_data = {}
 
-    # Loop through each device and extract data
     for device in data.get("body", {}).get("devices", []):
-        station_info, device_measurement, modules_data = extract_data(device)
-        station_id = station_info["station_id"]
+        station_info, device_measurement, modules_data, readings = extract_data(device)
+        stations.append(station_info)
+        measurements.append(device_measurement)
+        modules.extend(modules_data)
+        module_readings.extend(readings)
 
         # Initialize or update the station entry in combined_data
+        station_id = station_info["station_id"]
         if station_id not in combined_data:
             combined_data[station_id] = {
                 "station_info": station_info,
@@ -319,113 +918,554 @@ def get_data():
         combined_data[station_id]["device_measurements"].append(device_measurement)
         combined_data[station_id]["modules_data"].extend(modules_data)
 
+    return (stations, measurements, modules, module_readings), combined_data
+
+
+class UpstreamCache:
+    """Process-wide cache of the last getstationsdata payload and the output of extract_data.
+
+    Entries are reused for `ttl` seconds. Concurrent misses wait for a single upstream request.
+    Every fetched payload is also stored (gzipped) in the upstream_cache table, and a process whose
+    entry expired first takes a payload younger than `ttl` from there, so the collector's polls and
+    one web worker's fetch serve all web workers instead of each calling Netatmo itself.
+    The /get_data JSON body and its ETag are computed once per refresh; the ETag and Last-Modified
+    only change when the upstream data actually changed.
+    """
+
+    def __init__(self, ttl, name="getstationsdata"):
+        self.ttl = ttl
+        self.name = name
+        self.shared = True
+        self._entry = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()  # Not self._lock: hits must not wait for a refresh in progress
+        self.stats = {"hits": 0, "misses": 0, "refreshes": 0, "shared_hits": 0, "shared_errors": 0}
+
+    def _record(self, **changes):
+        with self._stats_lock:
+            for key, value in changes.items():
+                self.stats[key] += value
+
+    def _fresh(self):
+        return self._entry is not None and time.monotonic() - self._entry["loaded_at"] < self.ttl
+
+    def get(self, force_refresh=False):
+        """Returns the cached entry, fetching a new payload if it expired or `force_refresh` is set."""
+        if not force_refresh and self._fresh():
+            self._record(hits=1)
+            return self._entry
+
+        with self._lock:
+            # Another thread may have refreshed the entry while this one waited for the lock
+            if not force_refresh and self._fresh():
+                self._record(hits=1)
+                return self._entry
+            shared = None if force_refresh else self._load_shared()
+            if shared:
+                payload, age = shared
+                self._record(shared_hits=1)
+            else:
+                self._record(misses=1)
+                payload, age = fetch_station_data(), 0.0
+                self._store_shared(payload)
+            with EXTRACT_SECONDS.time():
+                rows, combined_data = organize_station_data(payload)
+            body = json.dumps(combined_data, indent=2)
+            etag = hashlib.sha1(body.encode()).hexdigest()
+            previous = self._entry
+            self._entry = {
+                "payload": payload,
+                "rows": rows,
+                "body": body,
+                "etag": etag,
+                "last_modified": previous["last_modified"] if previous and previous["etag"] == etag
+                else datetime.now(timezone.utc).replace(microsecond=0),
+                "loaded_at": time.monotonic() - age,
+            }
+            self._record(refreshes=1)
+            return self._entry
+
+    def _load_shared(self):
+        """Returns the payload another process fetched less than ttl seconds ago and its age, or None."""
+        if not self.shared:
+            return None
+        try:
+            with db_pool.connection() as conn:
+                cursor = conn.cursor()
+                # Age by the database clock, so the processes' clocks do not need to agree
+                cursor.execute("SELECT payload, TIMESTAMPDIFF(MICROSECOND, fetched_at, NOW(6)) FROM upstream_cache "
+                               "WHERE name = %s AND fetched_at > NOW(6) - INTERVAL %s SECOND", (self.name, self.ttl))
+                row = cursor.fetchone()
+                cursor.close()
+        except mysql_errors.Error as e:
+            self._shared_error(e)
+            return None
+        if row is None:
+            return None
+        return json.loads(gzip.decompress(row[0])), row[1] / 1e6
+
+    def _store_shared(self, payload):
+        if not self.shared:
+            return
+        try:
+            with db_pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("INSERT INTO upstream_cache (name, payload, fetched_at) VALUES (%s, %s, NOW(6)) "
+                               "ON DUPLICATE KEY UPDATE payload = VALUES(payload), fetched_at = VALUES(fetched_at)",
+                               (self.name, gzip.compress(json.dumps(payload).encode(), compresslevel=1)))
+                conn.commit()
+                cursor.close()
+        except mysql_errors.Error as e:
+            self._shared_error(e)
+
+    def _shared_error(self, e):
+        if getattr(e, "errno", None) == errorcode.ER_NO_SUCH_TABLE:
+            print("Table upstream_cache is missing (see migrations/), caching the Netatmo payload per process.")
+            self.shared = False
+        else:
+            self._record(shared_errors=1)
+            print("Could not share the Netatmo payload:", e)
+
+    def snapshot(self):
+        """Returns cache statistics and the age of the cached payload."""
+        entry = self._entry
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return dict(stats, ttl=self.ttl, shared=self.shared,
+                    age_seconds=round(time.monotonic() - entry["loaded_at"], 1) if entry else None)
+
+
+upstream_cache = UpstreamCache(UPSTREAM_CACHE_TTL)
+
+
+@app.route("/get_data", methods=["GET"])
+def get_data():
+    """Returns the latest weather data from the Netatmo API as JSON, served from the shared cache.
+
+    Responses carry ETag and Last-Modified headers, so clients can revalidate with a 304.
+    """
+    try:
+        entry = upstream_cache.get()
+    except UpstreamError as e:
+        return jsonify({"error": "API request failed", "details": e.details}), e.status_code
+
     # Return the combined data, organized by station_id
-    return Response(json.dumps(combined_data, indent=2), mimetype='application/json')
+    response = Response(entry["body"], mimetype='application/json')
+    response.set_etag(entry["etag"])
+    response.last_modified = entry["last_modified"]
+    response.cache_control.max_age = max(0, int(upstream_cache.ttl - (time.monotonic() - entry["loaded_at"])))
+    return response.make_conditional(request)
+
+
+def poll_and_store(force_refresh=False):
+    """Stores the current upstream data in the database and returns the number of stations and the insert counts."""
+    stations, measurements, modules, module_readings = upstream_cache.get(force_refresh)["rows"]
+
+    # Write the rows of every device in the poll in a single transaction
+    result = store_batch_in_db(stations, measurements, modules, module_readings=module_readings)
+    print(f"Stored poll of {len(stations)} stations: {result['inserted']} measurements inserted, {result['skipped']} skipped.")
+    return dict(result, stations=len(stations))
 
 
 @app.route("/store_data", methods=["GET"])
 def store_data():
-    """Fetches, organizes, and stores weather data from Netatmo API into the database."""
-    if datetime.now() >= TOKEN_EXPIRY:
-        refresh_access_token()
+    """Fetches, organizes, and stores weather data from Netatmo API into the database.
 
-    headers = {
-        "Authorization": f"Bearer {ACCESS_TOKEN}",
-        "accept": "application/json"
-    }
-    response = requests.get(API_URL, headers=headers)
+    Uses the cached upstream payload if it is younger than UPSTREAM_CACHE_TTL; the scheduler always refreshes it.
+    """
+    try:
+        result = poll_and_store()
+    except UpstreamError as e:
+        return jsonify({"error": "API request failed", "details": e.details}), e.status_code
+
+    return jsonify({"message": "Data successfully stored in the database.", **result})
+
+
+# Insert or update station data
+WEATHER_STATION_QUERY = """
+INSERT INTO weather_station (station_id, station_name, date_setup, last_setup, type, module_name, firmware,
+                             last_upgrade, wifi_status, reachable, co2_calibrating, place, latitude, longitude,
+                             home_id, home_name, user_mail, user_administrative)
+VALUES (%(station_id)s, %(station_name)s, %(date_setup)s, %(last_setup)s, %(type)s, %(module_name)s, %(firmware)s,
+        %(last_upgrade)s, %(wifi_status)s, %(reachable)s, %(co2_calibrating)s, %(place)s, %(latitude)s, %(longitude)s,
+        %(home_id)s, %(home_name)s, %(user_mail)s, %(user_administrative)s)
+ON DUPLICATE KEY UPDATE
+    station_name=VALUES(station_name), date_setup=VALUES(date_setup), last_setup=VALUES(last_setup),
+    type=VALUES(type), module_name=VALUES(module_name), firmware=VALUES(firmware), last_upgrade=VALUES(last_upgrade),
+    wifi_status=VALUES(wifi_status), reachable=VALUES(reachable), co2_calibrating=VALUES(co2_calibrating),
+    place=VALUES(place), latitude=VALUES(latitude), longitude=VALUES(longitude),
+    home_id=VALUES(home_id), home_name=VALUES(home_name),
+    user_mail=VALUES(user_mail), user_administrative=VALUES(user_administrative)
+"""
+
+# Value columns of the measurements table; each has a time_utc_<column> companion
+MEASUREMENT_VALUE_COLUMNS = (
+    "pressure", "absolute_pressure", "temperature", "humidity", "noise", "min_temp", "max_temp", "rain",
+    "sum_rain_1", "sum_rain_24", "wind_strength", "wind_angle", "gust_strength", "gust_angle",
+)
+
+# Insert measurement data. The no-op ON DUPLICATE KEY UPDATE drops readings already stored under the
+# (station_id, measured_at) unique key; INSERT IGNORE would do the same but is not batched by executemany().
+MEASUREMENT_QUERY = """
+INSERT INTO measurements (station_id, measured_at, pressure, time_utc_pressure, absolute_pressure, time_utc_absolute_pressure,
+                          temperature, time_utc_temperature, humidity, time_utc_humidity, noise, time_utc_noise,
+                          min_temp, time_utc_min_temp, max_temp, time_utc_max_temp, rain, time_utc_rain,
+                          sum_rain_1, time_utc_sum_rain_1, sum_rain_24, time_utc_sum_rain_24, wind_strength,
+                          time_utc_wind_strength, wind_angle, time_utc_wind_angle, gust_strength, time_utc_gust_strength,
+                          gust_angle, time_utc_gust_angle)
+VALUES (%(station_id)s, %(measured_at)s, %(pressure)s, %(time_utc_pressure)s, %(absolute_pressure)s, %(time_utc_absolute_pressure)s,
+        %(temperature)s, %(time_utc_temperature)s, %(humidity)s, %(time_utc_humidity)s, %(noise)s, %(time_utc_noise)s,
+        %(min_temp)s, %(time_utc_min_temp)s, %(max_temp)s, %(time_utc_max_temp)s, %(rain)s, %(time_utc_rain)s,
+        %(sum_rain_1)s, %(time_utc_sum_rain_1)s, %(sum_rain_24)s, %(time_utc_sum_rain_24)s, %(wind_strength)s,
+        %(time_utc_wind_strength)s, %(wind_angle)s, %(time_utc_wind_angle)s, %(gust_strength)s, %(time_utc_gust_strength)s,
+        %(gust_angle)s, %(time_utc_gust_angle)s)
+ON DUPLICATE KEY UPDATE id=id
+"""
+
+# Insert or update module data
+MODULE_QUERY = """
+INSERT INTO weather_station_modules (
+    module_id, station_id, type, data_type, reachable, firmware, last_message, last_seen
+) VALUES (
+    %(module_id)s, %(station_id)s, %(type)s, %(data_type)s, %(reachable)s, %(firmware)s,
+    %(last_message)s, %(last_seen)s
+) ON DUPLICATE KEY UPDATE
+    type=VALUES(type), data_type=VALUES(data_type), reachable=VALUES(reachable), firmware=VALUES(firmware),
+    last_message=VALUES(last_message), last_seen=VALUES(last_seen)
+"""
+
+# Replayed polls only add stations and modules that are missing; the metadata of the live polls is kept
+WEATHER_STATION_INSERT_QUERY = WEATHER_STATION_QUERY.split("ON DUPLICATE KEY UPDATE")[0] + "ON DUPLICATE KEY UPDATE station_id=station_id\n"
+MODULE_INSERT_QUERY = MODULE_QUERY.split("ON DUPLICATE KEY UPDATE")[0] + "ON DUPLICATE KEY UPDATE module_id=module_id\n"
+
+
+# Insert per-module readings (positional parameters in ModuleReading field order)
+MODULE_MEASUREMENT_QUERY = f"""
+INSERT INTO module_measurements ({", ".join(ModuleReading._fields)})
+VALUES ({", ".join(["%s"] * len(ModuleReading._fields))})
+ON DUPLICATE KEY UPDATE id=id
+"""
+
+
+class LastSeenIndex:
+    """In-memory map of station_id -> measured_at of the newest stored measurement.
+
+    Seeded from the measurements table on first use and updated after every committed batch, so
+    ingestion can drop readings it has already stored without querying the database.
+    """
 
-    if response.status_code != 200:
-        return jsonify({"error": "API request failed", "details": response.json()}), response.status_code
+    def __init__(self):
+        self._last_seen = {}
+        self._seeded = False
+        self._lock = threading.Lock()
+
+    def seed(self, cursor):
+        """Loads the newest measured_at of every station unless the index is already seeded."""
+        with self._lock:
+            if self._seeded:
+                return
+            cursor.execute("SELECT station_id, MAX(measured_at) FROM measurements GROUP BY station_id")
+            for station_id, measured_at in cursor.fetchall():
+                if measured_at is not None:
+                    self._last_seen[station_id] = measured_at.strftime('%Y-%m-%d %H:%M:%S')
+            self._seeded = True
+
+    def filter_new(self, measurements):
+        """Splits measurements into readings newer than the last stored one and the number of skipped readings."""
+        new, skipped, batch_seen = [], 0, {}
+        with self._lock:
+            for measurement in measurements:
+                station_id, measured_at = measurement["station_id"], measurement.get("measured_at")
+                last = batch_seen.get(station_id, self._last_seen.get(station_id))
+                if measured_at is None or (last is not None and measured_at <= last):
+                    skipped += 1
+                    continue
+                batch_seen[station_id] = measured_at
+                new.append(measurement)
+        return new, skipped
+
+    def remember(self, measurements):
+        """Records measurements that were committed to the database."""
+        with self._lock:
+            for measurement in measurements:
+                station_id, measured_at = measurement["station_id"], measurement["measured_at"]
+                if measured_at > self._last_seen.get(station_id, ""):
+                    self._last_seen[station_id] = measured_at
+
+
+last_seen_index = LastSeenIndex()
+
+# Outcome of the most recent poll and running totals, reported on /stats
+ingestion_stats = {"last_poll": None, "inserted_total": 0, "skipped_total": 0}
+
+
+def executemany_in_batches(cursor, query, rows, batch_size=None):
+    """Runs an INSERT for `rows` in chunks of `batch_size` and returns the number of affected rows.
+
+    mysql-connector rewrites each executemany() call on an INSERT into one multi-row statement,
+    so every chunk costs a single round trip.
+    """
+    batch_size = batch_size or INGEST_BATCH_SIZE
+    table = insert_table(query)
+    affected = 0
+    for start in range(0, len(rows), batch_size):
+        chunk = rows[start:start + batch_size]
+        with DB_INSERT_SECONDS.time(table=table):
+            cursor.executemany(query, chunk)
+        DB_INSERT_ROWS.inc(len(chunk), table=table)
+        affected += cursor.rowcount
+    return affected
+
+
+@functools.lru_cache(maxsize=64)
+def insert_table(query):
+    """Returns the table an INSERT statement writes to (the metrics label of its rows)."""
+    match = re.search(r"INSERT\s+(?:IGNORE\s+)?INTO\s+`?(\w+)", query, re.IGNORECASE)
+    return match.group(1) if match else "unknown"
+
+
+def store_batch_in_db(stations, measurements, modules, batch_size=None, only_newer=True, module_readings=(), rollups=True,
+                      update_metadata=True, live=True):
+    """Stores all rows collected from one poll using multi-row upserts in a single transaction.
+
+    Stations are written first so the foreign keys of modules and measurements are satisfied.
+    Measurements that are not newer than the last stored reading of their station are skipped
+    (together with that station's module readings), and the inserted ones are folded into the
+    hourly and daily rollups in the same transaction.
+    With only_newer=False (replaying older batches) only the unique key rejects duplicates.
+    With rollups=False the rollups are left alone and the caller rebuilds them afterwards.
+    With update_metadata=False existing stations and modules are left as they are and only missing
+    ones are added (for replayed polls, whose metadata is older than the stored one).
+    With live=False (backfilled history) the last poll stats and the live feed are left alone, and the
+    touched days of the rollups are recomputed from the raw table instead of being folded into.
+    If any statement fails the whole poll is rolled back. Returns the inserted and skipped counts.
+    """
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        if only_newer:
+            last_seen_index.seed(cursor)
+            new_measurements, skipped = last_seen_index.filter_new(measurements)
+        else:
+            new_measurements = [m for m in measurements if m.get("measured_at")]
+            skipped = len(measurements) - len(new_measurements)
+        if only_newer and len(new_measurements) < len(measurements):
+            new_stations = {m["station_id"] for m in new_measurements}
+            module_readings = [r for r in module_readings if r.station_id in new_stations]
+
+        station_query, module_query = ((WEATHER_STATION_QUERY, MODULE_QUERY) if update_metadata
+                                       else (WEATHER_STATION_INSERT_QUERY, MODULE_INSERT_QUERY))
+        executemany_in_batches(cursor, station_query, stations, batch_size)
+        executemany_in_batches(cursor, module_query, modules, batch_size)
+        inserted = executemany_in_batches(cursor, MEASUREMENT_QUERY, new_measurements, batch_size)
+        executemany_in_batches(cursor, MODULE_MEASUREMENT_QUERY, module_readings, batch_size)
+
+        if rollups and live and inserted == len(new_measurements):
+            update_rollups(cursor, new_measurements, batch_size)
+        elif rollups and new_measurements:
+            # Some rows were already stored by someone else; recompute the touched days from the raw table
+            times = [m["measured_at"] for m in new_measurements]
+            rebuild_rollups(cursor, datetime.fromisoformat(min(times)).date(), datetime.fromisoformat(max(times)).date(),
+                            {m["station_id"] for m in new_measurements})
+        conn.commit()
+        cursor.close()
+
+    last_seen_index.remember(new_measurements)
+    if inserted and live:
+        measurement_feed.notify()
+    # Rows rejected by the unique key (e.g. stored by another process) count as skipped too
+    result = {"inserted": inserted, "skipped": skipped + len(new_measurements) - inserted}
+    if live:
+        ingestion_stats["last_poll"] = dict(result, stations=len(stations), finished_at=datetime.now().isoformat())
+    ingestion_stats["inserted_total"] += result["inserted"]
+    ingestion_stats["skipped_total"] += result["skipped"]
+    MEASUREMENTS_STORED.inc(result["inserted"], result="inserted")
+    MEASUREMENTS_STORED.inc(result["skipped"], result="skipped")
+    return result
+
+
+# Rollup tables: period -> (table, source column of the rain total, SQL expression of the bucket start)
+ROLLUP_PERIODS = {
+    "hourly": ("measurements_hourly", "sum_rain_1", "TIMESTAMP(DATE(measured_at), MAKETIME(HOUR(measured_at), 0, 0))"),
+    "daily": ("measurements_daily", "sum_rain_24", "TIMESTAMP(DATE(measured_at))"),
+}
+ROLLUP_METRICS = ("temperature", "humidity", "pressure")
+ROLLUP_COLUMNS = ["station_id", "bucket_start", "samples"] + [
+    f"{metric}_{agg}" for metric in ROLLUP_METRICS for agg in ("min", "max", "sum", "count")
+] + ["rain_total"]
 
-    data = response.json()
 
-    for device in data.get("body", {}).get("devices", []):
-        station_info, device_measurement, modules_data = extract_data(device)
-        
-        # Insert into the database
-        store_data_in_db(station_info, device_measurement, modules_data)
-
-    return jsonify({"message": "Data successfully stored in the database."})
-
-
-def store_data_in_db(station_info, measurement_data, modules_data):
-    """Stores station data in the weather_station table, module data in weather_station_modules, and measurement data in measurements table."""
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor()
-
-    # Insert or update station data
-    weather_station_query = """
-    INSERT INTO weather_station (station_id, station_name, date_setup, last_setup, type, module_name, firmware,
-                                 last_upgrade, wifi_status, reachable, co2_calibrating, place, home_id, home_name,
-                                 user_mail, user_administrative)
-    VALUES (%(station_id)s, %(station_name)s, %(date_setup)s, %(last_setup)s, %(type)s, %(module_name)s, %(firmware)s,
-            %(last_upgrade)s, %(wifi_status)s, %(reachable)s, %(co2_calibrating)s, %(place)s, %(home_id)s,
-            %(home_name)s, %(user_mail)s, %(user_administrative)s)
-    ON DUPLICATE KEY UPDATE 
-        station_name=VALUES(station_name), date_setup=VALUES(date_setup), last_setup=VALUES(last_setup),
-        type=VALUES(type), module_name=VALUES(module_name), firmware=VALUES(firmware), last_upgrade=VALUES(last_upgrade),
-        wifi_status=VALUES(wifi_status), reachable=VALUES(reachable), co2_calibrating=VALUES(co2_calibrating),
-        place=VALUES(place), home_id=VALUES(home_id), home_name=VALUES(home_name),
-        user_mail=VALUES(user_mail), user_administrative=VALUES(user_administrative)
-    """
-    
-    cursor.execute(weather_station_query, station_info)
-    
-    # Insert measurement data
-    measurement_query = """
-    INSERT INTO measurements (station_id, pressure, time_utc_pressure, absolute_pressure, time_utc_absolute_pressure,
-                              temperature, time_utc_temperature, humidity, time_utc_humidity, noise, time_utc_noise,
-                              min_temp, time_utc_min_temp, max_temp, time_utc_max_temp, rain, time_utc_rain,
-                              sum_rain_1, time_utc_sum_rain_1, sum_rain_24, time_utc_sum_rain_24, wind_strength,
-                              time_utc_wind_strength, wind_angle, time_utc_wind_angle, gust_strength, time_utc_gust_strength,
-                              gust_angle, time_utc_gust_angle)
-    VALUES (%(station_id)s, %(pressure)s, %(time_utc_pressure)s, %(absolute_pressure)s, %(time_utc_absolute_pressure)s,
-            %(temperature)s, %(time_utc_temperature)s, %(humidity)s, %(time_utc_humidity)s, %(noise)s, %(time_utc_noise)s,
-            %(min_temp)s, %(time_utc_min_temp)s, %(max_temp)s, %(time_utc_max_temp)s, %(rain)s, %(time_utc_rain)s,
-            %(sum_rain_1)s, %(time_utc_sum_rain_1)s, %(sum_rain_24)s, %(time_utc_sum_rain_24)s, %(wind_strength)s,
-            %(time_utc_wind_strength)s, %(wind_angle)s, %(time_utc_wind_angle)s, %(gust_strength)s, %(time_utc_gust_strength)s,
-            %(gust_angle)s, %(time_utc_gust_angle)s)
-    """
-    
-    cursor.execute(measurement_query, measurement_data)
-
-    # Insert module 
-    module_query = """
-    INSERT INTO weather_station_modules (
-        module_id, station_id, type, data_type, reachable, firmware, last_message, last_seen
-    ) VALUES (
-        %(module_id)s, %(station_id)s, %(type)s, %(data_type)s, %(reachable)s, %(firmware)s, 
-        %(last_message)s, %(last_seen)s
-    ) ON DUPLICATE KEY UPDATE
-        type=VALUES(type), data_type=VALUES(data_type), reachable=VALUES(reachable), firmware=VALUES(firmware),
-        last_message=VALUES(last_message), last_seen=VALUES(last_seen)
+def rollup_bucket(measured_at, period):
+    """Returns the start of the hourly or daily bucket of a 'YYYY-MM-DD HH:MM:SS' timestamp."""
+    return measured_at[:13] + ":00:00" if period == "hourly" else measured_at[:10] + " 00:00:00"
+
+
+def rollup_upsert_query(table):
+    """Builds the upsert that merges partial aggregates of new measurements into existing rollup rows."""
+    updates = ["samples = samples + VALUES(samples)"]
+    for metric in ROLLUP_METRICS:
+        updates += [
+            f"{metric}_min = LEAST(COALESCE({metric}_min, VALUES({metric}_min)), COALESCE(VALUES({metric}_min), {metric}_min))",
+            f"{metric}_max = GREATEST(COALESCE({metric}_max, VALUES({metric}_max)), COALESCE(VALUES({metric}_max), {metric}_max))",
+            f"{metric}_sum = COALESCE({metric}_sum, 0) + COALESCE(VALUES({metric}_sum), 0)",
+            f"{metric}_count = {metric}_count + VALUES({metric}_count)",
+        ]
+    updates.append("rain_total = GREATEST(COALESCE(rain_total, VALUES(rain_total)), COALESCE(VALUES(rain_total), rain_total))")
+    return (f"INSERT INTO {table} ({', '.join(ROLLUP_COLUMNS)}) VALUES ({', '.join(['%s'] * len(ROLLUP_COLUMNS))}) "
+            f"ON DUPLICATE KEY UPDATE {', '.join(updates)}")
+
+
+def update_rollups(cursor, measurements, batch_size=None):
+    """Folds newly inserted measurements into the hourly and daily rollup tables.
+
+    The batch is aggregated per (station, bucket) in Python first, so each touched bucket costs one
+    upsert row no matter how many measurements fall into it, and history is never rescanned.
     """
-    for module in modules_data:
-        cursor.execute(module_query, module)
+    for period, (table, rain_column, _) in ROLLUP_PERIODS.items():
+        buckets = {}
+        for m in measurements:
+            key = (m["station_id"], rollup_bucket(m["measured_at"], period))
+            agg = buckets.get(key)
+            if agg is None:
+                agg = buckets[key] = {"samples": 0, "rain_total": None}
+                for metric in ROLLUP_METRICS:
+                    agg.update({f"{metric}_min": None, f"{metric}_max": None, f"{metric}_sum": None, f"{metric}_count": 0})
+            agg["samples"] += 1
+            for metric in ROLLUP_METRICS:
+                value = m.get(metric)
+                if value is None:
+                    continue
+                agg[f"{metric}_min"] = value if agg[f"{metric}_min"] is None else min(agg[f"{metric}_min"], value)
+                agg[f"{metric}_max"] = value if agg[f"{metric}_max"] is None else max(agg[f"{metric}_max"], value)
+                agg[f"{metric}_sum"] = (agg[f"{metric}_sum"] or 0) + value
+                agg[f"{metric}_count"] += 1
+            rain = m.get(rain_column)
+            if rain is not None and (agg["rain_total"] is None or rain > agg["rain_total"]):
+                agg["rain_total"] = rain
+
+        rows = [(station_id, bucket_start) + tuple(agg[c] for c in ROLLUP_COLUMNS[2:])
+                for (station_id, bucket_start), agg in buckets.items()]
+        executemany_in_batches(cursor, rollup_upsert_query(table), rows, batch_size)
+
+
+def rebuild_rollups(cursor, first_day, last_day, station_ids=None):
+    """Recomputes the rollup rows of the days first_day..last_day (inclusive) from the raw measurements table."""
+    start = datetime.combine(first_day, datetime.min.time())
+    end = datetime.combine(last_day, datetime.min.time()) + timedelta(days=1)
+    station_filter, station_params = "", []
+    if station_ids:
+        station_filter = f" AND station_id IN ({', '.join(['%s'] * len(station_ids))})"
+        station_params = list(station_ids)
+
+    for table, rain_column, bucket_expression in ROLLUP_PERIODS.values():
+        cursor.execute(f"DELETE FROM {table} WHERE bucket_start >= %s AND bucket_start < %s{station_filter}",
+                       [start, end] + station_params)
+        aggregates = ", ".join(
+            f"MIN({metric}), MAX({metric}), SUM({metric}), COUNT({metric})" for metric in ROLLUP_METRICS
+        )
+        # Measurements are not deleted with their station (the partitioned table has no foreign key)
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(ROLLUP_COLUMNS)}) "
+            f"SELECT station_id, {bucket_expression} AS bucket, COUNT(*), {aggregates}, MAX({rain_column}) "
+            f"FROM measurements WHERE measured_at >= %s AND measured_at < %s{station_filter} "
+            f"AND station_id IN (SELECT station_id FROM weather_station) "
+            f"GROUP BY station_id, bucket",
+            [start, end] + station_params
+        )
+
+
+def rebuild_rollups_by_month(conn, cursor, first_day, last_day, station_ids=None):
+    """Rebuilds the rollups of first_day..last_day one month per transaction, yielding each finished range.
+
+    One transaction per month keeps the rebuild of long histories from holding huge locks.
+    """
+    day = first_day
+    while day <= last_day:
+        month_end = min(last_day, (day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1))
+        rebuild_rollups(cursor, day, month_end, station_ids)
+        conn.commit()
+        yield day, month_end
+        day = month_end + timedelta(days=1)
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+
+def store_data_in_db(station_info, measurement_data, modules_data, module_readings=()):
+    """Stores station data in the weather_station table, module data in weather_station_modules, and measurement data in measurements and module_measurements tables."""
+    return store_batch_in_db([station_info], [measurement_data], modules_data, module_readings=module_readings)
+
+
+def stream_query(query, params=()):
+    """Yields the rows of `query` as dicts from an unbuffered (server-side) cursor.
+
+    A pooled connection is held until the rows are exhausted or the consumer stops early, so memory
+    use does not depend on the size of the result.
+    """
+    with db_pool.connection() as conn:
+        cursor = conn.cursor(dictionary=True, buffered=False)
+        cursor.execute(query, params)
+        finished = False
+        try:
+            for row in cursor:
+                yield row
+            finished = True
+        finally:
+            if finished:
+                cursor.close()
+            else:
+                db_pool.discard_result(conn)
+
+
+def iter_chunks(pieces, chunk_size=None):
+    """Joins small strings produced by a template or encoder into chunks of roughly `chunk_size` characters."""
+    chunk_size = chunk_size or STREAM_CHUNK_SIZE
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def stream_json_array(items):
+    """Encodes an iterable as a JSON array one element at a time."""
+    yield "["
+    for index, item in enumerate(items):
+        yield ("," if index else "") + flask_json.dumps(item)
+    yield "]"
+
+
+def stream_template(template_name, **context):
+    """Renders a template incrementally; generators in `context` are consumed while the response is sent."""
+    app.update_template_context(context)
+    return Response(stream_with_context(iter_chunks(app.jinja_env.get_template(template_name).generate(context))),
+                    mimetype="text/html")
+
+
+def wants_stream():
+    """Returns True if the request asks for a streamed response (?stream=1)."""
+    return request.args.get("stream", "").lower() in ("1", "true", "yes")
 
 
 @app.route("/show_data", methods=["GET"])
 def show_data():
-    """Fetches all records from the weather_station table with related modules and displays them in structured JSON."""
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor(dictionary=True)
+    """Fetches all records from the weather_station table with related modules and displays them in structured JSON.
 
-    # Query for main weather station data
-    cursor.execute("SELECT * FROM weather_station")
-    weather_data = cursor.fetchall()
+    With ?stream=1 the stations are read from a server-side cursor and encoded as they arrive.
+    """
+    with db_pool.connection() as conn:
+        cursor = conn.cursor(dictionary=True)
 
-    # Query for related modules data
-    cursor.execute("SELECT * FROM weather_station_modules")
-    modules_data = cursor.fetchall()
+        # Query for related modules data
+        cursor.execute("SELECT * FROM weather_station_modules")
+        modules_data = cursor.fetchall()
 
-    # Close connection
-    cursor.close()
-    conn.close()
+        # Query for main weather station data
+        if not wants_stream():
+            cursor.execute("SELECT * FROM weather_station")
+            weather_data = cursor.fetchall()
+
+        cursor.close()
 
     # Organize modules by station_id for easy association
     modules_by_station = {}
@@ -435,6 +1475,15 @@ def show_data():
             modules_by_station[station_id] = []
         modules_by_station[station_id].append(module)
 
+    if wants_stream():
+        def stations_with_modules():
+            for station in stream_query("SELECT * FROM weather_station"):
+                station["modules"] = modules_by_station.get(station["station_id"], [])
+                yield station
+
+        return Response(stream_with_context(iter_chunks(stream_json_array(stations_with_modules()))),
+                        mimetype="application/json")
+
     # Add modules to their respective weather stations
     for station in weather_data:
         station_id = station["station_id"]
@@ -443,31 +1492,120 @@ def show_data():
     return jsonify(weather_data)
 
 
+def parse_measurement_filters(args):
+    """Validates the station_id, from, to, limit and after query parameters of the measurement views.
+
+    `from` is inclusive and `to` exclusive; both accept ISO dates or datetimes (UTC). `after` is the
+    opaque cursor returned as `next_cursor` by the previous page. Raises ValueError on invalid input.
+    """
+    filters = {"station_ids": [s for s in args.getlist("station_id") if s], "from": None, "to": None, "after": None}
+
+    for key in ("from", "to"):
+        if args.get(key):
+            try:
+                filters[key] = datetime.fromisoformat(args[key])
+            except ValueError:
+                raise ValueError(f"Invalid '{key}' value, expected an ISO date or datetime: {args[key]}")
+
+    try:
+        filters["limit"] = int(args.get("limit", MEASUREMENTS_PAGE_LIMIT))
+    except ValueError:
+        raise ValueError(f"Invalid 'limit' value: {args['limit']}")
+    if not 1 <= filters["limit"] <= MEASUREMENTS_MAX_LIMIT:
+        raise ValueError(f"'limit' must be between 1 and {MEASUREMENTS_MAX_LIMIT}")
+
+    if args.get("after"):
+        try:
+            measured_at, row_id = args["after"].rsplit("_", 1)
+            filters["after"] = (datetime.fromisoformat(measured_at), int(row_id))
+        except ValueError:
+            raise ValueError(f"Invalid 'after' cursor: {args['after']}")
+
+    return filters
+
+
+def build_measurements_query(filters, columns="*", oldest_first=False):
+    """Builds a keyset-paginated SELECT over measurements, newest first (unlimited if filters["limit"] is None).
+
+    Pages are ordered by (measured_at, id) so each page continues strictly below the cursor, which
+    the (station_id, measured_at) and (measured_at) indexes can serve without scanning skipped rows.
+    With oldest_first the rows are returned in ascending order (used by exports, without a cursor).
+    """
+    conditions, params = [], []
+    if filters["station_ids"]:
+        conditions.append(f"station_id IN ({', '.join(['%s'] * len(filters['station_ids']))})")
+        params.extend(filters["station_ids"])
+    if filters["from"]:
+        conditions.append("measured_at >= %s")
+        params.append(filters["from"])
+    if filters["to"]:
+        conditions.append("measured_at < %s")
+        params.append(filters["to"])
+    if filters["after"]:
+        conditions.append("(measured_at < %s OR (measured_at = %s AND id < %s))")
+        params.extend([filters["after"][0], filters["after"][0], filters["after"][1]])
+
+    query = f"SELECT {columns} FROM measurements"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY measured_at, id" if oldest_first else " ORDER BY measured_at DESC, id DESC"
+    if filters["limit"] is not None:
+        query += " LIMIT %s"
+        params.append(filters["limit"] + 1)  # One extra row tells whether there is a next page
+    return query, params
+
+
+def fetch_measurements_page(conn, filters):
+    """Returns one page of measurements and the cursor of the next page (None on the last page).
+
+    Rows are read from an unbuffered (server-side) cursor one at a time instead of fetchall().
+    """
+    query, params = build_measurements_query(filters)
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    cursor.execute(query, params)
+    rows = [row for row in cursor]
+    cursor.close()
+
+    next_cursor = None
+    if len(rows) > filters["limit"]:
+        rows.pop()
+        last = rows[-1]
+        next_cursor = f"{last['measured_at'].isoformat()}_{last['id']}"
+    return rows, next_cursor
+
+
 @app.route("/show_data_table", methods=["GET"])
 def show_data_table():
-    """Fetches all records from the weather_station, weather_station_modules, and measurements tables,
-    and displays them in an HTML table."""
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor(dictionary=True)
+    """Fetches all records from the weather_station and weather_station_modules tables and one page of
+    measurements (filtered by station_id, from, to, limit and after), and displays them in an HTML table.
+
+    With ?stream=1 all measurements matching the filters are streamed into the page instead of one page.
+    """
+    try:
+        filters = parse_measurement_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    stream = wants_stream()
 
-    # Query for main weather station data
-    cursor.execute("SELECT * FROM weather_station")
-    weather_data = cursor.fetchall()
+    with db_pool.connection() as conn:
+        cursor = conn.cursor(dictionary=True)
 
-    # Query for related modules data, linked by station_id
-    cursor.execute("SELECT * FROM weather_station_modules")
-    modules_data = cursor.fetchall()
+        # Query for main weather station data
+        cursor.execute("SELECT * FROM weather_station")
+        weather_data = cursor.fetchall()
 
-    # Query for measurements data, linked by station_id
-    cursor.execute("SELECT * FROM measurements")
-    measurements_data = cursor.fetchall()
+        # Query for related modules data, linked by station_id
+        cursor.execute("SELECT * FROM weather_station_modules")
+        modules_data = cursor.fetchall()
 
-    cursor.close()
-    conn.close()
+        cursor.close()
 
-    # Organize modules and measurements by station_id
+        # Query for one page of measurements data, linked by station_id
+        if not stream:
+            measurements_data, next_cursor = fetch_measurements_page(conn, filters)
+
+    # Organize modules by station_id; measurements are grouped by the page script as they arrive
     modules_by_station = {}
-    measurements_by_station = {}
 
     for module in modules_data:
         station_id = module["station_id"]
@@ -475,46 +1613,2063 @@ def show_data_table():
             modules_by_station[station_id] = []
         modules_by_station[station_id].append(module)
 
-    for measurement in measurements_data:
-        station_id = measurement["station_id"]
-        if station_id not in measurements_by_station:
-            measurements_by_station[station_id] = []
-        measurements_by_station[station_id].append(measurement)
-
-    return render_template(
-        "show_data_table1.html",
+    context = dict(
         weather_data=weather_data,
         modules_by_station=modules_by_station,
-        measurements_by_station=measurements_by_station
+        selected_station=filters["station_ids"][0] if len(filters["station_ids"]) == 1 else "",
+        live_url=live_stream_url(filters),
     )
+    if stream:
+        query, params = build_measurements_query(dict(filters, limit=None, after=None))
+        return stream_template("show_data_table1.html", measurements_data=stream_query(query, params),
+                               next_page_url=None, **context)
 
+    return render_template("show_data_table1.html", measurements_data=measurements_data,
+                           next_page_url=next_page_url(next_cursor), **context)
 
 
 @app.route("/show_all_measurements", methods=["GET"])
 def show_all_measurements():
-    """Fetches all records from the measurements table and displays them in an HTML table."""
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor(dictionary=True)
+    """Fetches one page of records from the measurements table (filtered by station_id, from, to, limit
+    and after) and displays them in an HTML table.
 
-    # Query for measurements data
-    cursor.execute("SELECT * FROM measurements")
-    measurements_data = cursor.fetchall()
+    With ?stream=1 all measurements matching the filters are rendered while they are read from the database.
+    """
+    try:
+        filters = parse_measurement_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if wants_stream():
+        query, params = build_measurements_query(dict(filters, limit=None, after=None))
+        rows = stream_query(query, params)
+        first = next(rows, None)  # Needed for the table header
+        return stream_template("show_all_measurements.html",
+                               measurements_data=itertools.chain([first], rows) if first else [],
+                               columns=list(first.keys()) if first else [],
+                               filters=request.args, next_page_url=None, live_url=live_stream_url(filters))
+
+    with db_pool.connection() as conn:
+        measurements_data, next_cursor = fetch_measurements_page(conn, filters)
+
+    return render_template("show_all_measurements.html", measurements_data=measurements_data,
+                           columns=list(measurements_data[0].keys()) if measurements_data else [],
+                           filters=request.args, next_page_url=next_page_url(next_cursor),
+                           live_url=live_stream_url(filters))
+
+
+def next_page_url(next_cursor):
+    """Returns the URL of the next page of the current view, keeping its filters, or None on the last page."""
+    if next_cursor is None:
+        return None
+    args = request.args.to_dict(flat=False)
+    args["after"] = next_cursor
+    return url_for(request.endpoint, **args)
+
+
+class MeasurementFeed:
+    """Pushes newly stored measurements to the /stream/measurements clients of this process.
+
+    Web workers do not ingest themselves, so one shared thread per process looks for new rows every
+    `interval` seconds while at least one client is connected (or right away when this process
+    stored a batch). Auto-increment ids are not committed in id order when several writers insert
+    at once, so each check scans again every id above the highest one seen `overlap` seconds ago
+    and skips the rows already published. Only rows measured within the last `max_age` seconds are
+    published, so backfilled and replayed history is not pushed as live data. Each batch is put on
+    the bounded queue of every subscriber whose station filter matches; a client that falls
+    `queue_size` batches behind is disconnected and catches up on reconnect through Last-Event-ID.
+    """
+
+    def __init__(self, interval, queue_size, batch_limit, overlap, max_age):
+        self.interval = interval
+        self.queue_size = queue_size
+        self.batch_limit = batch_limit
+        self.overlap = overlap
+        self.max_age = max_age
+        self._subscribers = {}  # queue -> set of station_ids (empty: all stations)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.last_id = None
+        self._checkpoints = collections.deque()  # (monotonic time, highest id seen then)
+        self._published = set()  # Ids above the oldest checkpoint that were already published
+        self.stats = {"batches": 0, "rows": 0, "events": 0, "disconnected_slow": 0, "errors": 0, "late_rows": 0}
+
+    def subscribe(self, station_ids):
+        """Registers a client and returns its queue; starts the polling thread if it is not running.
+
+        Rows stored after this call returns are delivered through the queue.
+        """
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                with db_pool.connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM measurements")
+                    self.last_id = cursor.fetchone()[0]
+                    cursor.close()
+                self._checkpoints = collections.deque([(time.monotonic(), self.last_id)])
+                self._published = set()
+                self._thread = threading.Thread(target=self._run, name="measurement-feed", daemon=True)
+                self._thread.start()
+            self._subscribers[subscriber] = set(station_ids)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.pop(subscriber, None)
+
+    def notify(self):
+        """Looks for new rows now instead of at the next interval."""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            try:
+                self._poll()
+            except mysql_errors.Error as e:
+                self.stats["errors"] += 1
+                print("Live feed query failed:", e)
+
+    def _poll(self):
+        now = time.monotonic()
+        while len(self._checkpoints) > 1 and now - self._checkpoints[1][0] >= self.overlap:
+            self._checkpoints.popleft()
+        scan_from = self._checkpoints[0][1]
+        self._published = {row_id for row_id in self._published if row_id > scan_from}
+        cutoff = datetime.utcnow() - timedelta(seconds=self.max_age)
+
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+            # Only ids first (covered by idx_measured_at), then the rows not published yet
+            new_ids, after = [], scan_from
+            while True:
+                cursor.execute("SELECT id FROM measurements WHERE measured_at >= %s AND id > %s ORDER BY id LIMIT %s",
+                               (cutoff, after, self.batch_limit))
+                ids = [row[0] for row in cursor.fetchall()]
+                new_ids += [row_id for row_id in ids if row_id not in self._published]
+                if len(ids) < self.batch_limit:
+                    break
+                after = ids[-1]
+            cursor.close()
+            cursor = conn.cursor(dictionary=True)
+            for i in range(0, len(new_ids), self.batch_limit):
+                chunk = new_ids[i:i + self.batch_limit]
+                cursor.execute(f"SELECT * FROM measurements WHERE id IN ({', '.join(['%s'] * len(chunk))}) ORDER BY id", chunk)
+                rows = cursor.fetchall()
+                self.stats["late_rows"] += sum(1 for row in rows if row["id"] < self.last_id)
+                self._published.update(row["id"] for row in rows)
+                self.last_id = max([self.last_id] + [row["id"] for row in rows])
+                if rows:
+                    self.publish(rows)
+            cursor.close()
+        self._checkpoints.append((now, self.last_id))
+
+    def publish(self, rows):
+        """Hands a batch of measurement rows to every subscriber interested in them."""
+        self.stats["batches"] += 1
+        self.stats["rows"] += len(rows)
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for subscriber, station_ids in subscribers:
+            matching = [row for row in rows if row["station_id"] in station_ids] if station_ids else rows
+            if not matching:
+                continue
+            try:
+                subscriber.put_nowait(matching)
+                self.stats["events"] += 1
+                LIVE_EVENTS.inc()
+            except queue.Full:
+                # The client stopped reading; end its stream so it reconnects and catches up from the database
+                self.unsubscribe(subscriber)
+                self.stats["disconnected_slow"] += 1
+                try:
+                    subscriber.get_nowait()
+                except queue.Empty:
+                    pass
+                subscriber.put_nowait(None)
+
+    def subscribers(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def snapshot(self):
+        return dict(self.stats, subscribers=self.subscribers(), last_id=self.last_id, running=self._thread is not None)
+
+
+measurement_feed = MeasurementFeed(LIVE_POLL_INTERVAL, LIVE_QUEUE_SIZE, MEASUREMENTS_MAX_LIMIT, LIVE_OVERLAP, LIVE_MAX_AGE)
+
+
+def sse_event(rows, event_id):
+    """Formats measurement rows as one server-sent event; its id lets a reconnecting client resume."""
+    data = json.dumps(rows, default=str, separators=(",", ":"))
+    return f"id: {event_id}\nevent: measurements\ndata: {data}\n\n"
+
+
+@app.route("/stream/measurements", methods=["GET"])
+def stream_measurements():
+    """Streams measurements as server-sent events while they are stored, one event per batch.
+
+    Accepts station_id (repeatable). A reconnecting client sends the id of the last event it received
+    (Last-Event-ID header or `last_event_id` parameter) and first gets the rows it missed. Comments are
+    sent every LIVE_HEARTBEAT seconds so proxies keep idle connections open.
+    """
+    station_ids = [s for s in request.args.getlist("station_id") if s]
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({"error": f"Invalid last event id: {last_event_id}"}), 400
+
+    subscriber = measurement_feed.subscribe(station_ids)  # Before the catch-up query, so no row falls in between
+
+    def events():
+        caught_up = set()  # Ids sent by the catch-up query, which may come through the feed as well
+        sent_id = last_event_id or 0  # Highest id sent; late rows with lower ids do not move it back
+        try:
+            yield f"retry: {int(LIVE_POLL_INTERVAL * 1000)}\n\n"
+            if last_event_id is not None:
+                query = "SELECT * FROM measurements WHERE id > %s AND measured_at >= %s"
+                params = [last_event_id, datetime.utcnow() - timedelta(seconds=LIVE_MAX_AGE)]
+                if station_ids:
+                    query += f" AND station_id IN ({', '.join(['%s'] * len(station_ids))})"
+                    params.extend(station_ids)
+                with db_pool.connection() as conn:
+                    cursor = conn.cursor(dictionary=True)
+                    cursor.execute(query + " ORDER BY id LIMIT %s", params + [MEASUREMENTS_MAX_LIMIT])
+                    missed = cursor.fetchall()
+                    cursor.close()
+                if missed:
+                    caught_up = {row["id"] for row in missed}
+                    sent_id = max(sent_id, missed[-1]["id"])
+                    yield sse_event(missed, sent_id)
+            while True:
+                try:
+                    rows = subscriber.get(timeout=LIVE_HEARTBEAT)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if rows is None:
+                    return  # Disconnected for falling behind
+                rows = [row for row in rows if row["id"] not in caught_up]
+                if rows:
+                    sent_id = max(sent_id, rows[-1]["id"])
+                    yield sse_event(rows, sent_id)
+        finally:
+            measurement_feed.unsubscribe(subscriber)
+
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def live_stream_url(filters):
+    """Returns the /stream/measurements URL matching a measurement view, or None if new rows would not be on it."""
+    if filters["after"] or filters["to"]:
+        return None  # Older pages and closed ranges never get new rows
+    return url_for("stream_measurements", station_id=filters["station_ids"])
+
+
+# Exported measurement columns and their types: "id", "string", "datetime", "float" or "int" (as in init.sql)
+MEASUREMENT_INT_COLUMNS = {"humidity", "noise", "wind_strength", "wind_angle", "gust_strength", "gust_angle"}
+EXPORT_COLUMNS = [("id", "id"), ("station_id", "string"), ("measured_at", "datetime")] + [
+    pair for column in MEASUREMENT_VALUE_COLUMNS
+    for pair in ((column, "int" if column in MEASUREMENT_INT_COLUMNS else "float"), (f"time_utc_{column}", "datetime"))
+]
+
+# Export format -> (MIME type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
 
-    cursor.close()
-    conn.close()
 
-    return render_template("show_all_measurements.html", measurements_data=measurements_data)
+def iter_row_batches(query, params=(), batch_rows=None):
+    """Yields the rows of `query` as lists of tuples of up to `batch_rows` rows from a server-side cursor.
+
+    Like stream_query() a pooled connection is held until the rows are exhausted. MySQL's
+    net_write_timeout is raised for the session, so a client that reads slowly does not abort the query.
+    """
+    batch_rows = batch_rows or EXPORT_BATCH_ROWS
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SET SESSION net_write_timeout = %s", (EXPORT_NET_WRITE_TIMEOUT,))
+        cursor.close()
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(query, params)
+        finished = False
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_rows)
+                if not rows:
+                    break
+                yield rows
+            finished = True
+        finally:
+            if finished:
+                cursor.close()
+            else:
+                db_pool.discard_result(conn)
+
+
+def export_csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%dT%H:%M:%SZ")  # All timestamps are stored in UTC
+    return value
+
+
+def export_csv(batches):
+    """Encodes row batches as UTF-8 CSV with a header row, one chunk per batch.
+
+    Timestamps are ISO 8601 in UTC and missing values are empty fields.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow([column for column, _ in EXPORT_COLUMNS])
+    for rows in batches:
+        writer.writerows([export_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()  # Header only: no rows matched
+
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file object that collects what pyarrow writes, so it can be sent out in pieces."""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def export_schema():
+    types = {
+        "id": pyarrow.uint64(), "string": pyarrow.string(), "float": pyarrow.float32(), "int": pyarrow.int32(),
+        "datetime": pyarrow.timestamp("s", tz="UTC"),
+    }
+    return pyarrow.schema([pyarrow.field(column, types[kind], nullable=column not in ("id", "station_id", "measured_at"))
+                           for column, kind in EXPORT_COLUMNS])
+
+
+def export_arrow(batches, file_format):
+    """Encodes row batches as Parquet (one row group per batch) or as an Arrow IPC stream."""
+    schema = export_schema()
+    sink = ChunkSink()
+    if file_format == "parquet":
+        writer = pyarrow.parquet.ParquetWriter(sink, schema, compression="snappy")
+    else:
+        writer = pyarrow.ipc.new_stream(sink, schema)
+    try:
+        for rows in batches:
+            columns = zip(*rows)
+            batch = pyarrow.record_batch([pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)],
+                                         schema=schema)
+            if file_format == "parquet":
+                writer.write_table(pyarrow.Table.from_batches([batch]))
+            else:
+                writer.write_batch(batch)
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()  # Parquet footer or end-of-stream marker
+
+
+def export_measurements(filters, file_format):
+    """Yields `measurements` rows matching the station_id, from and to filters, oldest first, encoded as `file_format`."""
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{file_format}', expected one of {', '.join(EXPORT_FORMATS)}")
+    if file_format != "csv" and pyarrow is None:
+        raise ValueError(f"The {file_format} format needs pyarrow (pip install pyarrow)")
+    query, params = build_measurements_query(dict(filters, limit=None, after=None),
+                                             columns=", ".join(column for column, _ in EXPORT_COLUMNS), oldest_first=True)
+    batches = iter_row_batches(query, params)
+    return export_csv(batches) if file_format == "csv" else export_arrow(batches, file_format)
+
+
+@app.route("/export/measurements", methods=["GET"])
+def export_measurements_route():
+    """Downloads measurements as CSV, Parquet or an Arrow IPC stream (format=csv|parquet|arrow).
+
+    Accepts station_id (repeatable), from and to like the measurement views. The file is written
+    while the rows are read from the database, so memory use does not grow with the export.
+    """
+    file_format = request.args.get("format", "csv").lower()
+    try:
+        filters = parse_measurement_filters(request.args)
+        chunks = export_measurements(filters, file_format)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    mimetype, extension = EXPORT_FORMATS[file_format]
+    name = "measurements"
+    for key in ("from", "to"):
+        if filters[key]:
+            name += f"_{key}_{filters[key].strftime('%Y%m%dT%H%M%S')}"
+    return Response(chunks, mimetype=mimetype,
+                    headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'})
+
+
+@app.cli.command("export-measurements")
+@click.option("--format", "file_format", type=click.Choice(list(EXPORT_FORMATS)), default="csv", show_default=True)
+@click.option("--from", "first_day", help="Start of the range (ISO date or datetime, UTC).")
+@click.option("--to", "last_day", help="End of the range, exclusive (ISO date or datetime, UTC).")
+@click.option("--station", "station_ids", multiple=True, help="Export only these stations (repeatable, default: all).")
+@click.option("--output", type=click.File("wb"), default="-", help="Output file (default: standard output).")
+def export_measurements_command(file_format, first_day, last_day, station_ids, output):
+    """Exports measurements as CSV, Parquet or an Arrow IPC stream."""
+    args = MultiDict([("station_id", station_id) for station_id in station_ids])
+    for key, value in (("from", first_day), ("to", last_day)):
+        if value:
+            args[key] = value
+    try:
+        chunks = export_measurements(parse_measurement_filters(args), file_format)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    for chunk in chunks:
+        output.write(chunk)
+
+
+@app.route("/aggregates", methods=["GET"])
+def aggregates():
+    """Returns hourly or daily min/max/mean temperature, humidity and pressure and rain totals from the rollup tables.
+
+    Accepts period (hourly or daily, default hourly), station_id (repeatable), from, to and limit.
+    """
+    period = request.args.get("period", "hourly")
+    if period not in ROLLUP_PERIODS:
+        return jsonify({"error": f"Invalid 'period', expected one of: {', '.join(ROLLUP_PERIODS)}"}), 400
+    try:
+        filters = parse_measurement_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    conditions, params = [], []
+    if filters["station_ids"]:
+        conditions.append(f"station_id IN ({', '.join(['%s'] * len(filters['station_ids']))})")
+        params.extend(filters["station_ids"])
+    if filters["from"]:
+        conditions.append("bucket_start >= %s")
+        params.append(filters["from"])
+    if filters["to"]:
+        conditions.append("bucket_start < %s")
+        params.append(filters["to"])
+
+    metrics = ", ".join(
+        f"{metric}_min, {metric}_max, {metric}_sum / NULLIF({metric}_count, 0) AS {metric}_mean"
+        for metric in ROLLUP_METRICS
+    )
+    query = f"SELECT station_id, bucket_start, samples, {metrics}, rain_total FROM {ROLLUP_PERIODS[period][0]}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY station_id, bucket_start LIMIT %s"
+    params.append(filters["limit"])
+
+    with db_pool.connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        cursor.close()
+
+    for row in rows:
+        row["bucket_start"] = row["bucket_start"].isoformat()
+        for metric in ROLLUP_METRICS:
+            row[metric] = {agg: row.pop(f"{metric}_{agg}") for agg in ("min", "max", "mean")}
+    return jsonify({"period": period, "aggregates": rows})
+
+
+# Station location queries (/stations/nearby, /stations/bbox)
+STATIONS_MAX_LIMIT = int(os.getenv("STATIONS_MAX_LIMIT", "5000"))
+KM_PER_DEGREE_LATITUDE = 111.2
+
+STATION_LOCATION_COLUMNS = "station_id, station_name, latitude, longitude, reachable"
+
+
+def parse_coordinate(args, key, low, high, required=True):
+    """Reads a float query parameter within [low, high] (None if it is optional and missing).
+
+    Raises ValueError if it is missing or invalid.
+    """
+    value = args.get(key)
+    if value in (None, ""):
+        if required:
+            raise ValueError(f"Missing '{key}' parameter")
+        return None
+    try:
+        value = float(value)
+    except ValueError:
+        raise ValueError(f"Invalid '{key}' value: {args[key]}")
+    if not low <= value <= high:
+        raise ValueError(f"'{key}' must be between {low} and {high}")
+    return value
+
+
+def parse_station_limit(args, default):
+    try:
+        limit = int(args.get("limit", default))
+    except ValueError:
+        raise ValueError(f"Invalid 'limit' value: {args['limit']}")
+    if not 1 <= limit <= STATIONS_MAX_LIMIT:
+        raise ValueError(f"'limit' must be between 1 and {STATIONS_MAX_LIMIT}")
+    return limit
+
+
+def attach_latest_measurements(cursor, stations):
+    """Adds the newest stored measurement of each station as "latest_measurement" (None if it has none).
+
+    One grouped query over the (station_id, measured_at) key finds the newest reading of all stations at once.
+    """
+    latest = {}
+    if stations:
+        placeholders = ", ".join(["%s"] * len(stations))
+        cursor.execute(
+            f"SELECT m.* FROM measurements m JOIN ("
+            f"SELECT station_id, MAX(measured_at) AS measured_at FROM measurements "
+            f"WHERE station_id IN ({placeholders}) GROUP BY station_id"
+            f") newest ON newest.station_id = m.station_id AND newest.measured_at = m.measured_at",
+            [station["station_id"] for station in stations]
+        )
+        for row in cursor.fetchall():
+            latest[row["station_id"]] = {
+                key: value.isoformat() if isinstance(value, datetime) else value for key, value in row.items()
+            }
+    for station in stations:
+        station["latest_measurement"] = latest.get(station["station_id"])
+    return stations
+
+
+@app.route("/stations/nearby", methods=["GET"])
+def stations_nearby():
+    """Returns the `limit` (default 10) stations nearest to lat/lon, optionally only within radius_km,
+    each with its distance and latest measurement.
+
+    With a radius the latitude/longitude index narrows the search to the enclosing box before the
+    exact great-circle distances are computed.
+    """
+    try:
+        lat = parse_coordinate(request.args, "lat", -90, 90)
+        lon = parse_coordinate(request.args, "lon", -180, 180)
+        radius_km = parse_coordinate(request.args, "radius_km", 0, 20040, required=False)
+        limit = parse_station_limit(request.args, 10)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    query = (f"SELECT {STATION_LOCATION_COLUMNS}, "
+             f"ST_Distance_Sphere(POINT(longitude, latitude), POINT(%s, %s)) / 1000 AS distance_km "
+             f"FROM weather_station WHERE latitude IS NOT NULL AND longitude IS NOT NULL")
+    params = [lon, lat]
+    if radius_km is not None:
+        lat_delta = radius_km / KM_PER_DEGREE_LATITUDE
+        query += " AND latitude BETWEEN %s AND %s"
+        params += [lat - lat_delta, lat + lat_delta]
+        cos_lat = math.cos(math.radians(min(90.0, abs(lat) + lat_delta)))
+        if cos_lat > 0 and lat_delta / cos_lat < 180 and abs(lon) + lat_delta / cos_lat <= 180:
+            # Boxes crossing a pole or the antimeridian are only narrowed by latitude
+            query += " AND longitude BETWEEN %s AND %s"
+            params += [lon - lat_delta / cos_lat, lon + lat_delta / cos_lat]
+        query += " HAVING distance_km <= %s"
+        params.append(radius_km)
+    query += " ORDER BY distance_km LIMIT %s"
+    params.append(limit)
+
+    with db_pool.connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(query, params)
+        stations = cursor.fetchall()
+        attach_latest_measurements(cursor, stations)
+        cursor.close()
+    for station in stations:
+        station["distance_km"] = round(station["distance_km"], 3)
+    return jsonify({"lat": lat, "lon": lon, "radius_km": radius_km, "stations": stations})
+
+
+@app.route("/stations/bbox", methods=["GET"])
+def stations_bbox():
+    """Returns the stations inside the box min_lat..max_lat, min_lon..max_lon (up to `limit`, default 1000),
+    each with its latest measurement. A min_lon greater than max_lon selects a box across the antimeridian.
+
+    `truncated` tells a map that more stations lie in the box and it should zoom in.
+    """
+    try:
+        min_lat = parse_coordinate(request.args, "min_lat", -90, 90)
+        max_lat = parse_coordinate(request.args, "max_lat", -90, 90)
+        min_lon = parse_coordinate(request.args, "min_lon", -180, 180)
+        max_lon = parse_coordinate(request.args, "max_lon", -180, 180)
+        limit = parse_station_limit(request.args, 1000)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if min_lat > max_lat:
+        return jsonify({"error": "'min_lat' must not be greater than 'max_lat'"}), 400
+
+    longitude_condition = "longitude BETWEEN %s AND %s" if min_lon <= max_lon else "(longitude >= %s OR longitude <= %s)"
+    with db_pool.connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            f"SELECT {STATION_LOCATION_COLUMNS} FROM weather_station "
+            f"WHERE latitude BETWEEN %s AND %s AND {longitude_condition} ORDER BY station_id LIMIT %s",
+            [min_lat, max_lat, min_lon, max_lon, limit + 1]  # One extra row tells whether the result was cut off
+        )
+        stations = cursor.fetchall()
+        truncated = len(stations) > limit
+        stations = attach_latest_measurements(cursor, stations[:limit])
+        cursor.close()
+    return jsonify({"bbox": [min_lon, min_lat, max_lon, max_lat], "truncated": truncated, "stations": stations})
+
+
+@app.cli.command("rebuild-rollups")
+@click.option("--from", "first_day", type=click.DateTime(["%Y-%m-%d"]), help="First day to rebuild (default: oldest measurement).")
+@click.option("--to", "last_day", type=click.DateTime(["%Y-%m-%d"]), help="Last day to rebuild, inclusive (default: newest measurement).")
+@click.option("--station", "station_ids", multiple=True, help="Rebuild only these stations (repeatable).")
+def rebuild_rollups_command(first_day, last_day, station_ids):
+    """Backfills the hourly and daily rollup tables from the raw measurements table."""
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MIN(measured_at), MAX(measured_at) FROM measurements")
+        oldest, newest = cursor.fetchone()
+        if oldest is None:
+            click.echo("The measurements table is empty, nothing to rebuild.")
+            return
+        first_day = (first_day or oldest).date()
+        last_day = (last_day or newest).date()
+        for day, month_end in rebuild_rollups_by_month(conn, cursor, first_day, last_day, station_ids):
+            click.echo(f"Rebuilt rollups for {day} .. {month_end}")
+        cursor.close()
+
+
+# Monthly partitions of the measurements table (see migrations/006_measurement_partitions.sql)
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))  # Empty partitions kept ready for coming months
+RETENTION_MONTHS = int(os.getenv("RETENTION_MONTHS", "0"))  # Full months of raw measurements kept; 0 keeps everything
+# Recompute the hourly and daily rollups of a month from its raw rows before its partition is dropped
+RETENTION_ROLLUPS = os.getenv("RETENTION_ROLLUPS", "true").lower() in ("1", "true", "yes")
+
+# Rows of module_measurements deleted per statement by the retention (one short transaction each)
+RETENTION_DELETE_BATCH = int(os.getenv("RETENTION_DELETE_BATCH", "10000"))
+
+partition_stats = {"last_run": None, "created": [], "dropped": [], "partitions": None, "module_rows_deleted": 0}
+
+
+def add_months(day, months):
+    """Returns the first day of the month `months` months after the month of `day`."""
+    month = day.month - 1 + months
+    return day.replace(year=day.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def measurement_partitions(cursor):
+    """Returns (name, exclusive upper bound) of the measurements partitions in order; the bound of the
+    MAXVALUE partition is None. Returns [] if the table is not partitioned."""
+    cursor.execute(
+        "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'measurements' AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION"
+    )
+    partitions = []
+    for name, description in cursor.fetchall():
+        # RANGE COLUMNS bounds are reported as quoted literals, e.g. '2024-02-01 00:00:00'
+        bound = None if description == "MAXVALUE" else datetime.fromisoformat(description.strip("'")).date()
+        partitions.append((name, bound))
+    return partitions
+
+
+def prune_module_measurements(conn, cursor, cutoff):
+    """Deletes the module readings measured before `cutoff` in batches of RETENTION_DELETE_BATCH rows.
+
+    module_measurements is not partitioned, so its expired rows are deleted station by station
+    through the (station_id, measured_at) index instead of being dropped. Returns the number deleted.
+    """
+    cursor.execute("SELECT station_id FROM weather_station")
+    deleted = 0
+    for (station_id,) in cursor.fetchall():
+        while True:
+            cursor.execute("DELETE FROM module_measurements WHERE station_id = %s AND measured_at < %s LIMIT %s",
+                           (station_id, cutoff, RETENTION_DELETE_BATCH))
+            conn.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < RETENTION_DELETE_BATCH:
+                break
+    return deleted
+
+
+def maintain_measurement_partitions(today=None):
+    """Creates the monthly partitions of measurements up to PARTITION_MONTHS_AHEAD months ahead and drops
+    the ones older than RETENTION_MONTHS full months, together with the module readings of those months.
+
+    New months are split off the MAXVALUE partition, which normally only holds rows of months not
+    partitioned yet, so the split is cheap (right after migration 006 it holds every row and the first
+    run rewrites the table). Queries filtered on measured_at then only read the partitions of their
+    range. Before a partition is dropped its rollups are recomputed from its raw rows (RETENTION_ROLLUPS),
+    so the hourly and daily aggregates outlive the raw data. Returns the created and dropped partitions
+    and the number of module readings deleted.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    created, dropped, module_rows_deleted = [], [], 0
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        partitions = measurement_partitions(cursor)
+        if not partitions:
+            print("The measurements table is not partitioned; apply migrations/006_measurement_partitions.sql first.")
+            cursor.close()
+            return {"created": created, "dropped": dropped, "module_rows_deleted": module_rows_deleted}
+
+        bounds = [bound for _, bound in partitions if bound]
+        if bounds:
+            month = bounds[-1]  # First month without its own partition
+        else:
+            cursor.execute("SELECT MIN(measured_at) FROM measurements")
+            oldest = cursor.fetchone()[0]
+            month = (oldest.date() if oldest else today).replace(day=1)
+        definitions = []
+        while month <= add_months(today, PARTITION_MONTHS_AHEAD):
+            created.append(f"p{month:%Y%m}")
+            definitions.append(f"PARTITION p{month:%Y%m} VALUES LESS THAN ('{add_months(month, 1)}')")
+            month = add_months(month, 1)
+        if definitions:
+            catch_all = partitions[-1][0] if partitions[-1][1] is None else None
+            if catch_all:
+                cursor.execute(f"ALTER TABLE measurements REORGANIZE PARTITION {catch_all} INTO "
+                               f"({', '.join(definitions)}, PARTITION {catch_all} VALUES LESS THAN (MAXVALUE))")
+            else:
+                cursor.execute(f"ALTER TABLE measurements ADD PARTITION ({', '.join(definitions)})")
+            print(f"Created measurement partitions {', '.join(created)}")
+
+        if RETENTION_MONTHS > 0:
+            cutoff = add_months(today, -RETENTION_MONTHS)
+            for name, bound in measurement_partitions(cursor):
+                if bound is None or bound > cutoff:
+                    break
+                if RETENTION_ROLLUPS:
+                    # Only the partition's own month: the oldest partition has no lower bound and also holds
+                    # rows of months dropped before (e.g. backfilled since), whose rollups already include them
+                    # and must not be rebuilt from what is left of their raw rows
+                    month_start = add_months(bound, -1)
+                    cursor.execute(f"SELECT 1 FROM measurements PARTITION ({name}) WHERE measured_at >= %s LIMIT 1",
+                                   (month_start,))
+                    if cursor.fetchone() is not None:
+                        for day, month_end in rebuild_rollups_by_month(conn, cursor, month_start, bound - timedelta(days=1)):
+                            print(f"Recomputed rollups for {day} .. {month_end} before dropping partition {name}")
+                cursor.execute(f"ALTER TABLE measurements DROP PARTITION {name}")
+                dropped.append(name)
+                print(f"Dropped measurement partition {name} (older than {RETENTION_MONTHS} months)")
+            module_rows_deleted = prune_module_measurements(conn, cursor, cutoff)
+            if module_rows_deleted:
+                print(f"Deleted {module_rows_deleted} module readings older than {cutoff}")
+
+        partition_stats.update(last_run=datetime.now().isoformat(), created=created, dropped=dropped,
+                               partitions=len(measurement_partitions(cursor)), module_rows_deleted=module_rows_deleted)
+        cursor.close()
+    return {"created": created, "dropped": dropped, "module_rows_deleted": module_rows_deleted}
+
+
+@app.cli.command("maintain-partitions")
+def maintain_partitions_command():
+    """Creates upcoming monthly partitions of measurements and drops those (and the module readings) past RETENTION_MONTHS."""
+    click.echo(json.dumps(maintain_measurement_partitions(), indent=2))
+
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    """Returns runtime statistics of the connection pool, ingestion, the upstream cache, tokens, the pipeline, the collector, the live feed, partition maintenance, the raw archive and backfill."""
+    return jsonify({
+        "db_pool": db_pool.snapshot(),
+        "ingestion": ingestion_stats,
+        "upstream_cache": upstream_cache.snapshot(),
+        "tokens": token_manager.snapshot(),
+        "pipeline": ingestion_pipeline.snapshot(),
+        "collector": dict(collector_lease.snapshot(), role=APP_ROLE, scheduler_running=scheduler.running),
+        "polling": poll_planner.snapshot(),
+        "live_feed": measurement_feed.snapshot(),
+        "partitions": dict(partition_stats, retention_months=RETENTION_MONTHS),
+        "archive": raw_archive.snapshot(),
+        "backfill": backfill.snapshot(),
+    })
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Returns the process metrics in the Prometheus text exposition format."""
+    DB_POOL_IN_USE.set(db_pool.snapshot()["in_use"])
+    INGEST_QUEUE_DEPTH.set(ingestion_pipeline.queue.qsize())
+    INGEST_SPOOLED_BATCHES.set(len(ingestion_pipeline.spooled_files()))
+    INGEST_WRITERS_ALIVE.set(ingestion_pipeline.writers_alive())
+    COLLECTOR_LEADER.set(1 if scheduler.running and collector_lease.held() else 0)
+    planner = poll_planner.snapshot()
+    POLL_NEXT_SECONDS.set(planner["next_poll_in_seconds"])
+    STATIONS_BACKING_OFF.set(planner["stations_backing_off"])
+    LIVE_SUBSCRIBERS.set(measurement_feed.subscribers())
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+# Ingestion pipeline: the scheduled fetch puts batches on a bounded queue drained by writer threads
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "10"))
+INGEST_WRITERS = int(os.getenv("INGEST_WRITERS", "1"))  # More than one writer may store batches out of order
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "5"))
+INGEST_RETRY_BACKOFF = float(os.getenv("INGEST_RETRY_BACKOFF", "2"))  # Seconds, doubled after every failed attempt
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", "spool")
+INGEST_SHUTDOWN_TIMEOUT = float(os.getenv("INGEST_SHUTDOWN_TIMEOUT", "20"))  # Seconds the writers get to finish on shutdown
+
+
+class IngestionPipeline:
+    """Decouples fetching upstream data from writing it to MySQL.
+
+    submit() puts a batch on a bounded in-process queue and returns immediately. Writer threads
+    drain the queue into the database, retrying with exponential backoff. Batches that still fail,
+    or that arrive while the queue is full, are spilled as JSON files to `spool_dir` and replayed
+    (oldest first) as soon as a write succeeds again. A batch that fails with anything other than a
+    database error would fail again, so it is set aside in the `failed` subdirectory of the spool
+    for inspection and the writer goes on with the next one.
+    """
+
+    def __init__(self, queue_size, writers, max_retries, backoff, spool_dir):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.writers = writers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.spool_dir = spool_dir
+        self._threads = []
+        self._stopping = threading.Event()
+        self._replay_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "enqueued": 0, "written": 0, "retries": 0, "spilled": 0, "replayed": 0, "dropped": 0, "failed": 0,
+            "fetch_seconds_last": None, "queue_wait_seconds_last": None, "write_seconds_last": None,
+        }
+        self.last_error = None
+
+    def _record(self, **changes):
+        with self._stats_lock:
+            for key, value in changes.items():
+                if key.endswith("_last"):
+                    self.stats[key] = round(value, 4)
+                else:
+                    self.stats[key] += value
+
+    def start(self):
+        """Starts the writer threads; batches spilled by a previous run are replayed by the first one."""
+        for index in range(self.writers):
+            thread = threading.Thread(target=self._run_writer, name=f"ingest-writer-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, stations, measurements, modules, module_readings=(), fetch_seconds=None):
+        """Queues the rows of one poll for writing, spilling them to disk if the queue is full."""
+        batch = {"stations": stations, "measurements": measurements, "modules": modules,
+                 "module_readings": list(module_readings), "fetched_at": datetime.now().isoformat()}
+        if fetch_seconds is not None:
+            self._record(fetch_seconds_last=fetch_seconds)
+        try:
+            self.queue.put_nowait((time.monotonic(), batch))
+            self._record(enqueued=1)
+        except queue.Full:
+            print("Ingestion queue is full, spilling batch to disk.")
+            self._spill(batch)
+
+    def stop(self, timeout):
+        """Lets the writers finish the batches they are writing and waits up to `timeout` seconds for them
+        to exit. Batches still queued afterwards are left for spill_pending()."""
+        self._stopping.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def _run_writer(self):
+        self.replay_spool()
+        while not self._stopping.is_set():
+            try:
+                enqueued_at, batch = self.queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            self._record(queue_wait_seconds_last=time.monotonic() - enqueued_at)
+            try:
+                written = self._write_with_retry(batch)
+                if not written:
+                    self._spill(batch)
+            except Exception as e:
+                # Not a database error (e.g. a malformed row), so retrying would not help; keep the writer alive
+                written = False
+                self._fail(batch, e)
+            finally:
+                self.queue.task_done()
+            if written:
+                self.replay_spool()
+
+    def _fail(self, batch, error):
+        print(f"Writing batch fetched at {batch.get('fetched_at')} failed, setting it aside:", repr(error))
+        self.last_error = f"{datetime.now().isoformat()} {error!r}"
+        self._record(failed=1)
+        INGEST_FAILED_BATCHES.inc()
+        self._spill(batch, os.path.join(self.spool_dir, "failed"))
+
+    def _write_with_retry(self, batch, only_newer=True):
+        """Writes a batch, retrying database errors with exponential backoff. Returns True on success."""
+        for attempt in range(self.max_retries + 1):
+            started = time.monotonic()
+            try:
+                store_batch_in_db(batch["stations"], batch["measurements"], batch["modules"], only_newer=only_newer,
+                                  module_readings=batch.get("module_readings", ()))
+            except mysql_errors.Error as e:
+                if attempt == self.max_retries or self._stopping.is_set():
+                    print(f"Writing batch fetched at {batch['fetched_at']} failed after {attempt + 1} attempts:", e)
+                    return False
+                self._record(retries=1)
+                self._stopping.wait(self.backoff * 2 ** attempt)  # Cut short on shutdown, the batch is spilled
+                continue
+            self._record(written=1, write_seconds_last=time.monotonic() - started)
+            return True
+
+    def _spill(self, batch, directory=None):
+        """Writes a batch atomically to the spool directory; counts it as dropped if that fails too."""
+        directory = directory or self.spool_dir
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{time.time_ns()}-{uuid.uuid4().hex[:8]}.json")
+            with open(path + ".tmp", "w") as file:
+                json.dump(batch, file, default=str)
+            os.replace(path + ".tmp", path)
+            self._record(spilled=1)
+        except (OSError, ValueError) as e:
+            print("Failed to spill batch, dropping it:", e)
+            self._record(dropped=1)
+
+    def spill_pending(self):
+        """Moves batches still waiting in the queue to the spool directory (used on shutdown)."""
+        while True:
+            try:
+                _, batch = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            self._spill(batch)
+            self.queue.task_done()
+
+    def spooled_files(self):
+        """Returns the spooled batch files, oldest first."""
+        if not os.path.isdir(self.spool_dir):
+            return []
+        return sorted(os.path.join(self.spool_dir, name) for name in os.listdir(self.spool_dir) if name.endswith(".json"))
+
+    def replay_spool(self):
+        """Writes spooled batches back to the database, stopping at the first one that fails with a database
+        error; batches that fail otherwise are moved to the `failed` subdirectory."""
+        if not self._replay_lock.acquire(blocking=False):
+            return  # Another writer is already replaying
+        try:
+            for path in self.spooled_files():
+                if self._stopping.is_set():
+                    return
+                try:
+                    with open(path) as file:
+                        batch = json.load(file)
+                    # JSON turned the ModuleReading tuples into lists
+                    batch["module_readings"] = [ModuleReading(*reading) for reading in batch.get("module_readings", [])]
+                    for station in batch["stations"]:
+                        # Batches spooled by older versions have no coordinates
+                        if "latitude" not in station:
+                            station["latitude"], station["longitude"] = place_coordinates(json.loads(station.get("place") or "null"))
+                    # Spooled batches are older than what was written since, so the unique key does the deduplication
+                    written = self._write_with_retry(batch, only_newer=False)
+                except Exception as e:
+                    print(f"Replaying spooled batch {path} failed, setting it aside:", repr(e))
+                    self.last_error = f"{datetime.now().isoformat()} {e!r}"
+                    self._record(failed=1)
+                    INGEST_FAILED_BATCHES.inc()
+                    failed_dir = os.path.join(self.spool_dir, "failed")
+                    os.makedirs(failed_dir, exist_ok=True)
+                    os.replace(path, os.path.join(failed_dir, os.path.basename(path)))
+                    continue
+                if not written:
+                    return
+                os.remove(path)
+                self._record(replayed=1)
+        finally:
+            self._replay_lock.release()
+
+    def writers_alive(self):
+        return sum(1 for thread in self._threads if thread.is_alive())
+
+    def snapshot(self):
+        """Returns queue depth, writer liveness, stage latencies and batch counters."""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["queue_depth"] = self.queue.qsize()
+        stats["spooled_batches"] = len(self.spooled_files())
+        stats["writers"] = len(self._threads)
+        stats["writers_alive"] = self.writers_alive()
+        stats["last_error"] = self.last_error
+        return stats
+
+
+ingestion_pipeline = IngestionPipeline(INGEST_QUEUE_SIZE, INGEST_WRITERS, INGEST_MAX_RETRIES,
+                                       INGEST_RETRY_BACKOFF, INGEST_SPOOL_DIR)
+
+
+# Historical backfill through the Netatmo getmeasure endpoint
+GETMEASURE_URL = os.getenv("GETMEASURE_URL", "https://api.netatmo.com/api/getmeasure")
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "4"))
+BACKFILL_SCALE = os.getenv("BACKFILL_SCALE", "30min")
+BACKFILL_CHECKPOINT_FILE = os.getenv("BACKFILL_CHECKPOINT_FILE", "backfill_checkpoint.json")
+# Netatmo allows 50 requests per 10 seconds and 500 per hour for each user; stay a little below both
+BACKFILL_RATE_LIMITS = (
+    (int(os.getenv("BACKFILL_REQUESTS_PER_10S", "40")), 10),
+    (int(os.getenv("BACKFILL_REQUESTS_PER_HOUR", "450")), 3600),
+)
+
+# getmeasure scale -> seconds between returned values; one request returns at most GETMEASURE_LIMIT values
+GETMEASURE_SCALES = {"max": 300, "30min": 1800, "1hour": 3600, "3hours": 10800, "1day": 86400}
+GETMEASURE_LIMIT = 1024
+
+# Module type -> getmeasure types it reports and the measurements column each one is stored in.
+# Indoor modules (NAModule4) are left out so they do not overwrite the outdoor temperature and humidity.
+GETMEASURE_TYPES = {
+    "NAMain": {"pressure": "pressure", "noise": "noise"},
+    "NAModule1": {"temperature": "temperature", "humidity": "humidity", "min_temp": "min_temp", "max_temp": "max_temp"},
+    "NAModule2": {"windstrength": "wind_strength", "windangle": "wind_angle",
+                  "guststrength": "gust_strength", "gustangle": "gust_angle"},
+    "NAModule3": {},
+}
+
+# getmeasure scale -> measurements column its rain total is stored in. sum_rain is the rain of one
+# interval, so it is only kept where that matches a column (the rain column holds the current reading).
+GETMEASURE_RAIN_COLUMNS = {"1hour": "sum_rain_1", "1day": "sum_rain_24"}
+
+
+class RateLimiter:
+    """Sliding-window rate limiter shared by all backfill workers.
+
+    acquire() blocks until one more call fits into every (max_calls, period) window. pause() stops
+    all callers for a while, e.g. after the API reported that the quota is used up.
+    """
+
+    def __init__(self, limits):
+        self.limits = limits
+        self._calls = collections.deque()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                longest = max(period for _, period in self.limits)
+                while self._calls and now - self._calls[0] >= longest:
+                    self._calls.popleft()
+                wait = self._blocked_until - now
+                for max_calls, period in self.limits:
+                    recent = [t for t in self._calls if now - t < period]
+                    if len(recent) >= max_calls:
+                        wait = max(wait, recent[-max_calls] + period - now)
+                if wait <= 0:
+                    self._calls.append(now)
+                    return
+                self.waited_seconds += wait
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+backfill_rate_limiter = RateLimiter(BACKFILL_RATE_LIMITS)
+
+
+def fetch_measure(station_id, module_id, types, date_begin, date_end, scale):
+    """Requests getmeasure values of one module and returns them as {timestamp: [value per type]}.
+
+    Quota errors (HTTP 429, or 403 with Netatmo error code 26) pause the shared rate limiter and
+    are retried with exponential backoff; other errors raise UpstreamError.
+    """
+    params = {
+        "device_id": station_id,
+        "scale": scale,
+        "type": ",".join(types),
+        "date_begin": date_begin,
+        "date_end": date_end,
+        "limit": GETMEASURE_LIMIT,
+        "optimize": "false",
+        "real_time": "true",  # Timestamps at the start of each interval instead of its middle
+    }
+    if module_id:
+        params["module_id"] = module_id
+
+    for attempt in range(INGEST_MAX_RETRIES + 1):
+        backfill_rate_limiter.acquire()
+        headers = {"Authorization": f"Bearer {token_manager.get_access_token()}", "accept": "application/json"}
+        response = upstream_request("getmeasure", "GET", GETMEASURE_URL, params=params, headers=headers, timeout=30)
+        if response.status_code == 200:
+            return response.json().get("body") or {}
+
+        try:
+            details = response.json()
+        except ValueError:
+            details = {"error": response.text}
+        error_code = details.get("error", {}).get("code") if isinstance(details.get("error"), dict) else None
+        if (response.status_code == 429 or error_code == 26) and attempt < INGEST_MAX_RETRIES:
+            backfill_rate_limiter.pause(float(response.headers.get("Retry-After") or 60 * 2 ** attempt))
+            continue
+        raise UpstreamError(response.status_code, details)
+
+
+class Backfill:
+    """Fills in measurement history from getmeasure for a date range and a list of stations.
+
+    The range is split into (station, window) work items of at most GETMEASURE_LIMIT values, run
+    on a bounded thread pool; every request passes the shared rate limiter. The readings of all
+    modules of a station are merged into one measurements row per timestamp and stored as soon as
+    the window is complete. Each station is only backfilled up to its oldest stored measurement,
+    so history that is already stored at the resolution of the live polls is not stored again at
+    the coarser getmeasure scale. Finished windows and those ends are recorded in a checkpoint file,
+    so an interrupted backfill started again with the same range only fetches what is still missing.
+
+    Web workers and `flask backfill` processes take turns through `lease`: only its holder runs a
+    backfill, and it stores its progress in the lease row, so every process reports the same one.
+    """
+
+    def __init__(self, workers, scale, checkpoint_path, lease):
+        self.workers = workers
+        self.scale = scale
+        self.checkpoint_path = checkpoint_path
+        self.lease = lease
+        self.shared_status = True
+        self._run_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.status = {"running": False}
+
+    def _record(self, **changes):
+        with self._lock:
+            for key, value in changes.items():
+                self.status[key] += value
+
+    def _load_checkpoint(self):
+        """Returns the finished windows and the history end of each station planned so far."""
+        if not os.path.exists(self.checkpoint_path):
+            return set(), {}
+        with open(self.checkpoint_path) as file:
+            checkpoint = json.load(file)
+        # Windows fetched at another scale do not cover the same rows
+        if checkpoint.get("scale") != self.scale:
+            return set(), {}
+        return set(checkpoint["done"]), checkpoint.get("ends", {})
+
+    def _save_checkpoint(self, done, ends):
+        with open(self.checkpoint_path + ".tmp", "w") as file:
+            json.dump({"scale": self.scale, "done": sorted(done), "ends": ends}, file)
+        os.replace(self.checkpoint_path + ".tmp", self.checkpoint_path)
+
+    def plan(self, station_ids, start, end, ends=None):
+        """Returns the modules of each station, the (station_id, date_begin, date_end) work items and the
+        history end of each station (Unix time of its oldest stored measurement, None if it has none).
+
+        Ends already in `ends` (from the checkpoint) are kept: the rows backfilled since are older
+        than the live history and must not move them.
+        """
+        ends = dict(ends or {})
+        where, params = "", list(station_ids)
+        if station_ids:
+            where = f" WHERE station_id IN ({', '.join(['%s'] * len(station_ids))})"
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT station_id, type FROM weather_station" + where, params)
+            modules = {station_id: [(None, station_type or "NAMain")] for station_id, station_type in cursor.fetchall()}
+            cursor.execute("SELECT station_id, module_id, type FROM weather_station_modules" + where, params)
+            for station_id, module_id, module_type in cursor.fetchall():
+                modules[station_id].append((module_id, module_type))
+            unplanned = [station_id for station_id in modules if station_id not in ends]
+            if unplanned:
+                cursor.execute(f"SELECT station_id, MIN(measured_at) FROM measurements "
+                               f"WHERE station_id IN ({', '.join(['%s'] * len(unplanned))}) GROUP BY station_id", unplanned)
+                oldest = dict(cursor.fetchall())
+                for station_id in unplanned:
+                    stored = oldest.get(station_id)
+                    ends[station_id] = int(stored.replace(tzinfo=timezone.utc).timestamp()) if stored else None
+            cursor.close()
+
+        # Windows are aligned to multiples of their length, so runs over overlapping ranges share checkpoints
+        window = GETMEASURE_SCALES[self.scale] * GETMEASURE_LIMIT
+        first = int(start.replace(tzinfo=timezone.utc).timestamp())
+        last = int(end.replace(tzinfo=timezone.utc).timestamp())
+        items = []
+        for station_id in sorted(modules):
+            station_last = last if ends[station_id] is None else min(last, ends[station_id])
+            for window_start in range(first - first % window, station_last, window):
+                items.append((station_id, max(first, window_start), min(station_last, window_start + window) - 1))
+        return modules, items, ends
+
+    def _run_item(self, station_id, modules, date_begin, date_end):
+        """Fetches one window of every module of a station and stores the merged rows."""
+        readings = {}
+        for module_id, module_type in modules:
+            columns = GETMEASURE_TYPES.get(module_type)
+            if module_type == "NAModule3" and self.scale in GETMEASURE_RAIN_COLUMNS:
+                columns = {"sum_rain": GETMEASURE_RAIN_COLUMNS[self.scale]}
+            if not columns:
+                continue
+            # min_temp and max_temp only exist for aggregated scales
+            types = [t for t in columns if self.scale != "max" or t not in ("min_temp", "max_temp")]
+            begin = date_begin
+            while begin <= date_end:
+                body = fetch_measure(station_id, module_id, types, begin, date_end, self.scale)
+                self._record(requests=1)
+                for timestamp, values in body.items():
+                    timestamp = int(timestamp)
+                    formatted = datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+                    row = readings.get(timestamp)
+                    if row is None:
+                        row = readings[timestamp] = empty_measurement(station_id, formatted)
+                    for measure_type, value in zip(types, values):
+                        if value is not None:
+                            row[columns[measure_type]] = value
+                            row[f"time_utc_{columns[measure_type]}"] = formatted
+                # A full page may have been cut off by the limit; ask for the rest of the window
+                last = max(int(timestamp) for timestamp in body) if body else date_end
+                if len(body) < GETMEASURE_LIMIT or last + GETMEASURE_SCALES[self.scale] > date_end:
+                    break
+                begin = last + 1
+
+        measurements = [readings[timestamp] for timestamp in sorted(readings)]
+        if not measurements:
+            return {"inserted": 0, "skipped": 0}
+        # History is older than the last live reading, so the unique key does the deduplication
+        return store_batch_in_db([], measurements, [], only_newer=False, live=False)
+
+    def _acquire(self):
+        """Takes the run lock of this process and the lease shared by all processes."""
+        if not self._run_lock.acquire(blocking=False):
+            raise RuntimeError("A backfill is already running.")
+        if not self.lease.renew():
+            self._run_lock.release()
+            raise RuntimeError(f"A backfill is already running in {self.lease.current_holder}.")
+
+    def run(self, station_ids, start, end):
+        """Backfills [start, end) for the given stations (all known stations if empty) and waits for it."""
+        self._acquire()
+        self._run(station_ids, start, end)
+        return self.snapshot()
+
+    def start(self, station_ids, start, end):
+        """Starts a backfill in a background thread. Raises RuntimeError if one is already running."""
+        self._acquire()
+        with self._lock:
+            self.status = {"running": True}
+        threading.Thread(target=self._run, args=(station_ids, start, end), name="backfill", daemon=True).start()
+
+    def _heartbeat(self, finished):
+        """Renews the lease and publishes the progress every ttl/3 seconds until `finished` is set."""
+        while not finished.wait(max(1, self.lease.ttl // 3)):
+            self.lease.renew()
+            self._publish()
+
+    def _run(self, station_ids, start, end):
+        finished = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(finished,), name="backfill-lease", daemon=True)
+        try:
+            with self._lock:
+                self.status = {
+                    "running": True, "from": start.isoformat(), "to": end.isoformat(), "scale": self.scale,
+                    "stations": 0, "windows_total": 0, "windows_done": 0, "windows_failed": 0,
+                    "requests": 0, "inserted": 0, "skipped": 0, "errors": [],
+                    "started_at": datetime.now().isoformat(), "finished_at": None,
+                    "holder": self.lease.holder,
+                }
+            self._publish()
+            heartbeat.start()
+            done, ends = self._load_checkpoint()
+            modules, items, ends = self.plan(station_ids, start, end, ends)
+            self._save_checkpoint(done, ends)
+            pending = [item for item in items if "|".join(map(str, item)) not in done]
+            self._record(stations=len(modules), windows_total=len(items), windows_done=len(items) - len(pending))
+
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="backfill") as executor:
+                futures = {executor.submit(self._run_item, item[0], modules[item[0]], item[1], item[2]): item
+                           for item in pending}
+                for future in as_completed(futures):
+                    key = "|".join(map(str, futures[future]))
+                    try:
+                        result = future.result()
+                    except (UpstreamError, requests.RequestException, mysql_errors.Error) as e:
+                        print(f"Backfill of window {key} failed:", e)
+                        self._record(windows_failed=1)
+                        with self._lock:
+                            self.status["errors"] = (self.status["errors"] + [f"{key}: {e}"])[-20:]
+                        continue
+                    done.add(key)
+                    self._save_checkpoint(done, ends)
+                    self._record(windows_done=1, inserted=result["inserted"], skipped=result["skipped"])
+                    if not self.lease.held():
+                        # Another process may be running a backfill with the same checkpoint by now
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        raise RuntimeError("Lost the backfill lease, stopping.")
+        except Exception as e:
+            print("Backfill failed:", e)
+            with self._lock:
+                self.status.setdefault("errors", []).append(str(e))
+        finally:
+            finished.set()
+            if heartbeat.is_alive():
+                heartbeat.join()
+            with self._lock:
+                self.status.update(running=False, finished_at=datetime.now().isoformat())
+            self._publish()
+            self.lease.release()
+            self._run_lock.release()
+
+    def _local_snapshot(self):
+        with self._lock:
+            return dict(self.status, errors=list(self.status.get("errors", [])),
+                        rate_limit_wait_seconds=round(backfill_rate_limiter.waited_seconds, 1))
+
+    def _publish(self):
+        """Stores the progress of this process's backfill in the lease row."""
+        if not self.lease.enabled or not self.shared_status:
+            return
+        try:
+            with db_pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("UPDATE collector_lease SET status = %s WHERE name = %s AND holder = %s",
+                               (json.dumps(self._local_snapshot()), self.lease.name, self.lease.holder))
+                conn.commit()
+                cursor.close()
+        except mysql_errors.Error as e:
+            self._status_error(e)
+
+    def _status_error(self, e):
+        if getattr(e, "errno", None) == errorcode.ER_BAD_FIELD_ERROR:
+            print("Column collector_lease.status is missing (see migrations/), keeping the backfill progress per process.")
+            self.shared_status = False
+        else:
+            print("Could not share the backfill progress:", e)
+
+    def snapshot(self):
+        """Returns the progress of the running or last backfill of any process."""
+        local = self._local_snapshot()
+        if local.get("running") or not self.lease.enabled or not self.shared_status:
+            return local
+        try:
+            with db_pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT status, expires_at > NOW(6) FROM collector_lease WHERE name = %s", (self.lease.name,))
+                row = cursor.fetchone()
+                cursor.close()
+        except mysql_errors.Error as e:
+            self._status_error(e)
+            return local
+        if not row or not row[0]:
+            return local
+        status = json.loads(row[0])
+        if status.get("running") and not row[1]:
+            # The process running it stopped without finishing
+            status.update(running=False, errors=status.get("errors", []) + ["The backfill stopped unexpectedly."])
+        return status
+
+
+def parse_backfill_range(first_day, last_day):
+    """Parses the from/to values of a backfill (ISO dates or datetimes in UTC, `to` exclusive)."""
+    if not first_day:
+        raise ValueError("'from' is required")
+    try:
+        start = datetime.fromisoformat(first_day)
+        end = datetime.fromisoformat(last_day) if last_day else datetime.utcnow()
+    except ValueError as e:
+        raise ValueError(f"Invalid date range, expected ISO dates or datetimes: {e}")
+    if start >= end:
+        raise ValueError("'from' must be before 'to'")
+    return start, end
+
+
+@app.route("/backfill", methods=["GET", "POST"])
+def backfill_route():
+    """Starts a historical backfill (POST with from, to and station_id) or reports its progress (GET)."""
+    if request.method == "POST":
+        try:
+            start, end = parse_backfill_range(request.values.get("from"), request.values.get("to"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        station_ids = [s for s in request.values.getlist("station_id") if s]
+        try:
+            backfill.start(station_ids, start, end)
+        except RuntimeError as e:
+            return jsonify({"error": str(e), "backfill": backfill.snapshot()}), 409
+        return jsonify({"message": "Backfill started.", "backfill": backfill.snapshot()}), 202
+
+    return jsonify(backfill.snapshot())
+
+
+@app.cli.command("backfill")
+@click.option("--from", "first_day", required=True, help="Start of the range (ISO date or datetime, UTC).")
+@click.option("--to", "last_day", help="End of the range, exclusive (default: now).")
+@click.option("--station", "station_ids", multiple=True, help="Backfill only these stations (repeatable, default: all).")
+def backfill_command(first_day, last_day, station_ids):
+    """Fills in measurement history from the Netatmo getmeasure endpoint."""
+    try:
+        start, end = parse_backfill_range(first_day, last_day)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    try:
+        result = backfill.run(list(station_ids), start, end)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(json.dumps(result, indent=2))
+
+
+# Archive of the raw getstationsdata responses, from which the tables can be derived again
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")  # Empty disables the archive
+ARCHIVE_REPLAY_WORKERS = int(os.getenv("ARCHIVE_REPLAY_WORKERS", "0")) or os.cpu_count() or 1
+ARCHIVE_REPLAY_CHUNK = 50  # Polls decompressed and extracted by one worker task
+# Polls made up to this long after the end of a replayed range still carry readings from within it
+ARCHIVE_REPLAY_LOOKAHEAD = timedelta(days=1)
+# Polls further apart than this leave a gap in the archive, which replay --replace does not delete
+ARCHIVE_MAX_GAP = int(os.getenv("ARCHIVE_MAX_GAP", "3600"))
+
+
+class RawArchive:
+    """Append-only archive of the raw getstationsdata responses, one segment per UTC day.
+
+    Every poll is appended to raw-YYYY-MM-DD.ndjson.gz as a gzip member of its own, so a segment is
+    a valid gzip file of NDJSON (zcat prints one poll per line) and any poll can be decompressed
+    without reading the ones before it. The segment's index raw-YYYY-MM-DD.idx holds one JSON line
+    per poll with its time, byte offset and length, which lets a replay pick a time range and split
+    it across processes. Appends of several processes are serialized with a lock on the index file.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.enabled = bool(directory)
+        self._lock = threading.Lock()
+        self.stats = {"appended": 0, "bytes": 0, "errors": 0, "last_polled_at": None}
+
+    def segment_paths(self, day):
+        """Returns the data and index paths of the segment of `day`."""
+        base = os.path.join(self.directory, f"raw-{day:%Y-%m-%d}")
+        return base + ".ndjson.gz", base + ".idx"
+
+    def append(self, raw, devices=None, polled_at=None):
+        """Appends one raw response (bytes). Failures are logged and counted, polling goes on without the archive."""
+        if not self.enabled:
+            return
+        polled_at = time.time() if polled_at is None else polled_at
+        member = gzip.compress(raw.rstrip(b"\n") + b"\n", compresslevel=6)  # Level 9 is much slower for a few % less
+        data_path, index_path = self.segment_paths(datetime.fromtimestamp(polled_at, timezone.utc).date())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with self._lock, open(index_path, "ab") as index, open(data_path, "ab") as data:
+                fcntl.flock(index, fcntl.LOCK_EX)  # Released when the file is closed
+                offset = data.seek(0, os.SEEK_END)
+                data.write(member)
+                data.flush()
+                # The index line is only written once the data is, so every indexed poll is complete
+                entry = {"polled_at": round(polled_at, 3), "offset": offset, "length": len(member), "devices": devices}
+                index.write(json.dumps(entry).encode() + b"\n")
+        except OSError as e:
+            print("Failed to archive the raw response:", e)
+            self.stats["errors"] += 1
+            ARCHIVED_POLLS.inc(result="error")
+            return
+        self.stats["appended"] += 1
+        self.stats["bytes"] += len(member)
+        self.stats["last_polled_at"] = datetime.fromtimestamp(polled_at, timezone.utc).isoformat()
+        ARCHIVED_POLLS.inc(result="ok")
+
+    def segments(self):
+        """Returns (day, data path, index path) of every segment, oldest first."""
+        if not self.enabled or not os.path.isdir(self.directory):
+            return []
+        segments = []
+        for name in sorted(os.listdir(self.directory)):
+            match = re.fullmatch(r"raw-(\d{4}-\d{2}-\d{2})\.idx", name)
+            if match:
+                day = datetime.strptime(match.group(1), "%Y-%m-%d").date()
+                segments.append((day,) + self.segment_paths(day))
+        return segments
+
+    def entries(self, start=None, end=None):
+        """Yields (data path, index entries) of the segments with polls made in [start, end) (Unix times)."""
+        first_day = datetime.fromtimestamp(start, timezone.utc).date() if start is not None else None
+        last_day = datetime.fromtimestamp(end, timezone.utc).date() if end is not None else None
+        for day, data_path, index_path in self.segments():
+            if (first_day and day < first_day) or (last_day and day > last_day):
+                continue
+            entries = []
+            with open(index_path) as index:
+                for line in index:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Cut off by a crash while appending
+                    if (start is None or entry["polled_at"] >= start) and (end is None or entry["polled_at"] < end):
+                        entries.append(entry)
+            if entries:
+                yield data_path, sorted(entries, key=lambda entry: entry["polled_at"])
+
+    def snapshot(self):
+        """Returns the append counters and the number and size of the segments."""
+        segments = self.segments()
+        return dict(self.stats, directory=self.directory, enabled=self.enabled, segments=len(segments),
+                    size_bytes=sum(os.path.getsize(data_path) for _, data_path, _ in segments if os.path.exists(data_path)))
+
+
+raw_archive = RawArchive(ARCHIVE_DIR)
+
+
+def derive_archived_polls(data_path, spans, start=None, end=None):
+    """Decompresses the polls at `spans` (offset, length) of a segment and runs the current extraction over them.
+
+    Runs in the replay worker processes. Station and module rows are those of the last poll (they
+    only add stations and modules missing from the database); the measurements and module readings
+    are deduplicated (every poll repeats a station's reading until it publishes a new one) and
+    limited to measured_at in [start, end) ('YYYY-MM-DD HH:MM:SS').
+    """
+    def in_range(measured_at):
+        return measured_at and (start is None or measured_at >= start) and (end is None or measured_at < end)
+
+    stations, modules, measurements, module_readings = {}, {}, {}, {}
+    with open(data_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as segment:
+        for offset, length in spans:
+            payload = json.loads(gzip.decompress(segment[offset:offset + length]))
+            (poll_stations, poll_measurements, poll_modules, poll_readings), _ = organize_station_data(payload)
+            stations.update((station["station_id"], station) for station in poll_stations)
+            modules.update((module["module_id"], module) for module in poll_modules)
+            for measurement in poll_measurements:
+                if in_range(measurement["measured_at"]):
+                    measurements.setdefault((measurement["station_id"], measurement["measured_at"]), measurement)
+            for reading in poll_readings:
+                if in_range(reading.measured_at):
+                    module_readings.setdefault((reading.module_id, reading.measured_at), reading)
+    return (len(spans), list(stations.values()), list(measurements.values()), list(modules.values()),
+            list(module_readings.values()))
+
+
+@contextmanager
+def replay_worker_pool(workers):
+    """Starts the worker processes of replay_archive.
+
+    The workers are fresh interpreters rather than forks of this process, whose scheduler and writer
+    threads may hold locks at the time of the fork. Importing the app does not start the collector,
+    so they never poll or write on their own.
+    """
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        yield pool
+
+
+def replay_archive(start=None, end=None, workers=None, replace=False, dry_run=False):
+    """Derives the tables again from the archived polls made in [start, end) (naive UTC datetimes).
+
+    The segments are memory-mapped and split into tasks of ARCHIVE_REPLAY_CHUNK polls, which a pool
+    of worker processes (see replay_worker_pool) decompresses and runs through extract_data; the results are written in
+    order by this process as they arrive, while the workers go on with the next tasks. By default
+    only readings missing from the database are added. With replace=True the measurements and
+    module readings of the spans of the range the archive covers (see archived_spans) are deleted
+    first, so a changed extraction is applied to them; a range without archived polls raises
+    ValueError before anything is deleted. The rollups of the written days are rebuilt at the end;
+    dry_run only extracts.
+    """
+    started = time.monotonic()
+    first = start.replace(tzinfo=timezone.utc).timestamp() if start else None
+    last = (end + ARCHIVE_REPLAY_LOOKAHEAD).replace(tzinfo=timezone.utc).timestamp() if end else None
+    start_text = start.strftime("%Y-%m-%d %H:%M:%S") if start else None
+    end_text = end.strftime("%Y-%m-%d %H:%M:%S") if end else None
+    tasks, poll_times = [], []
+    for data_path, entries in raw_archive.entries(first, last):
+        spans = [(entry["offset"], entry["length"]) for entry in entries]
+        tasks += [(data_path, spans[i:i + ARCHIVE_REPLAY_CHUNK], start_text, end_text)
+                  for i in range(0, len(spans), ARCHIVE_REPLAY_CHUNK)]
+        poll_times += [entry["polled_at"] for entry in entries]
+
+    result = {"polls": 0, "measurements": 0, "module_readings": 0, "inserted": 0, "skipped": 0, "deleted": 0}
+    replaced = []
+    if replace:
+        replaced = archived_spans(poll_times, start, end)
+        if not replaced:
+            raise ValueError(f"No archived polls between {start} and {end}, nothing was deleted.")
+        result["replaced"] = [[span_start.isoformat(), span_end.isoformat()] for span_start, span_end in replaced]
+        if not dry_run:
+            result["deleted"] = sum(delete_measurement_range(span_start, span_end) for span_start, span_end in replaced)
+
+    last_written = {}  # station or module ID -> newest measured_at written so far
+    written_days = set()
+    workers = workers or ARCHIVE_REPLAY_WORKERS
+    with replay_worker_pool(workers) as pool:
+        queued = iter(tasks)
+        # A bounded window of tasks in flight keeps the results in order without holding them all in memory
+        pending = collections.deque(pool.submit(derive_archived_polls, *task) for task in itertools.islice(queued, workers * 2))
+        while pending:
+            polls, stations, measurements, modules, module_readings = pending.popleft().result()
+            task = next(queued, None)
+            if task:
+                pending.append(pool.submit(derive_archived_polls, *task))
+
+            # Readings repeated across tasks are dropped here, so the unique keys rarely have to
+            measurements = [m for m in measurements if m["measured_at"] > last_written.get(m["station_id"], "")]
+            module_readings = [r for r in module_readings if r.measured_at > last_written.get(r.module_id, "")]
+            for measurement in measurements:
+                last_written[measurement["station_id"]] = max(measurement["measured_at"], last_written.get(measurement["station_id"], ""))
+                written_days.add(measurement["measured_at"][:10])
+            for reading in module_readings:
+                last_written[reading.module_id] = max(reading.measured_at, last_written.get(reading.module_id, ""))
+            result["polls"] += polls
+            result["measurements"] += len(measurements)
+            result["module_readings"] += len(module_readings)
+            if not dry_run and stations:
+                stored = store_batch_in_db(stations, measurements, modules, only_newer=False,
+                                           module_readings=module_readings, rollups=False, update_metadata=False)
+                result["inserted"] += stored["inserted"]
+                result["skipped"] += stored["skipped"]
+
+    if not dry_run and (written_days or replaced):
+        for span_start, span_end in replaced:
+            written_days.update((span_start.date().isoformat(), (span_end - timedelta(microseconds=1)).date().isoformat()))
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+            for day, month_end in rebuild_rollups_by_month(conn, cursor, datetime.fromisoformat(min(written_days)).date(),
+                                                           datetime.fromisoformat(max(written_days)).date()):
+                print(f"Rebuilt rollups for {day} .. {month_end}")
+            cursor.close()
+    result.update(workers=workers, tasks=len(tasks), seconds=round(time.monotonic() - started, 2))
+    return result
+
+
+def archived_spans(poll_times, start, end):
+    """Returns the (start, end) spans within [start, end) covered by the archived polls at `poll_times`.
+
+    A reading is never newer than the poll that fetched it, so the archive holds every reading
+    measured between the first and the last of a run of polls no more than ARCHIVE_MAX_GAP seconds
+    apart. Readings outside these spans (before the archive existed, while the collector was down)
+    cannot be derived again.
+    """
+    spans = []
+    for polled_at in sorted(poll_times):
+        if spans and polled_at - spans[-1][1] <= ARCHIVE_MAX_GAP:
+            spans[-1][1] = polled_at
+        else:
+            spans.append([polled_at, polled_at])
+    clipped = []
+    for first, last in spans:
+        span_start = max(start, datetime.utcfromtimestamp(first).replace(microsecond=0))
+        span_end = min(end, datetime.utcfromtimestamp(last).replace(microsecond=0) + timedelta(seconds=1))
+        if span_start < span_end:
+            clipped.append((span_start, span_end))
+    return clipped
+
+
+def delete_measurement_range(start, end):
+    """Deletes the measurements and module readings with measured_at in [start, end), one month per transaction."""
+    deleted = 0
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        month_start = start
+        while month_start < end:
+            month_end = min(end, datetime.combine(add_months(month_start.date(), 1), datetime.min.time()))
+            for table in ("measurements", "module_measurements"):
+                cursor.execute(f"DELETE FROM {table} WHERE measured_at >= %s AND measured_at < %s", (month_start, month_end))
+                deleted += cursor.rowcount
+            conn.commit()
+            print(f"Deleted stored readings from {month_start} to {month_end}")
+            month_start = month_end
+        cursor.close()
+    return deleted
+
+
+@app.cli.command("replay-archive")
+@click.option("--from", "start", type=click.DateTime(["%Y-%m-%d", "%Y-%m-%dT%H:%M:%S"]), help="Start of the range (UTC, default: oldest archived poll).")
+@click.option("--to", "end", type=click.DateTime(["%Y-%m-%d", "%Y-%m-%dT%H:%M:%S"]), help="End of the range, exclusive (UTC, default: newest archived poll).")
+@click.option("--workers", type=int, help="Worker processes (default: ARCHIVE_REPLAY_WORKERS, or one per CPU).")
+@click.option("--replace", is_flag=True, help="Delete the stored readings of the time spans of the range that the archive covers and derive "
+                                               "them again (needs --from and --to). Readings in those spans that were not polled, e.g. "
+                                               "from flask backfill, are lost.")
+@click.option("--dry-run", is_flag=True, help="Only decompress and extract, without touching the database.")
+def replay_archive_command(start, end, workers, replace, dry_run):
+    """Re-runs extraction over the raw polls in ARCHIVE_DIR and stores the result."""
+    if replace and not (start and end):
+        raise click.UsageError("--replace needs --from and --to.")
+    if start and end and start >= end:
+        raise click.BadParameter("--from must be before --to.")
+    try:
+        result = replay_archive(start, end, workers, replace, dry_run)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(json.dumps(result, indent=2))
+
+
+# Process role: "all" serves the web app and collects data in one process, "web" only serves
+# requests, "collector" only runs the scheduler and the database writer (see collector.py)
+APP_ROLE = os.getenv("APP_ROLE", "all")
+if APP_ROLE not in ("all", "web", "collector"):
+    raise RuntimeError(f"Unknown APP_ROLE '{APP_ROLE}', expected all, web or collector")
+
+# Only the holder of this database lease polls; 0 disables the lease
+COLLECTOR_LEASE_NAME = os.getenv("COLLECTOR_LEASE_NAME", "collector")
+COLLECTOR_LEASE_TTL = int(os.getenv("COLLECTOR_LEASE_TTL", "60"))
+# Port on which a dedicated collector serves its /metrics and /stats (0: none)
+COLLECTOR_METRICS_PORT = int(os.getenv("COLLECTOR_METRICS_PORT", "9101"))
+
+# Take the lease if it is free or expired, extend it if we hold it. MySQL applies the assignments
+# in order, so expires_at is only moved when the holder (already updated) is this process.
+COLLECTOR_LEASE_QUERY = """
+INSERT INTO collector_lease (name, holder, expires_at) VALUES (%s, %s, NOW(6) + INTERVAL %s SECOND)
+ON DUPLICATE KEY UPDATE
+    holder = IF(holder = VALUES(holder) OR expires_at < NOW(6), VALUES(holder), holder),
+    expires_at = IF(holder = VALUES(holder), VALUES(expires_at), expires_at)
+"""
+
+
+class CollectorLease:
+    """Database lease that lets only one collector poll when several replicas or workers run
+    (and, under another name, only one process run a backfill).
+
+    Every collector tries to take or renew the lease every ttl/3 seconds. Expiry is computed by
+    the database, so the replicas' clocks do not need to agree. A holder that cannot reach the
+    database keeps polling until its own copy of the lease runs out, which is never later than
+    the time another replica can take it over.
+    """
+
+    def __init__(self, name, ttl):
+        self.name = name
+        self.ttl = ttl
+        self.enabled = ttl > 0
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.current_holder = None
+        self._valid_until = 0.0
+        self.stats = {"acquired": 0, "lost": 0, "errors": 0}
+
+    def held(self):
+        """Returns True while this process may poll."""
+        return not self.enabled or time.monotonic() < self._valid_until
+
+    def renew(self):
+        """Takes or extends the lease and returns held()."""
+        if not self.enabled:
+            return True
+        was_held = self.held()
+        started = time.monotonic()
+        try:
+            with db_pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(COLLECTOR_LEASE_QUERY, (self.name, self.holder, self.ttl))
+                cursor.execute("SELECT holder FROM collector_lease WHERE name = %s", (self.name,))
+                self.current_holder = cursor.fetchone()[0]
+                conn.commit()
+                cursor.close()
+        except mysql_errors.Error as e:
+            if getattr(e, "errno", None) == errorcode.ER_NO_SUCH_TABLE:
+                print(f"Table collector_lease is missing (see migrations/), running without the {self.name} lease.")
+                self.enabled = False
+                return True
+            self.stats["errors"] += 1
+            print(f"Could not renew the {self.name} lease:", e)
+            return self.held()
+
+        if self.current_holder == self.holder:
+            # Counted from before the statement, so it ends no later than the lease in the database
+            self._valid_until = started + self.ttl
+            if not was_held:
+                self.stats["acquired"] += 1
+                print(f"Acquired the {self.name} lease as {self.holder}.")
+        else:
+            if was_held:
+                self.stats["lost"] += 1
+                print(f"Lost the {self.name} lease to {self.current_holder}.")
+            self._valid_until = 0.0
+        return self.held()
+
+    def release(self):
+        """Gives the lease up so another replica can take over without waiting for it to expire."""
+        if not self.enabled or not self.held():
+            return
+        self._valid_until = 0.0
+        try:
+            with db_pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("UPDATE collector_lease SET expires_at = NOW(6) WHERE name = %s AND holder = %s",
+                               (self.name, self.holder))
+                conn.commit()
+                cursor.close()
+        except mysql_errors.Error as e:
+            print(f"Could not release the {self.name} lease:", e)
+
+    def snapshot(self):
+        return dict(self.stats, enabled=self.enabled, held=self.held(), holder=self.holder,
+                    current_holder=self.current_holder, ttl=self.ttl)
+
+
+collector_lease = CollectorLease(COLLECTOR_LEASE_NAME, COLLECTOR_LEASE_TTL)
+# Backfills started by any web worker or `flask backfill` take turns through a lease of their own
+backfill = Backfill(BACKFILL_WORKERS, BACKFILL_SCALE, BACKFILL_CHECKPOINT_FILE, CollectorLease("backfill", COLLECTOR_LEASE_TTL))
+
+
+# Adaptive polling: getstationsdata is polled shortly after the stations are expected to publish
+POLL_MIN_INTERVAL = int(os.getenv("POLL_MIN_INTERVAL", "120"))  # Seconds between polls, at least
+POLL_MAX_INTERVAL = int(os.getenv("POLL_MAX_INTERVAL", "1800"))  # ... and at most
+POLL_BUDGET_PER_HOUR = int(os.getenv("POLL_BUDGET_PER_HOUR", "20"))  # Upstream polls allowed in any hour
+POLL_GRACE = int(os.getenv("POLL_GRACE", "60"))  # Seconds after an expected reading before it is fetched
+POLL_DEFAULT_CADENCE = int(os.getenv("POLL_DEFAULT_CADENCE", "600"))  # Assumed update interval of new stations
+POLL_TICK = int(os.getenv("POLL_TICK", "15"))  # How often the scheduler checks whether a poll is due
+
+
+class PollPlanner:
+    """Plans getstationsdata polls from the update cadence each station has shown so far.
+
+    After every poll the readings' time_utc values update an exponentially weighted average of the
+    interval between readings of each station. One poll returns all stations, so the next poll is
+    planned just after the earliest expected reading, but never later than the shortest cadence
+    (so no reading is skipped) and never more often than POLL_MIN_INTERVAL or the hourly budget
+    allows. Stations that are unreachable or miss an expected reading back off exponentially and
+    stop driving the schedule until they publish again.
+    """
+
+    SMOOTHING = 0.3  # Weight of the newest interval in the cadence average
+
+    def __init__(self, min_interval, max_interval, budget_per_hour, grace, default_cadence):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.budget_per_hour = max(1, budget_per_hour)
+        self.grace = grace
+        self.default_cadence = default_cadence
+        self._stations = {}  # station_id -> {"last": epoch, "cadence": seconds, "misses": n, "retry_at": epoch}
+        self._polls = collections.deque()  # Start times of the polls of the last hour
+        self._last_poll = None
+        self._lock = threading.Lock()
+        self.stats = {"polls": 0, "new_readings": 0, "calls_saved": 0.0}
+
+    def _due(self, state):
+        if state["misses"]:
+            return state["retry_at"]
+        return state["last"] + state["cadence"] + self.grace
+
+    def next_poll_at(self):
+        """Returns the Unix time of the next poll."""
+        with self._lock:
+            if self._last_poll is None:
+                return 0.0  # Nothing polled yet: poll right away
+            earliest = self._last_poll + max(self.min_interval, 3600 / self.budget_per_hour)
+            cadences = [state["cadence"] for state in self._stations.values() if not state["misses"]]
+            latest = self._last_poll + min([self.max_interval] + cadences)
+            # Backing-off stations only set the pace once every station is backing off
+            active = [state for state in self._stations.values() if not state["misses"]]
+            target = min((self._due(state) for state in active or self._stations.values()), default=latest)
+            planned = min(max(target, earliest), latest)
+            if len(self._polls) >= self.budget_per_hour:
+                planned = max(planned, self._polls[0] + 3600)
+            return max(planned, earliest)
+
+    def record_poll(self, polled_at):
+        """Counts a poll against the budget; called before the upstream request is sent."""
+        with self._lock:
+            if self._last_poll is not None:
+                saved = (polled_at - self._last_poll) / self.min_interval - 1
+                if saved > 0:
+                    self.stats["calls_saved"] += saved
+                    POLL_CALLS_SAVED.inc(saved)
+            self._last_poll = polled_at
+            self._polls.append(polled_at)
+            while self._polls and self._polls[0] <= polled_at - 3600:
+                self._polls.popleft()
+            self.stats["polls"] += 1
+
+    def observe(self, stations, measurements, polled_at):
+        """Learns from the result of a poll; returns the number of stations with a new reading."""
+        reachable = {station["station_id"]: station.get("reachable") is not False for station in stations}
+        new_readings = 0
+        with self._lock:
+            for measurement in measurements:
+                station_id = measurement["station_id"]
+                measured_at = measurement.get("measured_at")
+                reading = datetime.fromisoformat(measured_at).replace(tzinfo=timezone.utc).timestamp() if measured_at else None
+                state = self._stations.get(station_id)
+
+                if reading is not None and (state is None or reading > state["last"]):
+                    if state is None:
+                        state = self._stations[station_id] = {"last": reading, "cadence": self.default_cadence,
+                                                              "misses": 0, "retry_at": None}
+                    else:
+                        # A gap of several intervals (missed readings, outage) counts as that many intervals
+                        interval = reading - state["last"]
+                        interval /= max(1, round(interval / state["cadence"]))
+                        cadence = (1 - self.SMOOTHING) * state["cadence"] + self.SMOOTHING * interval
+                        state.update(last=reading, cadence=min(3600, max(60, cadence)), misses=0, retry_at=None)
+                    new_readings += 1
+                    FRESHNESS_LAG_SECONDS.observe(max(0.0, polled_at - reading))
+                elif state is not None and (not reachable.get(station_id, True) or polled_at >= self._due(state)):
+                    # Expected a reading (or the station is offline) and got none: back off
+                    state["misses"] += 1
+                    state["retry_at"] = polled_at + min(self.max_interval, state["cadence"] * 2 ** state["misses"])
+            self.stats["new_readings"] += new_readings
+        return new_readings
+
+    def snapshot(self):
+        """Returns the planned poll time, the budget use and a summary of the learned cadences."""
+        next_poll = self.next_poll_at()
+        with self._lock:
+            cadences = sorted(state["cadence"] for state in self._stations.values())
+            return dict(
+                self.stats,
+                calls_saved=round(self.stats["calls_saved"], 1),
+                next_poll_in_seconds=round(max(0.0, next_poll - time.time()), 1),
+                polls_last_hour=len(self._polls),
+                budget_per_hour=self.budget_per_hour,
+                stations=len(cadences),
+                stations_backing_off=sum(1 for state in self._stations.values() if state["misses"]),
+                median_cadence_seconds=round(cadences[len(cadences) // 2]) if cadences else None,
+            )
+
+
+poll_planner = PollPlanner(POLL_MIN_INTERVAL, POLL_MAX_INTERVAL, POLL_BUDGET_PER_HOUR, POLL_GRACE, POLL_DEFAULT_CADENCE)
 
 
 # Scheduler setup for periodic data storage
 scheduler = BackgroundScheduler()
 
 def scheduled_store_data():
-    with app.app_context():
-        store_data()
+    """Fetches fresh upstream data and hands it to the ingestion pipeline without waiting for the database."""
+    started = time.monotonic()
+    polled_at = time.time()
+    poll_planner.record_poll(polled_at)
+    try:
+        stations, measurements, modules, module_readings = upstream_cache.get(force_refresh=True)["rows"]
+    except (UpstreamError, requests.RequestException) as e:
+        POLLS.inc(result="error")
+        print("Scheduled poll failed:", e)
+        raise  # Reported as a failed run in the job metrics
+    new_readings = poll_planner.observe(stations, measurements, polled_at)
+    POLLS.inc(result="new_data" if new_readings else "no_new_data")
+    ingestion_pipeline.submit(stations, measurements, modules, module_readings, fetch_seconds=time.monotonic() - started)
+
+
+def scheduled_token_refresh():
+    """Refreshes the tokens ahead of expiry, on the lease holder only (Netatmo rotates the refresh token)."""
+    if collector_lease.held():
+        token_manager.refresh_if_due()
+
+
+def scheduled_partition_maintenance():
+    """Keeps the monthly measurement partitions ahead of time and applies the retention, on the lease holder only."""
+    if collector_lease.held():
+        maintain_measurement_partitions()
+
+
+def timed_job(name, func):
+    """Wraps a scheduled job so its duration and outcome end up in the metrics."""
+    @functools.wraps(func)
+    def run():
+        with JOB_SECONDS.time(job=name):
+            func()
+        JOB_LAST_SUCCESS.set(time.time(), job=name)
+    return run
+
+
+def record_job_event(event):
+    """Scheduler listener: lag between the scheduled and the actual start, and the outcome of each run."""
+    if event.code == EVENT_JOB_SUBMITTED:
+        lag = datetime.now(timezone.utc) - event.scheduled_run_times[-1]
+        JOB_LAG_SECONDS.observe(max(0.0, lag.total_seconds()), job=event.job_id)
+    elif event.code == EVENT_JOB_MISSED:
+        JOB_RUNS.inc(job=event.job_id, outcome="missed")
+    else:
+        JOB_RUNS.inc(job=event.job_id, outcome="error" if event.exception else "ok")
 
-scheduler.add_job(scheduled_store_data, 'interval', minutes=15)
-scheduler.start()
+
+store_data_job = timed_job("store_data", scheduled_store_data)
+
+
+def poll_if_due():
+    """Scheduler tick: polls when the planner expects the next station readings to be available.
+
+    The poll runs inside the poll_tick job, so its lag (behind the planned time) and outcome are
+    recorded here under store_data.
+    """
+    planned = poll_planner.next_poll_at()
+    now = time.time()
+    if not collector_lease.held() or now < planned:
+        return
+    if planned:
+        JOB_LAG_SECONDS.observe(now - planned, job="store_data")
+    try:
+        store_data_job()
+    except Exception:
+        JOB_RUNS.inc(job="store_data", outcome="error")
+        raise
+    JOB_RUNS.inc(job="store_data", outcome="ok")
+
+
+scheduler.add_job(poll_if_due, 'interval', seconds=POLL_TICK, id="poll_tick")
+scheduler.add_job(timed_job("refresh_token", scheduled_token_refresh), 'interval', minutes=1, id="refresh_token")
+scheduler.add_job(timed_job("maintain_partitions", scheduled_partition_maintenance), 'interval', hours=12,
+                  id="maintain_partitions", next_run_time=datetime.now() + timedelta(minutes=1))
+scheduler.add_job(collector_lease.renew, 'interval', seconds=max(1, COLLECTOR_LEASE_TTL // 3), id="collector_lease",
+                  next_run_time=datetime.now())
+scheduler.add_listener(record_job_event, EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED)
+
+
+def start_collector():
+    """Starts the scheduler and the database writer threads in this process (once)."""
+    if scheduler.running:
+        return
+    ingestion_pipeline.start()
+    scheduler.start()
+
+
+def collector_http_app(environ, start_response):
+    """WSGI app of the collector's metrics port: only /metrics and /stats of this process."""
+    if environ.get("PATH_INFO") not in ("/metrics", "/stats"):
+        return NotFound()(environ, start_response)
+    return app.wsgi_app(environ, start_response)
+
+
+def run_collector():
+    """Runs this process as the dedicated collector until SIGTERM or SIGINT."""
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+    start_collector()
+    # The collector serves no routes, so its polls, writes, jobs and tokens are scraped from a port of its own
+    metrics_server = None
+    if COLLECTOR_METRICS_PORT:
+        metrics_server = make_server("0.0.0.0", COLLECTOR_METRICS_PORT, collector_http_app, threaded=True)
+        threading.Thread(target=metrics_server.serve_forever, name="collector-metrics", daemon=True).start()
+    print(f"Collector {collector_lease.holder} started"
+          + (f", metrics on port {COLLECTOR_METRICS_PORT}." if metrics_server else "."))
+    stop.wait()
+
+    scheduler.shutdown()  # Waits for a running poll, which has then queued its batch
+    # Batches being written are finished; the ones the writers have not picked up yet are kept on disk for the next collector
+    ingestion_pipeline.stop(INGEST_SHUTDOWN_TIMEOUT)
+    ingestion_pipeline.spill_pending()
+    collector_lease.release()
+    if metrics_server:
+        metrics_server.shutdown()
+    print("Collector stopped.")
+
+
+# Importing the app never starts the collector, so flask CLI commands (backfill, export-measurements, ...)
+# and scripts do not poll or take the lease. With APP_ROLE=all a server that imports the app (flask run)
+# starts it with the first request; web workers (APP_ROLE=web, e.g. under gunicorn) never start it.
+if APP_ROLE == "all":
+    app.before_first_request(start_collector)
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000)
+    if APP_ROLE == "collector":
+        run_collector()
+    else:
+        if APP_ROLE == "all":
+            start_collector()
+        app.run(host="0.0.0.0", port=5000)
@@ -0,0 +1,68 @@
+"""Raw archive benchmark: archives synthetic polls and times their re-extraction with 1..N worker processes.
+
+--polls getstationsdata payloads of --devices stations (one every --interval seconds) are appended
+to a temporary ARCHIVE_DIR like scheduled polls. Then `flask replay-archive --dry-run` is timed for
+each --workers value: the segments are memory-mapped, decompressed and run through extract_data,
+without writing to the database (no MySQL needed). Append latency, archive size and replay
+throughput are printed together with the time a year of polls at --interval would take.
+
+    python benchmarks/bench_archive.py --devices 100 --polls 2000 --workers 1,2,4,8
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from payloads import make_payload  # noqa: E402
+
+REPLAY_START = int(datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp())  # Fixed, so runs are comparable
+YEAR_SECONDS = 365 * 86400
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=100, help="Stations per poll")
+    parser.add_argument("--polls", type=int, default=2000, help="Polls archived")
+    parser.add_argument("--interval", type=int, default=600, help="Seconds between archived polls")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker process counts to time")
+    args = parser.parse_args()
+
+    archive_dir = tempfile.mkdtemp(prefix="netatmo-bench-archive-")
+    # The app reads its configuration at import time
+    os.environ.update(APP_ROLE="web", ARCHIVE_DIR=archive_dir)
+    import app
+
+    try:
+        raw_bytes, append_seconds = 0, 0.0
+        for poll in range(args.polls):
+            time_utc = REPLAY_START + poll * args.interval
+            raw = json.dumps(make_payload(args.devices, time_utc=time_utc, seed=poll)).encode()
+            started = time.perf_counter()
+            app.raw_archive.append(raw, devices=args.devices, polled_at=time_utc + 60)
+            append_seconds += time.perf_counter() - started
+            raw_bytes += len(raw)
+        archived = app.raw_archive.snapshot()
+        print(f"{args.polls} polls x {args.devices} stations: {raw_bytes / 2**20:.1f} MiB raw, "
+              f"{archived['size_bytes'] / 2**20:.1f} MiB archived ({raw_bytes / archived['size_bytes']:.1f}x) "
+              f"in {archived['segments']} segments, append {append_seconds / args.polls * 1000:.2f} ms per poll")
+
+        polls_per_year = YEAR_SECONDS / args.interval
+        print(f"  {'workers':>7} {'seconds':>9} {'polls/s':>9} {'rows/s':>11} {'1 year':>9}")
+        for workers in [int(value) for value in args.workers.split(",")]:
+            result = app.replay_archive(workers=workers, dry_run=True)
+            rows = result["measurements"] + result["module_readings"]
+            print(f"  {workers:>7} {result['seconds']:>9} {result['polls'] / result['seconds']:>9.0f} "
+                  f"{rows / result['seconds']:>11.0f} {polls_per_year / (result['polls'] / result['seconds']) / 60:>7.1f} m")
+    finally:
+        shutil.rmtree(archive_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
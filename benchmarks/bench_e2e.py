@@ -0,0 +1,266 @@
+"""End-to-end benchmark: replays polls from a fake Netatmo API into MySQL and times the routes.
+
+The app is pointed at benchmarks/fake_netatmo.py (API_URL and TOKEN_URL), which serves synthetic
+getstationsdata payloads whose time_utc advances by --time-step seconds per poll. Every poll is
+fetched, extracted and stored like a scheduled poll. After each stage the read routes are called
+--requests times each, so their latency can be followed as the history grows. Ingestion
+throughput, p50/p99 route latency and peak memory are printed and saved as JSON for comparing runs.
+
+MySQL either runs in a throwaway container loaded with init.sql (needs Docker):
+
+    python benchmarks/bench_e2e.py --docker --devices 200 --polls 96 --output e2e.json
+
+or is an existing scratch database created from init.sql (benchmark stations use the 02:00:00
+MAC prefix and are deleted before and after the run):
+
+    python benchmarks/bench_e2e.py --host 127.0.0.1 --user vovo --password vovo_pass_sql --database vovo
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import mysql.connector
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from fake_netatmo import serve_in_background  # noqa: E402
+from payloads import BENCH_STATION_PREFIX, DEFAULT_MODULE_TYPES, station_id  # noqa: E402
+
+DOCKER_IMAGE = "mysql:8.0"  # Same image as docker-compose.yml
+REPLAY_START = int(datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp())  # Fixed, so runs are comparable
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # ru_maxrss is in KiB on Linux
+
+
+def percentiles(samples):
+    """Returns p50, p99, mean and max of `samples` (seconds) in milliseconds."""
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+    return {
+        "p50_ms": round(pick(0.50) * 1000, 2),
+        "p99_ms": round(pick(0.99) * 1000, 2),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+def start_mysql_container(port):
+    """Starts a MySQL container initialized from init.sql and waits until the schema is ready."""
+    name = f"netatmo-bench-{os.getpid()}"
+    subprocess.run([
+        "docker", "run", "-d", "--rm", "--name", name, "-p", f"127.0.0.1:{port}:3306",
+        "-e", "MYSQL_ROOT_PASSWORD=bench", "-e", "MYSQL_DATABASE=bench",
+        "-e", "MYSQL_USER=bench", "-e", "MYSQL_PASSWORD=bench",
+        "-v", f"{os.path.join(REPO_DIR, 'init.sql')}:/docker-entrypoint-initdb.d/init.sql:ro",
+        DOCKER_IMAGE,
+    ], check=True, stdout=subprocess.DEVNULL)
+
+    # The server only accepts TCP connections after init.sql has run and it restarted
+    deadline = time.monotonic() + 180
+    while True:
+        try:
+            conn = mysql.connector.connect(host="127.0.0.1", port=port, user="bench", password="bench", database="bench")
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM measurements_daily")
+            cursor.fetchall()
+            conn.close()
+            return name
+        except mysql.connector.Error:
+            if time.monotonic() > deadline:
+                stop_mysql_container(name)
+                raise RuntimeError("MySQL container did not become ready within 180 s")
+            time.sleep(2)
+
+
+def stop_mysql_container(name):
+    subprocess.run(["docker", "stop", name], check=False, stdout=subprocess.DEVNULL)
+
+
+def cleanup(app):
+    with app.db_pool.connection() as conn:
+        cursor = conn.cursor()
+        # Modules and rollups are removed by ON DELETE CASCADE; the partitioned measurements table has no foreign key
+        cursor.execute("DELETE FROM measurements WHERE station_id LIKE %s", (BENCH_STATION_PREFIX + ":%",))
+        cursor.execute("DELETE FROM weather_station WHERE station_id LIKE %s", (BENCH_STATION_PREFIX + ":%",))
+        conn.commit()
+        cursor.close()
+
+
+def count_measurements(app):
+    with app.db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM measurements WHERE station_id LIKE %s", (BENCH_STATION_PREFIX + ":%",))
+        count = cursor.fetchone()[0]
+        cursor.close()
+    return count
+
+
+def replay_poll(app):
+    """Fetches and stores one poll; returns (fetch seconds, store seconds, rows written)."""
+    started = time.perf_counter()
+    stations, measurements, modules, module_readings = app.upstream_cache.get(force_refresh=True)["rows"]
+    fetched = time.perf_counter()
+    app.store_batch_in_db(stations, measurements, modules, module_readings=module_readings)
+    stored = time.perf_counter()
+    return fetched - started, stored - fetched, len(stations) + len(measurements) + len(modules) + len(module_readings)
+
+
+def route_list(devices):
+    sid = station_id(devices // 2)
+    return [
+        ("get_data", "/get_data"),
+        ("store_data", "/store_data"),
+        ("show_data", "/show_data"),
+        ("show_data_table", f"/show_data_table?station_id={sid}"),
+        ("show_all_measurements", "/show_all_measurements"),
+        ("show_all_measurements_station", f"/show_all_measurements?station_id={sid}"),
+        ("show_all_measurements_stream", f"/show_all_measurements?station_id={sid}&stream=1"),
+        ("aggregates_hourly", f"/aggregates?period=hourly&station_id={sid}"),
+        ("aggregates_daily", "/aggregates?period=daily"),
+        ("stats", "/stats"),
+    ]
+
+
+def time_routes(app, routes, requests_per_route):
+    """Calls every route `requests_per_route` times through the test client, reading the whole body."""
+    client = app.app.test_client()
+    results = {}
+    for name, url in routes:
+        samples, statuses = [], set()
+        for _ in range(requests_per_route):
+            started = time.perf_counter()
+            response = client.get(url)
+            response.get_data()
+            samples.append(time.perf_counter() - started)
+            statuses.add(response.status_code)
+            response.close()
+        results[name] = dict(percentiles(samples), url=url, status=sorted(statuses))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docker", action="store_true", help=f"Run MySQL in a throwaway {DOCKER_IMAGE} container")
+    parser.add_argument("--docker-port", type=int, default=33306)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default=os.getenv("MYSQL_USER"))
+    parser.add_argument("--password", default=os.getenv("MYSQL_PASSWORD"))
+    parser.add_argument("--database", default=os.getenv("MYSQL_DATABASE"))
+    parser.add_argument("--devices", type=int, default=100, help="Stations per poll")
+    parser.add_argument("--modules", default=",".join(DEFAULT_MODULE_TYPES), help="Comma-separated module types per station")
+    parser.add_argument("--polls", type=int, default=48, help="Polls replayed in total")
+    parser.add_argument("--time-step", type=int, default=900, help="Seconds between replayed polls")
+    parser.add_argument("--stages", type=int, default=4, help="How often the routes are timed while history grows")
+    parser.add_argument("--requests", type=int, default=30, help="Requests per route and stage")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark rows afterwards")
+    args = parser.parse_args()
+
+    fake = serve_in_background(devices=args.devices, module_types=args.modules.split(","),
+                               time_step=args.time_step, start_time=REPLAY_START)
+    # The app reads its configuration at import time; the polls are archived to a temporary directory,
+    # so a later replay-archive never loads them into the real tables
+    archive_dir = tempfile.mkdtemp(prefix="netatmo-bench-archive-")
+    os.environ.update(
+        APP_ROLE="web",
+        ARCHIVE_DIR=archive_dir,
+        API_URL=f"{fake.base_url}/api/getstationsdata",
+        TOKEN_URL=f"{fake.base_url}/oauth2/token",
+        GETMEASURE_URL=f"{fake.base_url}/api/getmeasure",
+        ACCESS_TOKEN="bench-access", REFRESH_TOKEN="bench-refresh",
+        TOKEN_EXPIRY=str(time.time() + 86400),
+        INGEST_SPOOL_DIR=tempfile.mkdtemp(prefix="netatmo-bench-spool-"),
+    )
+    import app
+
+    container = None
+    if args.docker:
+        print(f"Starting {DOCKER_IMAGE} on port {args.docker_port} ...")
+        container = start_mysql_container(args.docker_port)
+        app.DB_CONFIG.update(host="127.0.0.1", port=args.docker_port, user="bench", password="bench", database="bench")
+    else:
+        app.DB_CONFIG.update(host=args.host, port=args.port, user=args.user, password=args.password, database=args.database)
+
+    routes = route_list(args.devices)
+    stage_size = max(1, args.polls // max(1, args.stages))
+    fetch_times, store_times, rows_written, stages = [], [], 0, []
+    try:
+        cleanup(app)
+        print(f"{args.polls} polls x {args.devices} stations ({args.modules}), routes timed every {stage_size} polls")
+        for poll in range(1, args.polls + 1):
+            fetch_seconds, store_seconds, rows = replay_poll(app)
+            fetch_times.append(fetch_seconds)
+            store_times.append(store_seconds)
+            rows_written += rows
+            if poll % stage_size and poll != args.polls:
+                continue
+
+            history = count_measurements(app)
+            route_results = time_routes(app, routes, args.requests)
+            stages.append({"polls": poll, "measurements": history, "routes": route_results,
+                           "peak_rss_mb": round(peak_rss_mb(), 1)})
+            print(f"\nafter {poll} polls, {history} measurements, peak RSS {peak_rss_mb():.0f} MB")
+            print(f"  {'route':<32} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}  status")
+            for name, result in route_results.items():
+                print(f"  {name:<32} {result['p50_ms']:>9} {result['p99_ms']:>9} {result['max_ms']:>9}  {result['status']}")
+    finally:
+        if not args.keep:
+            cleanup(app)
+        if container:
+            stop_mysql_container(container)
+        fake.shutdown()
+        shutil.rmtree(archive_dir, ignore_errors=True)
+
+    ingestion = {
+        "polls": len(store_times),
+        "rows": rows_written,
+        "rows_per_second": round(rows_written / sum(store_times), 1),
+        "fetch": percentiles(fetch_times),
+        "store": percentiles(store_times),
+    }
+    print(f"\ningestion: {rows_written} rows in {sum(store_times):.2f} s of writes, {ingestion['rows_per_second']:.0f} rows/s, "
+          f"store p50 {ingestion['store']['p50_ms']} ms, p99 {ingestion['store']['p99_ms']} ms; "
+          f"fetch+extract p50 {ingestion['fetch']['p50_ms']} ms")
+    print(f"peak RSS {peak_rss_mb():.1f} MB")
+
+    if args.output:
+        config = {key: value for key, value in vars(args).items() if key != "password"}
+        result = {
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "config": config,
+            "environment": {"python": platform.python_version(), "platform": platform.platform(), "commit": git_commit()},
+            "ingestion": ingestion,
+            "stages": stages,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Measures how fast extract_data() turns a getstationsdata payload into database rows.
+
+Parses a synthetic 1,000-station payload (or a saved real response with --fixture) several
+times and reports records per second, then runs one more pass under tracemalloc to count the
+memory blocks allocated per station. Needs no database:
+
+    python benchmarks/bench_extract.py --stations 1000 --repeat 5
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("APP_ROLE", "web")  # Read at import time; a benchmark never runs the collector
+
+import app  # noqa: E402
+from payloads import MODULE_SENSORS, make_payload  # noqa: E402
+
+
+def extract_all(devices):
+    """Returns the number of records (stations, measurements, modules and module readings) produced."""
+    records = 0
+    for device in devices:
+        station_info, device_measurement, modules_data, readings = app.extract_data(device)
+        records += 2 + len(modules_data) + len(readings)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5, help="Timed passes over the payload")
+    parser.add_argument("--fixture", help="Saved getstationsdata JSON response to parse instead of a synthetic one")
+    args = parser.parse_args()
+
+    if args.fixture:
+        with open(args.fixture) as file:
+            payload = json.load(file)
+    else:
+        payload = make_payload(args.stations, module_types=tuple(MODULE_SENSORS), seed=1)
+    devices = payload["body"]["devices"]
+
+    extract_all(devices)  # Warm-up
+    timings = []
+    for _ in range(args.repeat):
+        gc.collect()
+        started = time.perf_counter()
+        records = extract_all(devices)
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+
+    gc.collect()
+    tracemalloc.start()
+    snapshot_before = tracemalloc.take_snapshot()
+    results = [app.extract_data(device) for device in devices]
+    current, peak = tracemalloc.get_traced_memory()
+    allocated = tracemalloc.take_snapshot().compare_to(snapshot_before, "filename")
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in allocated if stat.count_diff > 0)
+    del results
+
+    print(f"{len(devices)} stations, {records} records per pass, best of {args.repeat}")
+    print(f"time per pass      {best * 1000:10.1f} ms")
+    print(f"records/s          {records / best:10.0f}")
+    print(f"stations/s         {len(devices) / best:10.0f}")
+    print(f"retained memory    {current / 1e6:10.2f} MB ({current / len(devices):.0f} B per station)")
+    print(f"peak memory        {peak / 1e6:10.2f} MB")
+    print(f"allocated blocks   {blocks:10d} ({blocks / len(devices):.1f} per station)")
+    print(f"timestamp cache    {app.format_utc.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
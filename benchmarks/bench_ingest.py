@@ -0,0 +1,92 @@
+"""Compares rows per second of per-device ingestion with the bulk, single-transaction path.
+
+Runs against a real MySQL schema created from init.sql. Benchmark stations use the 02:00:00
+MAC prefix and are deleted before and after each run, but point it at a scratch database anyway:
+
+    python benchmarks/bench_ingest.py --host 127.0.0.1 --stations 500 --polls 3
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("APP_ROLE", "web")  # Read at import time; a benchmark never runs the collector
+
+import app  # noqa: E402
+from payloads import BENCH_STATION_PREFIX, make_payload  # noqa: E402
+
+
+def extract_poll(payload):
+    stations, measurements, modules, module_readings = [], [], [], []
+    for device in payload["body"]["devices"]:
+        station_info, device_measurement, modules_data, readings = app.extract_data(device)
+        stations.append(station_info)
+        measurements.append(device_measurement)
+        modules.extend(modules_data)
+        module_readings.extend(readings)
+    return stations, measurements, modules, module_readings
+
+
+def cleanup():
+    with app.db_pool.connection() as conn:
+        cursor = conn.cursor()
+        # Modules are removed by ON DELETE CASCADE; the partitioned measurements table has no foreign key
+        cursor.execute("DELETE FROM measurements WHERE station_id LIKE %s", (BENCH_STATION_PREFIX + ":%",))
+        cursor.execute("DELETE FROM weather_station WHERE station_id LIKE %s", (BENCH_STATION_PREFIX + ":%",))
+        conn.commit()
+        cursor.close()
+
+
+def run_per_device(polls):
+    for stations, measurements, modules, module_readings in polls:
+        modules_by_station, readings_by_station = {}, {}
+        for module in modules:
+            modules_by_station.setdefault(module["station_id"], []).append(module)
+        for reading in module_readings:
+            readings_by_station.setdefault(reading.station_id, []).append(reading)
+        for station_info, device_measurement in zip(stations, measurements):
+            station_id = station_info["station_id"]
+            app.store_data_in_db(station_info, device_measurement, modules_by_station.get(station_id, []),
+                                 readings_by_station.get(station_id, []))
+
+
+def run_bulk(polls, batch_size):
+    for stations, measurements, modules, module_readings in polls:
+        app.store_batch_in_db(stations, measurements, modules, batch_size, module_readings=module_readings)
+
+
+def timed(label, func, rows):
+    cleanup()
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    cleanup()
+    print(f"{label:<12} {rows:>8} rows  {elapsed:8.3f} s  {rows / elapsed:10.0f} rows/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=app.DB_CONFIG["host"])
+    parser.add_argument("--port", type=int, default=app.DB_CONFIG["port"])
+    parser.add_argument("--stations", type=int, default=200, help="Devices per poll")
+    parser.add_argument("--polls", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=app.INGEST_BATCH_SIZE)
+    args = parser.parse_args()
+
+    # The pool is created lazily, so the target can still be changed here
+    app.DB_CONFIG.update(host=args.host, port=args.port)
+
+    now = int(time.time())
+    polls = [extract_poll(make_payload(args.stations, time_utc=now + 600 * i, seed=i)) for i in range(args.polls)]
+    rows = sum(sum(map(len, poll)) for poll in polls)
+
+    print(f"{args.polls} polls x {args.stations} stations, batch size {args.batch_size}")
+    per_device = timed("per-device", lambda: run_per_device(polls), rows)
+    bulk = timed("bulk", lambda: run_bulk(polls, args.batch_size), rows)
+    print(f"speed-up: {per_device / bulk:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Measures time to first byte and peak RSS of /show_all_measurements for growing table sizes.
+
+For each size the bench station is topped up with synthetic measurements, then two fresh
+processes render its measurements: one through the streamed route (?stream=1) and one the old
+way (fetchall() followed by render_template). Point it at a scratch database created from init.sql:
+
+    python benchmarks/bench_streaming.py --host 127.0.0.1 --rows 10000,100000,1000000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("APP_ROLE", "web")  # Read at import time; a benchmark never runs the collector
+
+import app  # noqa: E402
+from payloads import station_id  # noqa: E402
+
+BENCH_STATION = station_id(0xffffff)
+INSERT_BATCH = 10000
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # ru_maxrss is in KiB on Linux
+
+
+def populate(total_rows):
+    """Adds measurements for the bench station until it has `total_rows` of them."""
+    with app.db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO weather_station (station_id, station_name) VALUES (%s, %s) "
+            "ON DUPLICATE KEY UPDATE station_name=VALUES(station_name)", (BENCH_STATION, "Streaming bench"))
+        cursor.execute("SELECT COUNT(*) FROM measurements WHERE station_id = %s", (BENCH_STATION,))
+        existing = cursor.fetchone()[0]
+        start = datetime(2000, 1, 1)
+        query = ("INSERT INTO measurements (station_id, measured_at, pressure, time_utc_pressure, temperature, "
+                 "time_utc_temperature, humidity, time_utc_humidity) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)")
+        for offset in range(existing, total_rows, INSERT_BATCH):
+            rows = []
+            for i in range(offset, min(offset + INSERT_BATCH, total_rows)):
+                measured_at = start + timedelta(minutes=10 * i)
+                rows.append((BENCH_STATION, measured_at, 1013.2, measured_at, 21.5, measured_at, 55, measured_at))
+            cursor.executemany(query, rows)
+            conn.commit()
+        cursor.close()
+
+
+def cleanup():
+    with app.db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM measurements WHERE station_id = %s", (BENCH_STATION,))
+        cursor.execute("DELETE FROM weather_station WHERE station_id = %s", (BENCH_STATION,))
+        conn.commit()
+        cursor.close()
+
+
+def child(mode):
+    """Renders the bench station's measurements once and prints timings as JSON."""
+    started = time.perf_counter()
+    first_byte = None
+    size = 0
+    if mode == "stream":
+        client = app.app.test_client()
+        response = client.get(f"/show_all_measurements?station_id={BENCH_STATION}&stream=1", buffered=False)
+        for chunk in response.response:
+            first_byte = first_byte or time.perf_counter()
+            size += len(chunk)
+        response.close()
+    else:
+        with app.app.test_request_context("/show_all_measurements"):
+            with app.db_pool.connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute("SELECT * FROM measurements WHERE station_id = %s", (BENCH_STATION,))
+                rows = cursor.fetchall()
+                cursor.close()
+            html = app.render_template("show_all_measurements.html", measurements_data=rows,
+                                       columns=list(rows[0].keys()) if rows else [], filters={}, next_page_url=None)
+            first_byte = time.perf_counter()
+            size = len(html)
+    print(json.dumps({
+        "ttfb_s": round(first_byte - started, 4),
+        "total_s": round(time.perf_counter() - started, 4),
+        "bytes": size,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=app.DB_CONFIG["host"])
+    parser.add_argument("--port", type=int, default=app.DB_CONFIG["port"])
+    parser.add_argument("--rows", default="10000,100000,1000000", help="Comma-separated table sizes")
+    parser.add_argument("--skip-fetchall", action="store_true", help="Only measure the streamed route")
+    parser.add_argument("--child", choices=["stream", "fetchall"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    app.DB_CONFIG.update(host=args.host, port=args.port)
+    if args.child:
+        child(args.child)
+        return
+
+    modes = ["stream"] if args.skip_fetchall else ["stream", "fetchall"]
+    print(f"{'rows':>9} {'mode':<9} {'ttfb s':>8} {'total s':>8} {'MB sent':>8} {'peak RSS MB':>12}")
+    try:
+        for rows in sorted(int(r) for r in args.rows.split(",")):
+            populate(rows)
+            for mode in modes:
+                output = subprocess.run(
+                    [sys.executable, __file__, "--host", args.host, "--port", str(args.port), "--child", mode],
+                    check=True, capture_output=True, text=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(f"{rows:>9} {mode:<9} {result['ttfb_s']:>8} {result['total_s']:>8} "
+                      f"{result['bytes'] / 1e6:>8.1f} {result['peak_rss_mb']:>12}")
+    finally:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Local stand-in for the Netatmo API, for exercising the app without network access.
+
+Serves the three endpoints the app calls, with synthetic but deterministic data:
+
+    POST /oauth2/token            always hands out a fresh token pair
+    GET  /api/getstationsdata     a payload from payloads.make_payload() with --devices stations
+    GET  /api/getmeasure          one value per scale interval for every requested type
+
+Start it and point the app at it through the environment:
+
+    python benchmarks/fake_netatmo.py --port 8081 --devices 50
+    API_URL=http://127.0.0.1:8081/api/getstationsdata TOKEN_URL=http://127.0.0.1:8081/oauth2/token \\
+    GETMEASURE_URL=http://127.0.0.1:8081/api/getmeasure flask backfill --from 2024-01-01 --to 2024-02-01
+
+--rate-limit answers like Netatmo does once a user exceeds its quota (403, error code 26), so
+the backfill's rate limiting and retries can be checked too. With --time-step every
+getstationsdata call advances the reported time_utc by that many seconds instead of following the
+clock, so a series of polls replays hours of data in seconds.
+"""
+import argparse
+import collections
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from payloads import DEFAULT_MODULE_TYPES, make_payload
+
+# getmeasure scale -> seconds between values (same table as app.GETMEASURE_SCALES)
+SCALES = {"max": 300, "30min": 1800, "1hour": 3600, "3hours": 10800, "1day": 86400}
+
+# getmeasure type -> (low, high, decimals) of the generated values
+MEASURE_RANGES = {
+    "temperature": (-15, 35, 1), "min_temp": (-20, 20, 1), "max_temp": (0, 40, 1),
+    "humidity": (20, 100, 0), "pressure": (990, 1040, 1), "noise": (30, 70, 0), "co2": (350, 2000, 0),
+    "windstrength": (0, 80, 0), "windangle": (0, 359, 0), "guststrength": (0, 100, 0), "gustangle": (0, 359, 0),
+    "rain": (0, 2, 3), "sum_rain": (0, 10, 3),
+}
+
+
+def measure_value(device_id, module_id, measure_type, timestamp):
+    """Returns the same synthetic value for the same series and time on every call."""
+    low, high, decimals = MEASURE_RANGES.get(measure_type, (0, 100, 1))
+    value = random.Random(f"{device_id}|{module_id}|{measure_type}|{timestamp}").uniform(low, high)
+    return round(value, decimals) if decimals else int(value)
+
+
+def getmeasure_body(params):
+    """Builds the optimize=false getmeasure body: {timestamp: [value per type]}."""
+    step = SCALES[params.get("scale", "max")]
+    begin = int(params.get("date_begin", 0))
+    end = int(params.get("date_end", time.time()))
+    limit = min(int(params.get("limit", 1024)), 1024)
+    types = params.get("type", "").lower().split(",")
+    device_id, module_id = params.get("device_id"), params.get("module_id", params.get("device_id"))
+
+    body = {}
+    timestamp = begin + (-begin % step)  # First interval boundary at or after date_begin
+    while timestamp <= end and len(body) < limit:
+        body[str(timestamp)] = [measure_value(device_id, module_id, t, timestamp) for t in types]
+        timestamp += step
+    return body
+
+
+class FakeNetatmoHandler(BaseHTTPRequestHandler):
+    server_version = "FakeNetatmo/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _over_quota(self):
+        return self.server.rate_limit and not self.server.allow_request()
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/oauth2/token":
+            return self._send(404, {"error": "not found"})
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self._send(200, {"access_token": f"fake-access-{time.time_ns()}", "refresh_token": "fake-refresh",
+                         "expires_in": 10800, "scope": ["read_station"]})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.server.count(url.path)
+
+        if url.path == "/api/getstationsdata":
+            return self._send(200, make_payload(self.server.devices, self.server.module_types,
+                                                time_utc=self.server.station_time(), seed=self.server.seed))
+        if url.path == "/api/getmeasure":
+            if self._over_quota():
+                return self._send(403, {"error": {"code": 26, "message": "User usage reached"}})
+            if params.get("scale", "max") not in SCALES or not params.get("device_id"):
+                return self._send(400, {"error": {"code": 21, "message": "Invalid scale or device_id"}})
+            return self._send(200, {"body": getmeasure_body(params), "status": "ok", "time_server": int(time.time())})
+        self._send(404, {"error": "not found"})
+
+
+class FakeNetatmoServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, devices=100, seed=0, latency=0.0, rate_limit=0, verbose=False,
+                 module_types=DEFAULT_MODULE_TYPES, time_step=0, start_time=None):
+        super().__init__(address, FakeNetatmoHandler)
+        self.devices = devices
+        self.module_types = tuple(module_types)
+        self.time_step = time_step
+        self.start_time = int(start_time if start_time is not None else time.time())
+        self.seed = seed
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.verbose = verbose
+        self.requests = collections.Counter()
+        self._calls = collections.deque()
+        self._lock = threading.Lock()
+
+    def count(self, path):
+        with self._lock:
+            self.requests[path] += 1
+
+    def station_time(self):
+        """Returns time_utc for the next getstationsdata payload."""
+        if not self.time_step:
+            return int(time.time())
+        with self._lock:
+            return self.start_time + (self.requests["/api/getstationsdata"] - 1) * self.time_step
+
+    def allow_request(self):
+        """Allows at most `rate_limit` getmeasure calls in any 10 second window."""
+        with self._lock:
+            now = time.monotonic()
+            while self._calls and now - self._calls[0] >= 10:
+                self._calls.popleft()
+            if len(self._calls) >= self.rate_limit:
+                return False
+            self._calls.append(now)
+            return True
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def serve_in_background(host="127.0.0.1", port=0, **options):
+    """Starts a server on a daemon thread (port 0 picks a free one) and returns it."""
+    server = FakeNetatmoServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, name="fake-netatmo", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--devices", type=int, default=100, help="Stations returned by getstationsdata")
+    parser.add_argument("--modules", default=",".join(DEFAULT_MODULE_TYPES), help="Comma-separated module types per station")
+    parser.add_argument("--time-step", type=int, default=0, help="Seconds time_utc advances per getstationsdata call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every GET request")
+    parser.add_argument("--rate-limit", type=int, default=0, help="getmeasure calls allowed per 10 s (0: unlimited)")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    server = FakeNetatmoServer((args.host, args.port), devices=args.devices, seed=args.seed, latency=args.latency,
+                               rate_limit=args.rate_limit, verbose=args.verbose, module_types=args.modules.split(","),
+                               time_step=args.time_step)
+    print(f"Fake Netatmo API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
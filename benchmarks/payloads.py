@@ -0,0 +1,128 @@
+"""Synthetic getstationsdata payloads for benchmarks.
+
+The generated structure follows the Netatmo getstationsdata response closely enough for
+extract_data(): one NAMain base station per device plus outdoor, wind, rain and indoor modules.
+Station IDs use the locally administered MAC prefix 02:00:00 so benchmark rows can be told
+apart from real stations and removed afterwards.
+"""
+import random
+import time
+
+BENCH_STATION_PREFIX = "02:00:00"
+
+# Module type -> dashboard_data fields it reports
+MODULE_SENSORS = {
+    "NAModule1": ("Temperature", "Humidity", "min_temp", "max_temp"),
+    "NAModule2": ("WindStrength", "WindAngle", "GustStrength", "GustAngle"),
+    "NAModule3": ("Rain", "sum_rain_1", "sum_rain_24"),
+    "NAModule4": ("Temperature", "CO2", "Humidity", "min_temp", "max_temp"),
+}
+DEFAULT_MODULE_TYPES = ("NAModule1", "NAModule2", "NAModule3")
+
+
+def _mac(prefix, index):
+    return f"{prefix}:{(index >> 16) & 0xff:02x}:{(index >> 8) & 0xff:02x}:{index & 0xff:02x}"
+
+
+def station_id(index):
+    """Returns the benchmark station ID for the given device index."""
+    return _mac(BENCH_STATION_PREFIX, index)
+
+
+def _sensor_value(rng, field):
+    if field in ("Temperature", "min_temp", "max_temp"):
+        return round(rng.uniform(-15, 35), 1)
+    if field == "Humidity":
+        return rng.randint(20, 100)
+    if field == "CO2":
+        return rng.randint(350, 2000)
+    if field in ("WindStrength", "GustStrength"):
+        return rng.randint(0, 80)
+    if field in ("WindAngle", "GustAngle"):
+        return rng.randint(0, 359)
+    if field == "Rain":
+        return round(rng.uniform(0, 2), 3)
+    return round(rng.uniform(0, 30), 3)
+
+
+def make_device(index, time_utc, module_types=DEFAULT_MODULE_TYPES, rng=None, sensors=None):
+    """Builds one getstationsdata device entry with its modules.
+
+    `sensors` overrides the dashboard_data fields of some module types (see MODULE_SENSORS).
+    """
+    rng = rng or random.Random(index)
+    sensors = dict(MODULE_SENSORS, **(sensors or {}))
+    sid = station_id(index)
+    lon, lat = round(rng.uniform(16.8, 22.6), 6), round(rng.uniform(47.7, 49.6), 6)
+    device = {
+        "_id": sid,
+        "station_name": f"Bench station {index}",
+        "date_setup": 1546300800,
+        "last_setup": 1546300800,
+        "type": "NAMain",
+        "last_status_store": time_utc,
+        "module_name": "Indoor",
+        "firmware": 178,
+        "last_upgrade": 1609459200,
+        "wifi_status": rng.randint(30, 90),
+        "reachable": True,
+        "co2_calibrating": False,
+        "data_type": ["Temperature", "CO2", "Humidity", "Noise", "Pressure"],
+        "place": {
+            "altitude": rng.randint(100, 1500),
+            "city": "Bench City",
+            "country": "SK",
+            "timezone": "Europe/Bratislava",
+            "location": [lon, lat],
+        },
+        "home_id": f"bench-home-{index}",
+        "home_name": f"Bench home {index}",
+        "favorite": True,
+        "read_only": True,
+        "dashboard_data": {
+            "time_utc": time_utc,
+            "Temperature": round(rng.uniform(18, 26), 1),
+            "CO2": rng.randint(350, 2000),
+            "Humidity": rng.randint(30, 70),
+            "Noise": rng.randint(30, 70),
+            "Pressure": round(rng.uniform(990, 1040), 1),
+            "AbsolutePressure": round(rng.uniform(950, 1010), 1),
+        },
+        "modules": [],
+        "user": {"mail": "bench@example.com", "administrative": {"lang": "en", "unit": 0, "windunit": 0}},
+    }
+    for module_index, module_type in enumerate(module_types):
+        device["modules"].append({
+            "_id": _mac(f"{BENCH_STATION_PREFIX[:5]}:{module_index + 1:02x}", index),
+            "type": module_type,
+            "module_name": module_type,
+            "last_setup": 1546300800,
+            "data_type": list(sensors[module_type]),
+            "battery_percent": rng.randint(10, 100),
+            "reachable": True,
+            "firmware": 50,
+            "last_message": time_utc,
+            "last_seen": time_utc,
+            "rf_status": rng.randint(50, 90),
+            "battery_vp": rng.randint(4000, 6000),
+            "dashboard_data": dict(
+                {"time_utc": time_utc},
+                **{field: _sensor_value(rng, field) for field in sensors[module_type]}
+            ),
+        })
+    return device
+
+
+def make_payload(devices=100, module_types=DEFAULT_MODULE_TYPES, time_utc=None, seed=0, sensors=None):
+    """Returns a complete getstationsdata response with `devices` stations."""
+    time_utc = int(time_utc if time_utc is not None else time.time())
+    rng = random.Random(seed)
+    return {
+        "body": {
+            "devices": [make_device(index, time_utc, module_types, rng, sensors) for index in range(devices)],
+            "user": {"mail": "bench@example.com", "administrative": {"lang": "en"}},
+        },
+        "status": "ok",
+        "time_exec": 0.05,
+        "time_server": time_utc,
+    }
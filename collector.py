@@ -0,0 +1,19 @@
+"""Entry point of the dedicated collector process.
+
+Runs the scheduled Netatmo polls and the database writer without serving any routes, so the web
+app can run under several gunicorn workers with APP_ROLE=web:
+
+    python collector.py
+    gunicorn -k gevent -w 4 -b 0.0.0.0:5000 app:app   # with APP_ROLE=web
+
+Several collectors may run at once (e.g. one per replica); the collector_lease table makes sure
+only one of them polls. Its /metrics and /stats are served on COLLECTOR_METRICS_PORT (default 9101).
+"""
+import os
+
+os.environ["APP_ROLE"] = "collector"  # Read by app at import time
+
+from app import run_collector  # noqa: E402
+
+if __name__ == "__main__":
+    run_collector()
@@ -12,11 +12,14 @@ CREATE TABLE IF NOT EXISTS weather_station (
     reachable BOOLEAN,
     co2_calibrating BOOLEAN,
     place JSON,
+    latitude DOUBLE,                          -- Zemepisná šírka z place.location (pre vyhľadávanie podľa polohy)
+    longitude DOUBLE,                         -- Zemepisná dĺžka z place.location
     home_id VARCHAR(50),
     home_name VARCHAR(255),
     user_mail VARCHAR(255),
     user_administrative JSON,
-    INDEX (station_id)                        -- Index na zrýchlenie vyhľadávania podľa ID stanice
+    INDEX (station_id),                       -- Index na zrýchlenie vyhľadávania podľa ID stanice
+    INDEX idx_location (latitude, longitude)  -- Vyhľadávanie staníc v okolí a vo výreze mapy
 );
 
 -- Tabuľka pre údaje o moduloch pre každú stanicu (stále platné údaje)
@@ -34,8 +37,9 @@ CREATE TABLE IF NOT EXISTS weather_station_modules (
 
 -- Tabuľka pre merania z úrovne stanice aj modulov, s vlastnými časovými pečiatkami pre každú hodnotu
 CREATE TABLE IF NOT EXISTS measurements (
-    id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,   -- Primárny kľúč pre každý záznam merania
+    id BIGINT UNSIGNED AUTO_INCREMENT,               -- Identifikátor záznamu merania
     station_id VARCHAR(50) NOT NULL,                 -- Prepojenie na stanicu
+    measured_at DATETIME NOT NULL,                   -- Kanonický čas merania (najnovšia z časových pečiatok nižšie)
     pressure FLOAT,
     time_utc_pressure DATETIME,                           -- Unix čas pre meranie tlaku
     absolute_pressure FLOAT,
@@ -64,5 +68,111 @@ CREATE TABLE IF NOT EXISTS measurements (
     time_utc_gust_strength DATETIME,                      -- Unix čas pre silu nárazu vetra
     gust_angle INT,                                  -- Unix čas pre smer nárazu vetra
     time_utc_gust_angle DATETIME,
+    PRIMARY KEY (id, measured_at),                   -- Každý kľúč particionovanej tabuľky musí obsahovať measured_at
+    UNIQUE KEY uq_station_measured_at (station_id, measured_at),  -- Zabraňuje duplicitným meraniam tej istej stanice
+    INDEX idx_measured_at (measured_at)              -- Stránkovanie a časové filtre naprieč stanicami
+)
+-- Mesačné partície vytvára a po RETENTION_MONTHS maže údržba aplikácie (flask maintain-partitions).
+-- Particionované tabuľky nepodporujú cudzie kľúče, merania zmazanej stanice treba zmazať samostatne.
+PARTITION BY RANGE COLUMNS (measured_at) (
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+-- Merania jednotlivých modulov (vrátane základnej stanice s module_id = station_id), každý modul s vlastným časom
+CREATE TABLE IF NOT EXISTS module_measurements (
+    id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    module_id VARCHAR(50) NOT NULL,                  -- ID modulu alebo stanice
+    station_id VARCHAR(50) NOT NULL,                 -- Prepojenie na stanicu
+    module_type VARCHAR(50),                         -- NAMain, NAModule1 .. NAModule4
+    measured_at DATETIME NOT NULL,                   -- Čas merania modulu (time_utc)
+    temperature FLOAT,
+    humidity INT,
+    co2 INT,
+    noise INT,
+    pressure FLOAT,
+    absolute_pressure FLOAT,
+    min_temp FLOAT,
+    max_temp FLOAT,
+    rain FLOAT,
+    sum_rain_1 FLOAT,
+    sum_rain_24 FLOAT,
+    wind_strength INT,
+    wind_angle INT,
+    gust_strength INT,
+    gust_angle INT,
+    UNIQUE KEY uq_module_measured_at (module_id, measured_at),   -- Zabraňuje duplicitným meraniam toho istého modulu
+    INDEX idx_station_measured_at (station_id, measured_at),
+    FOREIGN KEY (station_id) REFERENCES weather_station(station_id) ON DELETE CASCADE
+);
+
+-- Hodinové a denné agregácie meraní, priebežne aktualizované pri ukladaní nových meraní
+CREATE TABLE IF NOT EXISTS measurements_hourly (
+    station_id VARCHAR(50) NOT NULL,
+    bucket_start DATETIME NOT NULL,                  -- Začiatok hodiny (UTC)
+    samples INT NOT NULL,                            -- Počet meraní v intervale
+    temperature_min FLOAT,
+    temperature_max FLOAT,
+    temperature_sum DOUBLE,                          -- Priemer = sum / count
+    temperature_count INT NOT NULL DEFAULT 0,
+    humidity_min INT,
+    humidity_max INT,
+    humidity_sum DOUBLE,
+    humidity_count INT NOT NULL DEFAULT 0,
+    pressure_min FLOAT,
+    pressure_max FLOAT,
+    pressure_sum DOUBLE,
+    pressure_count INT NOT NULL DEFAULT 0,
+    rain_total FLOAT,                                -- Najväčší hlásený úhrn za poslednú hodinu (sum_rain_1)
+    PRIMARY KEY (station_id, bucket_start),
+    FOREIGN KEY (station_id) REFERENCES weather_station(station_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS measurements_daily (
+    station_id VARCHAR(50) NOT NULL,
+    bucket_start DATETIME NOT NULL,                  -- Začiatok dňa (UTC)
+    samples INT NOT NULL,                            -- Počet meraní v intervale
+    temperature_min FLOAT,
+    temperature_max FLOAT,
+    temperature_sum DOUBLE,                          -- Priemer = sum / count
+    temperature_count INT NOT NULL DEFAULT 0,
+    humidity_min INT,
+    humidity_max INT,
+    humidity_sum DOUBLE,
+    humidity_count INT NOT NULL DEFAULT 0,
+    pressure_min FLOAT,
+    pressure_max FLOAT,
+    pressure_sum DOUBLE,
+    pressure_count INT NOT NULL DEFAULT 0,
+    rain_total FLOAT,                                -- Najväčší hlásený úhrn za posledných 24 hodín (sum_rain_24)
+    PRIMARY KEY (station_id, bucket_start),
     FOREIGN KEY (station_id) REFERENCES weather_station(station_id) ON DELETE CASCADE
 );
+
+-- Zámok kolektora: údaje z Netatmo zbiera vždy len proces, ktorý drží tento záznam (APP_ROLE=all/collector).
+-- Záznam "backfill" drží proces, ktorý práve dopĺňa históriu.
+CREATE TABLE IF NOT EXISTS collector_lease (
+    name VARCHAR(50) PRIMARY KEY,                    -- Názov zámku (COLLECTOR_LEASE_NAME alebo backfill)
+    holder VARCHAR(255) NOT NULL,                    -- Proces, ktorý zámok drží (hostname:pid:náhodné ID)
+    expires_at DATETIME(6) NOT NULL,                 -- Čas vypršania podľa hodín databázy
+    status TEXT NULL                                 -- Priebeh posledného dopĺňania histórie (JSON)
+);
+
+-- Spoločné OAuth tokeny Netatmo pre všetky procesy; obnovuje ich len držiteľ zámku kolektora
+CREATE TABLE IF NOT EXISTS oauth_tokens (
+    name VARCHAR(50) PRIMARY KEY,                    -- Názov účtu (netatmo)
+    access_token VARCHAR(255),                       -- Aktuálny prístupový token
+    refresh_token VARCHAR(255) NOT NULL,             -- Aktuálny obnovovací token (Netatmo ho mení pri každej obnove)
+    expires_at DATETIME(6) NOT NULL,                 -- Čas vypršania prístupového tokenu
+    client_id VARCHAR(255),                          -- Client ID aplikácie (NULL: z prostredia procesu)
+    client_secret VARCHAR(255),                      -- Client secret aplikácie (NULL: z prostredia procesu)
+    api_url VARCHAR(255),                            -- URL getstationsdata (NULL: z prostredia procesu)
+    token_url VARCHAR(255),                          -- URL pre obnovu tokenov (NULL: z prostredia procesu)
+    version INT UNSIGNED NOT NULL DEFAULT 1          -- Zvyšuje sa pri každej zmene, procesy podľa neho zistia nové tokeny
+);
+
+-- Posledná odpoveď getstationsdata (gzip JSON), aby ju webové procesy nemuseli sťahovať z Netatmo každý zvlášť
+CREATE TABLE IF NOT EXISTS upstream_cache (
+    name VARCHAR(50) PRIMARY KEY,                    -- Názov endpointu (getstationsdata)
+    payload LONGBLOB NOT NULL,                       -- Odpoveď API ako gzip JSON
+    fetched_at DATETIME(6) NOT NULL                  -- Čas stiahnutia podľa hodín databázy
+);
@@ -0,0 +1,26 @@
+-- Migrácia existujúcej databázy: kanonický čas merania a unikátny kľúč proti duplicitám.
+-- Nové inštalácie dostanú túto schému priamo z init.sql.
+
+ALTER TABLE measurements ADD COLUMN measured_at DATETIME NULL AFTER station_id;
+
+-- Najnovšia z časových pečiatok jednotlivých hodnôt
+UPDATE measurements SET measured_at = NULLIF(GREATEST(
+    COALESCE(time_utc_pressure, '1970-01-01'), COALESCE(time_utc_absolute_pressure, '1970-01-01'),
+    COALESCE(time_utc_temperature, '1970-01-01'), COALESCE(time_utc_humidity, '1970-01-01'),
+    COALESCE(time_utc_noise, '1970-01-01'), COALESCE(time_utc_min_temp, '1970-01-01'),
+    COALESCE(time_utc_max_temp, '1970-01-01'), COALESCE(time_utc_rain, '1970-01-01'),
+    COALESCE(time_utc_sum_rain_1, '1970-01-01'), COALESCE(time_utc_sum_rain_24, '1970-01-01'),
+    COALESCE(time_utc_wind_strength, '1970-01-01'), COALESCE(time_utc_wind_angle, '1970-01-01'),
+    COALESCE(time_utc_gust_strength, '1970-01-01'), COALESCE(time_utc_gust_angle, '1970-01-01')
+), '1970-01-01');
+
+-- Riadky bez akejkoľvek časovej pečiatky neobsahujú žiadne hodnoty (stanica bola nedostupná)
+DELETE FROM measurements WHERE measured_at IS NULL;
+
+-- Z duplicitných meraní ponecháme to najstaršie uložené
+DELETE m FROM measurements m
+JOIN measurements keep ON keep.station_id = m.station_id AND keep.measured_at = m.measured_at AND keep.id < m.id;
+
+ALTER TABLE measurements
+    MODIFY measured_at DATETIME NOT NULL,
+    ADD UNIQUE KEY uq_station_measured_at (station_id, measured_at);
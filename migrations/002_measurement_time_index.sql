@@ -0,0 +1,3 @@
+-- Index pre stránkovanie a časové filtre naprieč všetkými stanicami.
+-- Filtre podľa stanice používajú unikátny kľúč (station_id, measured_at) z migrácie 001.
+ALTER TABLE measurements ADD INDEX idx_measured_at (measured_at);
@@ -0,0 +1,45 @@
+-- Tabuľky agregácií. Po migrácii ich naplňte z existujúcich meraní príkazom:
+--   flask rebuild-rollups
+
+-- Hodinové a denné agregácie meraní, priebežne aktualizované pri ukladaní nových meraní
+CREATE TABLE IF NOT EXISTS measurements_hourly (
+    station_id VARCHAR(50) NOT NULL,
+    bucket_start DATETIME NOT NULL,                  -- Začiatok hodiny (UTC)
+    samples INT NOT NULL,                            -- Počet meraní v intervale
+    temperature_min FLOAT,
+    temperature_max FLOAT,
+    temperature_sum DOUBLE,                          -- Priemer = sum / count
+    temperature_count INT NOT NULL DEFAULT 0,
+    humidity_min INT,
+    humidity_max INT,
+    humidity_sum DOUBLE,
+    humidity_count INT NOT NULL DEFAULT 0,
+    pressure_min FLOAT,
+    pressure_max FLOAT,
+    pressure_sum DOUBLE,
+    pressure_count INT NOT NULL DEFAULT 0,
+    rain_total FLOAT,                                -- Najväčší hlásený úhrn za poslednú hodinu (sum_rain_1)
+    PRIMARY KEY (station_id, bucket_start),
+    FOREIGN KEY (station_id) REFERENCES weather_station(station_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS measurements_daily (
+    station_id VARCHAR(50) NOT NULL,
+    bucket_start DATETIME NOT NULL,                  -- Začiatok dňa (UTC)
+    samples INT NOT NULL,                            -- Počet meraní v intervale
+    temperature_min FLOAT,
+    temperature_max FLOAT,
+    temperature_sum DOUBLE,                          -- Priemer = sum / count
+    temperature_count INT NOT NULL DEFAULT 0,
+    humidity_min INT,
+    humidity_max INT,
+    humidity_sum DOUBLE,
+    humidity_count INT NOT NULL DEFAULT 0,
+    pressure_min FLOAT,
+    pressure_max FLOAT,
+    pressure_sum DOUBLE,
+    pressure_count INT NOT NULL DEFAULT 0,
+    rain_total FLOAT,                                -- Najväčší hlásený úhrn za posledných 24 hodín (sum_rain_24)
+    PRIMARY KEY (station_id, bucket_start),
+    FOREIGN KEY (station_id) REFERENCES weather_station(station_id) ON DELETE CASCADE
+);
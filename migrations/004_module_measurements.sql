@@ -0,0 +1,29 @@
+-- Tabuľka pre merania jednotlivých modulov. Staršie merania sa nedajú rozdeliť podľa modulov,
+-- tabuľka sa plní až novými meraniami.
+
+-- Merania jednotlivých modulov (vrátane základnej stanice s module_id = station_id), každý modul s vlastným časom
+CREATE TABLE IF NOT EXISTS module_measurements (
+    id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    module_id VARCHAR(50) NOT NULL,                  -- ID modulu alebo stanice
+    station_id VARCHAR(50) NOT NULL,                 -- Prepojenie na stanicu
+    module_type VARCHAR(50),                         -- NAMain, NAModule1 .. NAModule4
+    measured_at DATETIME NOT NULL,                   -- Čas merania modulu (time_utc)
+    temperature FLOAT,
+    humidity INT,
+    co2 INT,
+    noise INT,
+    pressure FLOAT,
+    absolute_pressure FLOAT,
+    min_temp FLOAT,
+    max_temp FLOAT,
+    rain FLOAT,
+    sum_rain_1 FLOAT,
+    sum_rain_24 FLOAT,
+    wind_strength INT,
+    wind_angle INT,
+    gust_strength INT,
+    gust_angle INT,
+    UNIQUE KEY uq_module_measured_at (module_id, measured_at),   -- Zabraňuje duplicitným meraniam toho istého modulu
+    INDEX idx_station_measured_at (station_id, measured_at),
+    FOREIGN KEY (station_id) REFERENCES weather_station(station_id) ON DELETE CASCADE
+);
@@ -0,0 +1,6 @@
+-- Zámok kolektora: údaje z Netatmo zbiera vždy len proces, ktorý drží tento záznam (APP_ROLE=all/collector)
+CREATE TABLE IF NOT EXISTS collector_lease (
+    name VARCHAR(50) PRIMARY KEY,                    -- Názov zámku (COLLECTOR_LEASE_NAME)
+    holder VARCHAR(255) NOT NULL,                    -- Proces, ktorý zámok drží (hostname:pid:náhodné ID)
+    expires_at DATETIME(6) NOT NULL                  -- Čas vypršania podľa hodín databázy
+);
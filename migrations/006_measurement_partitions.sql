@@ -0,0 +1,20 @@
+-- Mesačné particionovanie tabuľky measurements podľa measured_at.
+-- Nové inštalácie dostanú túto schému priamo z init.sql.
+--
+-- Tabuľka sa pri migrácii prepisuje celá, spustite ju v čase bez zápisov (zastavte kolektor).
+-- Všetky existujúce merania najprv skončia v partícii pmax; mesačné partície z nej vytvorí príkaz
+--   flask maintain-partitions
+-- (alebo prvé spustenie údržby v kolektore), ktorý tiež znovu prepisuje tabuľku.
+
+-- Particionované tabuľky nepodporujú cudzie kľúče. Názov kľúča overte cez SHOW CREATE TABLE measurements.
+ALTER TABLE measurements DROP FOREIGN KEY measurements_ibfk_1;
+
+-- Každý unikátny kľúč musí obsahovať stĺpec, podľa ktorého sa particionuje
+ALTER TABLE measurements
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id, measured_at);
+
+ALTER TABLE measurements
+    PARTITION BY RANGE COLUMNS (measured_at) (
+        PARTITION pmax VALUES LESS THAN (MAXVALUE)
+    );
@@ -0,0 +1,13 @@
+-- Poloha staníc v samostatných stĺpcoch s indexom pre /stations/nearby a /stations/bbox.
+-- Nové inštalácie dostanú túto schému priamo z init.sql.
+
+ALTER TABLE weather_station
+    ADD COLUMN latitude DOUBLE NULL AFTER place,
+    ADD COLUMN longitude DOUBLE NULL AFTER latitude,
+    ADD INDEX idx_location (latitude, longitude);
+
+-- Netatmo uvádza polohu ako [zemepisná dĺžka, zemepisná šírka]
+UPDATE weather_station
+SET longitude = JSON_EXTRACT(place, '$.location[0]'),
+    latitude = JSON_EXTRACT(place, '$.location[1]')
+WHERE JSON_LENGTH(place, '$.location') = 2;
@@ -0,0 +1,15 @@
+-- Spoločné OAuth tokeny, prihlasovacie údaje klienta a URL API pre webové procesy aj kolektor
+-- (Netatmo mení obnovovací token pri každej obnove).
+-- Nové inštalácie dostanú túto schému priamo z init.sql. Prázdnu tabuľku naplní prvý proces z ACCESS_TOKEN/REFRESH_TOKEN.
+
+CREATE TABLE IF NOT EXISTS oauth_tokens (
+    name VARCHAR(50) PRIMARY KEY,                    -- Názov účtu (netatmo)
+    access_token VARCHAR(255),                       -- Aktuálny prístupový token
+    refresh_token VARCHAR(255) NOT NULL,             -- Aktuálny obnovovací token (Netatmo ho mení pri každej obnove)
+    expires_at DATETIME(6) NOT NULL,                 -- Čas vypršania prístupového tokenu
+    client_id VARCHAR(255),                          -- Client ID aplikácie (NULL: z prostredia procesu)
+    client_secret VARCHAR(255),                      -- Client secret aplikácie (NULL: z prostredia procesu)
+    api_url VARCHAR(255),                            -- URL getstationsdata (NULL: z prostredia procesu)
+    token_url VARCHAR(255),                          -- URL pre obnovu tokenov (NULL: z prostredia procesu)
+    version INT UNSIGNED NOT NULL DEFAULT 1          -- Zvyšuje sa pri každej zmene, procesy podľa neho zistia nové tokeny
+);
@@ -0,0 +1,6 @@
+-- Dopĺňanie histórie beží naraz len v jednom procese (záznam "backfill" v collector_lease) a jeho priebeh
+-- sa ukladá sem, aby ho GET /backfill ukázal rovnako v každom webovom procese.
+-- Nové inštalácie dostanú túto schému priamo z init.sql.
+
+ALTER TABLE collector_lease
+    ADD COLUMN status TEXT NULL;
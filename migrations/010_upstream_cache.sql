@@ -0,0 +1,8 @@
+-- Spoločná vyrovnávacia pamäť odpovede getstationsdata pre kolektor a webové procesy.
+-- Nové inštalácie dostanú túto schému priamo z init.sql.
+
+CREATE TABLE IF NOT EXISTS upstream_cache (
+    name VARCHAR(50) PRIMARY KEY,                    -- Názov endpointu (getstationsdata)
+    payload LONGBLOB NOT NULL,                       -- Odpoveď API ako gzip JSON
+    fetched_at DATETIME(6) NOT NULL                  -- Čas stiahnutia podľa hodín databázy
+);
@@ -0,0 +1,128 @@
+"""Shared fixtures: the app imported without the collector and a scripted stand-in for MySQL.
+
+The tests need no database or network access; run them from the repository root with
+
+    pip install pytest
+    python -m pytest
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("APP_ROLE", "web")  # Read at import time; the tests never run the collector
+
+import app  # noqa: E402
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rowcount = 0
+        self._rows = []
+
+    def execute(self, query, params=None):
+        self.db.queries.append((" ".join(query.split()), params))
+        self._rows = list(self.db.respond(query, params))
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def __iter__(self):
+        while self._rows:
+            yield self._rows.pop(0)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self.db)
+
+    def is_connected(self):
+        return True
+
+    def commit(self):
+        self.db.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeDatabase:
+    """Answers each query with the next queued result (a list of rows), or with no rows.
+
+    Handlers registered with on() answer every query containing their text instead; the one
+    registered last wins.
+    """
+
+    def __init__(self):
+        self.results = []
+        self.queries = []
+        self.commits = 0
+        self._handlers = []
+
+    def on(self, text, handler):
+        self._handlers.insert(0, (text, handler))
+
+    def respond(self, query, params):
+        for text, handler in self._handlers:
+            if text in query:
+                return handler(params) or []
+        return self.results.pop(0) if self.results else []
+
+    def get_connection(self):
+        return FakeConnection(self)
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """Routes app.db_pool to a FakeDatabase."""
+    db = FakeDatabase()
+    monkeypatch.setattr(app.db_pool, "_pool", db)
+    return db
+
+
+class LeaseTable:
+    """In-memory collector_lease table that applies COLLECTOR_LEASE_QUERY the way MySQL does,
+    with a clock the test moves forward."""
+
+    def __init__(self, db):
+        self.now = 1000.0
+        self.rows = {}  # name -> [holder, expires_at]
+        db.on("INSERT INTO collector_lease", self._upsert)
+        db.on("SELECT holder FROM collector_lease", self._select)
+        db.on("UPDATE collector_lease SET expires_at", self._release)
+
+    def _upsert(self, params):
+        name, holder, ttl = params
+        row = self.rows.get(name)
+        if row is None:
+            self.rows[name] = [holder, self.now + ttl]
+        elif row[0] == holder or row[1] < self.now:
+            self.rows[name] = [holder, self.now + ttl]
+
+    def _select(self, params):
+        return [(self.rows[params[0]][0],)]
+
+    def _release(self, params):
+        name, holder = params
+        if self.rows.get(name, [None])[0] == holder:
+            self.rows[name][1] = self.now
+
+
+@pytest.fixture
+def lease_table(fake_db):
+    return LeaseTable(fake_db)
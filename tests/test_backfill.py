@@ -0,0 +1,111 @@
+import json
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+import app
+
+START, END = datetime(2024, 1, 1), datetime(2024, 2, 1)
+HISTORY_START = datetime(2024, 1, 10)  # Oldest live reading of station "a"
+WINDOW = app.GETMEASURE_SCALES["30min"] * app.GETMEASURE_LIMIT
+
+
+def epoch(moment):
+    return int(moment.replace(tzinfo=timezone.utc).timestamp())
+
+
+def queue_stations(fake_db, with_history=True):
+    """Queues the answers to the station, module and (unless the ends are known) oldest reading queries of plan()."""
+    fake_db.results.append([("a", "NAMain"), ("b", None)])
+    fake_db.results.append([("a", "02:00:00:00:00:01", "NAModule1")])
+    if with_history:
+        fake_db.results.append([("a", HISTORY_START)])
+
+
+@pytest.fixture
+def backfill(tmp_path):
+    return app.Backfill(2, "30min", str(tmp_path / "checkpoint.json"), app.CollectorLease("backfill", 0))
+
+
+def test_checkpoint_round_trip(backfill):
+    assert backfill._load_checkpoint() == (set(), {})
+    backfill._save_checkpoint({"a|1|2", "b|1|2"}, {"a": 10, "b": None})
+    assert backfill._load_checkpoint() == ({"a|1|2", "b|1|2"}, {"a": 10, "b": None})
+
+
+def test_checkpoint_of_another_scale_is_ignored(backfill):
+    backfill._save_checkpoint({"a|1|2"}, {"a": 10})
+    other = app.Backfill(2, "1hour", backfill.checkpoint_path, backfill.lease)
+    assert other._load_checkpoint() == (set(), {})
+
+
+def test_plan_stops_each_station_at_its_live_history(fake_db, backfill):
+    queue_stations(fake_db)
+    modules, items, ends = backfill.plan([], START, END)
+
+    assert modules == {"a": [(None, "NAMain"), ("02:00:00:00:00:01", "NAModule1")], "b": [(None, "NAMain")]}
+    assert ends == {"a": epoch(HISTORY_START), "b": None}
+    by_station = {station_id: [item[1:] for item in items if item[0] == station_id] for station_id in ("a", "b")}
+    for station_id, last in (("a", epoch(HISTORY_START)), ("b", epoch(END))):
+        windows = by_station[station_id]
+        assert windows[0][0] == epoch(START)
+        assert windows[-1][1] == last - 1
+        # Contiguous, aligned to the window length and never longer than one getmeasure page
+        for (_, previous_end), (begin, _) in zip(windows, windows[1:]):
+            assert begin == previous_end + 1 and begin % WINDOW == 0
+        assert all(end - begin < WINDOW for begin, end in windows)
+
+
+def test_plan_keeps_the_ends_it_is_given(fake_db, backfill):
+    queue_stations(fake_db, with_history=False)
+    _, items, ends = backfill.plan([], START, END, {"a": epoch(HISTORY_START), "b": None})
+    assert ends == {"a": epoch(HISTORY_START), "b": None}
+    assert not any("MIN(measured_at)" in query for query, _ in fake_db.queries)
+    assert max(item[2] for item in items if item[0] == "a") == epoch(HISTORY_START) - 1
+
+
+def test_plan_of_selected_stations_filters_the_queries(fake_db, backfill):
+    fake_db.results.append([("a", "NAMain")])
+    modules, _, _ = backfill.plan(["a"], START, END)
+    assert list(modules) == ["a"]
+    assert fake_db.queries[0] == ("SELECT station_id, type FROM weather_station WHERE station_id IN (%s)", ["a"])
+
+
+def test_interrupted_backfill_resumes_with_the_missing_windows(fake_db, backfill, monkeypatch):
+    queue_stations(fake_db)
+    _, items, _ = backfill.plan([], START, END)
+    failing = items[1]
+    calls, lock = [], threading.Lock()
+    upstream_down = True
+
+    def run_item(station_id, modules, date_begin, date_end):
+        with lock:
+            calls.append((station_id, date_begin, date_end))
+        if (station_id, date_begin, date_end) == failing and upstream_down:
+            raise app.UpstreamError(500, "Internal error")
+        return {"inserted": 3, "skipped": 1}
+
+    monkeypatch.setattr(backfill, "_run_item", run_item)
+
+    queue_stations(fake_db)
+    status = backfill.run([], START, END)
+    assert status["windows_total"] == len(items)
+    assert status["windows_done"] == len(items) - 1
+    assert status["windows_failed"] == 1
+    with open(backfill.checkpoint_path) as file:
+        checkpoint = json.load(file)
+    assert len(checkpoint["done"]) == len(items) - 1
+    assert checkpoint["ends"] == {"a": epoch(HISTORY_START), "b": None}
+
+    # Station "a" now has older rows from the backfill, so its end comes from the checkpoint
+    calls.clear()
+    fake_db.queries.clear()
+    upstream_down = False
+    queue_stations(fake_db, with_history=False)
+    status = backfill.run([], START, END)
+    assert not any("MIN(measured_at)" in query for query, _ in fake_db.queries)
+    assert calls == [failing]
+    assert status["windows_done"] == len(items)
+    assert status["windows_failed"] == 0
+    assert status["inserted"] == 3 and not status["running"]
@@ -0,0 +1,78 @@
+import pytest
+from mysql.connector import errorcode, errors as mysql_errors
+
+import app
+
+TTL = 60
+
+
+@pytest.fixture
+def leases(lease_table):
+    return app.CollectorLease("collector", TTL), app.CollectorLease("collector", TTL)
+
+
+def test_only_one_replica_holds_the_lease(leases):
+    first, second = leases
+    assert first.renew()
+    assert not second.renew()
+    assert second.current_holder == first.holder
+    assert first.held() and not second.held()
+
+
+def test_renewed_lease_is_not_taken_over(lease_table, leases):
+    first, second = leases
+    first.renew()
+    lease_table.now += TTL - 1
+    assert first.renew()
+    lease_table.now += TTL - 1
+    assert not second.renew()
+
+
+def test_expired_lease_is_taken_over(lease_table, leases):
+    first, second = leases
+    first.renew()
+    second.renew()
+    lease_table.now += TTL + 1  # The first replica stopped renewing
+
+    assert second.renew()
+    assert second.stats["acquired"] == 1
+    assert not first.renew()
+    assert first.stats["lost"] == 1
+    assert first.current_holder == second.holder
+
+
+def test_released_lease_is_taken_over_right_away(lease_table, leases):
+    first, second = leases
+    first.renew()
+    first.release()
+    assert not first.held()
+    lease_table.now += 0.001  # Expired once NOW(6) has moved past the release
+    assert second.renew()
+
+
+def test_holder_keeps_polling_while_the_database_is_unreachable(fake_db, lease_table, leases):
+    first, _ = leases
+    first.renew()
+
+    def unreachable(params):
+        raise mysql_errors.InterfaceError("Lost connection to MySQL server")
+
+    fake_db.on("INSERT INTO collector_lease", unreachable)
+    assert first.renew()
+    assert first.stats["errors"] == 1
+
+
+def test_missing_table_disables_the_lease(fake_db):
+    def missing(params):
+        raise mysql_errors.ProgrammingError(errno=errorcode.ER_NO_SUCH_TABLE)
+
+    fake_db.on("INSERT INTO collector_lease", missing)
+    lease = app.CollectorLease("collector", TTL)
+    assert lease.renew()
+    assert not lease.enabled and lease.held()
+
+
+def test_zero_ttl_disables_the_lease(fake_db):
+    lease = app.CollectorLease("collector", 0)
+    assert lease.renew() and lease.held()
+    assert fake_db.queries == []
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import app
+
+T0 = 1_700_000_000
+DAY = datetime.utcfromtimestamp(T0).replace(hour=0, minute=0, second=0)
+
+
+def at(timestamp):
+    return datetime.utcfromtimestamp(timestamp)
+
+
+def test_archived_spans_join_polls_up_to_the_max_gap():
+    gap = app.ARCHIVE_MAX_GAP
+    polls = [T0 + 2 * gap, T0, T0 + gap, T0 + 4 * gap, T0 + 4 * gap + 60]
+    assert app.archived_spans(polls, DAY, DAY + timedelta(days=2)) == [
+        (at(T0), at(T0 + 2 * gap + 1)),
+        (at(T0 + 4 * gap), at(T0 + 4 * gap + 61)),
+    ]
+
+
+def test_archived_spans_are_clipped_to_the_range():
+    polls = [T0, T0 + 600, T0 + 1200]
+    assert app.archived_spans(polls, at(T0 + 300), at(T0 + 900)) == [(at(T0 + 300), at(T0 + 900))]
+    assert app.archived_spans(polls, at(T0 + 1201), at(T0 + 1800)) == []
+    assert app.archived_spans([], DAY, DAY + timedelta(days=1)) == []
+
+
+def measurement(station_id, measured_at):
+    return {"station_id": station_id, "measured_at": measured_at}
+
+
+def test_last_seen_index_drops_readings_already_stored(fake_db):
+    index = app.LastSeenIndex()
+    fake_db.results.append([("a", datetime(2024, 1, 1, 12, 0)), ("b", None)])
+    index.seed(fake_db.get_connection().cursor())
+
+    new, skipped = index.filter_new([
+        measurement("a", "2024-01-01 12:00:00"),
+        measurement("a", "2024-01-01 12:10:00"),
+        measurement("a", "2024-01-01 12:10:00"),  # Same reading twice in one batch
+        measurement("b", "2024-01-01 11:00:00"),
+        measurement("c", None),
+    ])
+    assert new == [measurement("a", "2024-01-01 12:10:00"), measurement("b", "2024-01-01 11:00:00")]
+    assert skipped == 3
+
+    # Not stored yet, so the same readings are still new in the next batch
+    assert index.filter_new(new) == (new, 0)
+    index.remember(new)
+    assert index.filter_new(new) == ([], 2)
+
+
+def test_last_seen_index_is_seeded_once(fake_db):
+    index = app.LastSeenIndex()
+    index.seed(fake_db.get_connection().cursor())
+    index.seed(fake_db.get_connection().cursor())
+    assert len(fake_db.queries) == 1
@@ -0,0 +1,88 @@
+from datetime import datetime
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+import app
+
+
+def test_backfill_range_parses_dates_and_datetimes():
+    assert app.parse_backfill_range("2024-01-01", "2024-02-01T12:30:00") == (
+        datetime(2024, 1, 1), datetime(2024, 2, 1, 12, 30))
+
+
+def test_backfill_range_defaults_to_now():
+    start, end = app.parse_backfill_range("2024-01-01", None)
+    assert start == datetime(2024, 1, 1)
+    assert abs((datetime.utcnow() - end).total_seconds()) < 5
+
+
+@pytest.mark.parametrize("first_day, last_day, message", [
+    (None, "2024-01-01", "'from' is required"),
+    ("2024-13-01", None, "Invalid date range"),
+    ("2024-01-01", "yesterday", "Invalid date range"),
+    ("2024-02-01", "2024-02-01", "'from' must be before 'to'"),
+    ("2024-02-02", "2024-02-01", "'from' must be before 'to'"),
+])
+def test_backfill_range_rejects_invalid_ranges(first_day, last_day, message):
+    with pytest.raises(ValueError, match=message):
+        app.parse_backfill_range(first_day, last_day)
+
+
+def test_measurement_filters_defaults():
+    filters = app.parse_measurement_filters(MultiDict())
+    assert filters == {"station_ids": [], "from": None, "to": None, "after": None,
+                       "limit": app.MEASUREMENTS_PAGE_LIMIT}
+
+
+def test_measurement_filters_parse_every_parameter():
+    filters = app.parse_measurement_filters(MultiDict([
+        ("station_id", "70:ee:50:00:00:01"), ("station_id", ""), ("station_id", "70:ee:50:00:00:02"),
+        ("from", "2024-01-01"), ("to", "2024-01-02T06:00:00"), ("limit", "10"),
+        ("after", "2024-01-01T05:10:00_42"),
+    ]))
+    assert filters["station_ids"] == ["70:ee:50:00:00:01", "70:ee:50:00:00:02"]
+    assert filters["from"] == datetime(2024, 1, 1)
+    assert filters["to"] == datetime(2024, 1, 2, 6)
+    assert filters["limit"] == 10
+    assert filters["after"] == (datetime(2024, 1, 1, 5, 10), 42)
+
+
+@pytest.mark.parametrize("args, message", [
+    ({"from": "01.01.2024"}, "Invalid 'from' value"),
+    ({"to": "tomorrow"}, "Invalid 'to' value"),
+    ({"limit": "ten"}, "Invalid 'limit' value"),
+    ({"limit": "0"}, "'limit' must be between"),
+    ({"limit": str(app.MEASUREMENTS_MAX_LIMIT + 1)}, "'limit' must be between"),
+    ({"after": "42"}, "Invalid 'after' cursor"),
+    ({"after": "2024-01-01T05:10:00_x"}, "Invalid 'after' cursor"),
+    ({"after": "someday_42"}, "Invalid 'after' cursor"),
+])
+def test_measurement_filters_reject_invalid_values(args, message):
+    with pytest.raises(ValueError, match=message):
+        app.parse_measurement_filters(MultiDict(args))
+
+
+def test_cursor_of_a_page_continues_below_its_last_row(fake_db):
+    rows = [{"id": 30 - i, "measured_at": datetime(2024, 1, 1, 12, 0) if i < 2 else datetime(2024, 1, 1, 11, 50)}
+            for i in range(3)]
+    filters = app.parse_measurement_filters(MultiDict({"limit": "2"}))
+    fake_db.results.append(rows)
+
+    page, next_cursor = app.fetch_measurements_page(fake_db.get_connection(), filters)
+
+    assert [row["id"] for row in page] == [30, 29]
+    assert next_cursor == "2024-01-01T12:00:00_29"
+    next_filters = app.parse_measurement_filters(MultiDict({"limit": "2", "after": next_cursor}))
+    assert next_filters["after"] == (datetime(2024, 1, 1, 12, 0), 29)
+    query, params = app.build_measurements_query(next_filters)
+    assert "(measured_at < %s OR (measured_at = %s AND id < %s))" in query
+    assert params == [datetime(2024, 1, 1, 12, 0), datetime(2024, 1, 1, 12, 0), 29, 3]
+
+
+def test_last_page_has_no_cursor(fake_db):
+    fake_db.results.append([{"id": 1, "measured_at": datetime(2024, 1, 1)}])
+    filters = app.parse_measurement_filters(MultiDict({"limit": "2"}))
+    page, next_cursor = app.fetch_measurements_page(fake_db.get_connection(), filters)
+    assert len(page) == 1
+    assert next_cursor is None
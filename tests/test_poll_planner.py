@@ -0,0 +1,87 @@
+from datetime import datetime
+
+import pytest
+
+import app
+
+T0 = 1_700_000_000  # Unix time of the first poll
+
+
+def reading(station_id, timestamp):
+    return {"station_id": station_id, "measured_at": datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def poll(planner, polled_at, *readings, unreachable=()):
+    """Records a poll at `polled_at` that returned `readings`."""
+    planner.record_poll(polled_at)
+    stations = [{"station_id": r["station_id"], "reachable": r["station_id"] not in unreachable} for r in readings]
+    return planner.observe(stations, list(readings), polled_at)
+
+
+@pytest.fixture
+def planner():
+    return app.PollPlanner(min_interval=120, max_interval=1800, budget_per_hour=20, grace=60, default_cadence=600)
+
+
+def test_first_poll_is_due_right_away(planner):
+    assert planner.next_poll_at() == 0.0
+
+
+def test_without_stations_polls_at_the_max_interval(planner):
+    planner.record_poll(T0)
+    assert planner.next_poll_at() == T0 + 1800
+
+
+def test_polls_just_after_the_expected_reading(planner):
+    assert poll(planner, T0, reading("a", T0 - 100)) == 1
+    # Last reading + default cadence + grace
+    assert planner.next_poll_at() == T0 - 100 + 600 + 60
+
+
+def test_never_polls_more_often_than_the_min_interval_or_the_budget(planner):
+    poll(planner, T0, reading("a", T0 - 590))
+    # Due 70 s after the poll, but 20 polls an hour means one every 180 s at most
+    assert planner.next_poll_at() == T0 + 180
+
+
+def test_learns_the_cadence_of_a_station(planner):
+    poll(planner, T0, reading("a", T0 - 60))
+    assert poll(planner, T0 + 600, reading("a", T0 + 240)) == 1
+    # 0.7 * 600 + 0.3 * 300
+    assert planner._stations["a"]["cadence"] == pytest.approx(510)
+    assert planner.next_poll_at() == T0 + 240 + 510 + 60
+
+
+def test_a_gap_of_several_readings_counts_as_several_intervals(planner):
+    poll(planner, T0, reading("a", T0 - 60))
+    poll(planner, T0 + 1800, reading("a", T0 + 1740))
+    assert planner._stations["a"]["cadence"] == pytest.approx(600)
+
+
+def test_spent_hourly_budget_delays_the_next_poll():
+    planner = app.PollPlanner(min_interval=120, max_interval=1800, budget_per_hour=3, grace=60, default_cadence=600)
+    # Forced polls (e.g. after a restart) spend the budget faster than planned
+    for offset in (0, 200, 400):
+        planner.record_poll(T0 + offset)
+    assert planner.next_poll_at() == T0 + 3600
+
+
+def test_station_without_its_expected_reading_backs_off(planner):
+    poll(planner, T0, reading("a", T0 - 60), reading("b", T0 - 30))
+    # Both were due by now, only b published
+    poll(planner, T0 + 700, reading("a", T0 - 60), reading("b", T0 + 570))
+    assert planner._stations["a"]["misses"] == 1
+    assert planner._stations["a"]["retry_at"] == T0 + 700 + 1200
+    # Only b sets the pace while a backs off
+    assert planner.next_poll_at() == T0 + 570 + 600 + 60
+
+
+def test_unreachable_station_backs_off_before_it_is_due(planner):
+    poll(planner, T0, reading("a", T0 - 60))
+    poll(planner, T0 + 200, reading("a", T0 - 60), unreachable=("a",))
+    assert planner._stations["a"]["misses"] == 1
+    # With every station backing off, the retry sets the pace
+    assert planner.next_poll_at() == T0 + 200 + 1200
+    # A new reading ends the back-off
+    poll(planner, T0 + 1400, reading("a", T0 + 1300))
+    assert planner._stations["a"]["misses"] == 0